@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# --- REGLES DES SUCCES ---
+# Chaque métrique déclenche uniquement ses propres paliers : (seuil, id du succès)
+ACHIEVEMENT_RULES = {
+    "habits_completed": [(1, "first_habit")],
+    "streak": [(7, "streak_7"), (14, "streak_14"), (30, "streak_30"), (90, "streak_90"), (365, "streak_365")],
+    "coins": [(2500, "coins_2500"), (5500, "coins_5500"), (10000, "coins_10000"), (25000, "coins_25000"), (50000, "coins_50000")],
+    "skill_level": [(2, "skill_lvl_2"), (5, "skill_lvl_5"), (8, "skill_lvl_8"), (10, "skill_lvl_10")],
+    "hp": [(100, "heal_hp")],
+    "perfect_days": [(1, "perfect_1"), (7, "perfect_7"), (30, "perfect_30"), (50, "perfect_50"), (100, "perfect_100")],
+}
+
+
+class AchievementEngine:
+    """Débloque les succès de façon incrémentale à partir des métriques d'un événement.
+
+    Le catalogue (collection achievements) est commun ; l'état débloqué est un
+    document par (joueur, succès) dans la collection `unlocks`."""
+
+    def __init__(self, store, unlocks: str = "achievement_unlocks", rules=ACHIEVEMENT_RULES, ttl: float = 60.0,
+                 max_players: int = 10_000, on_unlock=None):
+        self.store = store
+        self.unlocks = unlocks
+        self.rules = {metric: sorted(thresholds) for metric, thresholds in rules.items()}
+        self.ttl = ttl
+        self.max_players = max_players
+        # on_unlock(user_id, ids) : appelé après chaque déblocage (ex : événement poussé au client)
+        self.on_unlock = on_unlock
+        # user_id -> (ids débloqués, chargé à), du moins au plus récemment utilisé
+        self._unlocked = OrderedDict()
+
+    def invalidate(self, user_id: str = None):
+        """Oublie l'état en mémoire d'un joueur (ou de tous)"""
+        if user_id is None:
+            self._unlocked.clear()
+        else:
+            self._unlocked.pop(user_id, None)
+
+    def candidates(self, **metrics) -> list:
+        """Liste les succès dont le seuil est atteint, sans accès base"""
+        reached = []
+        for metric, value in metrics.items():
+            if value is None:
+                continue
+            for threshold, achievement_id in self.rules.get(metric, []):
+                if value < threshold:
+                    break
+                reached.append(achievement_id)
+        return reached
+
+    async def load_unlocked(self, user_id: str) -> set:
+        """Relit en base les succès d'un joueur et rafraîchit le cache"""
+        docs = await self.store.find(self.unlocks, {"user_id": user_id}, {"_id": 0, "id": 1})
+        unlocked = {d["id"] for d in docs}
+        self._unlocked[user_id] = (unlocked, time.monotonic())
+        self._unlocked.move_to_end(user_id)
+        while len(self._unlocked) > self.max_players:
+            self._unlocked.popitem(last=False)
+        return unlocked
+
+    async def unlocked_ids(self, user_id: str) -> set:
+        cached = self._unlocked.get(user_id)
+        if cached is None or time.monotonic() - cached[1] > self.ttl:
+            return await self.load_unlocked(user_id)
+        self._unlocked.move_to_end(user_id)
+        return cached[0]
+
+    async def record(self, user_id: str, **metrics) -> list:
+        """Évalue uniquement les paliers des métriques touchées et débloque les nouveaux"""
+        reached = self.candidates(**metrics)
+        if not reached:
+            return []
+
+        unlocked = await self.unlocked_ids(user_id)
+        new_ids = [a for a in reached if a not in unlocked]
+        if not new_ids:
+            return []
+
+        unlocked_at = datetime.now(timezone.utc)
+        await self.store.bulk_update(self.unlocks, [
+            ({"user_id": user_id, "id": a}, {"$setOnInsert": {"unlocked_at": unlocked_at}}) for a in new_ids
+        ], upsert=True)
+        unlocked.update(new_ids)
+        if self.on_unlock is not None:
+            self.on_unlock(user_id, new_ids)
+        return new_ids
@@ -0,0 +1,124 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from history import month_field
+
+# --- ANALYSES DES HABITUDES ---
+# Les masques mensuels de habit_history sont dépliés en une matrice booléenne
+# (habitudes x jours) ; tout le reste (cartes de chaleur, taux glissants, séries)
+# est calculé sur cette matrice avec NumPy, sans boucle par jour.
+
+DAY_BITS = np.arange(31, dtype=np.int64)
+
+
+def day_offsets(year: int, start: date, n_days: int) -> np.ndarray:
+    """Tableau (12, 31) : index du jour dans [start, start + n_days), -1 hors période ou date invalide"""
+    months = np.arange(1, 13)
+    first = np.array([f"{year}-{m:02d}-01" for m in months], dtype="datetime64[D]")
+    days = first[:, None] + DAY_BITS[None, :]
+    # Un jour « 31 février » déborde sur le mois suivant : on l'invalide
+    valid = days.astype("datetime64[M]") == first.astype("datetime64[M]")[:, None]
+    offsets = (days - np.datetime64(start, "D")).astype(np.int64)
+    in_range = valid & (offsets >= 0) & (offsets < n_days)
+    return np.where(in_range, offsets, -1)
+
+
+def completion_matrix(history_docs: list, habit_ids: list, start: date, end: date) -> np.ndarray:
+    """Matrice booléenne (habitudes x jours) des complétions sur [start, end]"""
+    n_days = (end - start).days + 1
+    matrix = np.zeros((len(habit_ids), n_days), dtype=bool)
+    rows = {habit_id: i for i, habit_id in enumerate(habit_ids)}
+    docs = [d for d in history_docs if d["habit_id"] in rows]
+    if not docs:
+        return matrix
+
+    masks = np.array([[d.get(month_field(m), 0) for m in range(1, 13)] for d in docs], dtype=np.int64)
+    bits = ((masks[:, :, None] >> DAY_BITS) & 1).astype(bool)
+    offsets = np.stack([day_offsets(d["year"], start, n_days) for d in docs])
+    row_index = np.broadcast_to(np.array([rows[d["habit_id"]] for d in docs])[:, None, None], bits.shape)
+
+    hit = bits & (offsets >= 0)
+    matrix[row_index[hit], offsets[hit]] = True
+    return matrix
+
+
+def rolling_rate(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Taux de complétion glissant sur `window` jours, par ligne"""
+    counts = np.cumsum(matrix, axis=-1, dtype=np.float64)
+    shifted = np.zeros_like(counts)
+    if window < counts.shape[-1]:
+        shifted[..., window:] = counts[..., :-window]
+    sizes = np.minimum(np.arange(1, counts.shape[-1] + 1), window)
+    return (counts - shifted) / sizes
+
+
+def streaks(matrix: np.ndarray) -> tuple:
+    """(plus longue série, série en cours) par ligne, via les bornes des séries de 1"""
+    n_rows, n_days = matrix.shape
+    padded = np.zeros((n_rows, n_days + 2), dtype=np.int8)
+    padded[:, 1:-1] = matrix
+    edges = np.diff(padded, axis=1)
+    start_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    lengths = ends - starts
+
+    longest = np.zeros(n_rows, dtype=np.int64)
+    np.maximum.at(longest, start_rows, lengths)
+    current = np.zeros(n_rows, dtype=np.int64)
+    running = ends == n_days
+    current[start_rows[running]] = lengths[running]
+    return longest, current
+
+
+def habit_analytics(habits: list, history_docs: list, start: date, end: date, window: int = 7) -> dict:
+    """Cartes de chaleur, taux de complétion (global et glissant) et séries par habitude et par compétence"""
+    habit_ids = [h["id"] for h in habits]
+    matrix = completion_matrix(history_docs, habit_ids, start, end)
+    n_days = matrix.shape[1]
+
+    rates = matrix.mean(axis=1) if n_days else np.zeros(len(habits))
+    rolling = rolling_rate(matrix, window)
+    longest, current = streaks(matrix)
+
+    per_skill = pd.DataFrame(matrix.astype(np.int64), index=[h["skill"] for h in habits]).groupby(level=0)
+    skill_heatmaps = per_skill.sum()
+    skill_sizes = per_skill.size()
+
+    daily_total = matrix.sum(axis=0)
+    overall_rate = daily_total / len(habits) if habits else np.zeros(n_days)
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": n_days,
+        "window": window,
+        "habits": [
+            {
+                "habit_id": h["id"],
+                "name": h.get("name"),
+                "skill": h.get("skill"),
+                "heatmap": matrix[i].astype(int).tolist(),
+                "completion_rate": round(float(rates[i]), 4),
+                "rolling_rate": np.round(rolling[i], 4).tolist(),
+                "longest_streak": int(longest[i]),
+                "current_streak": int(current[i]),
+            }
+            for i, h in enumerate(habits)
+        ],
+        "skills": [
+            {
+                "skill": skill,
+                "habits": int(skill_sizes[skill]),
+                "heatmap": row.tolist(),
+                "completion_rate": round(float(row.sum() / (skill_sizes[skill] * n_days)), 4) if n_days else 0.0,
+            }
+            for skill, row in skill_heatmaps.iterrows()
+        ],
+        "overall": {
+            "heatmap": daily_total.astype(int).tolist(),
+            "rolling_rate": np.round(rolling_rate(overall_rate[None, :], window)[0], 4).tolist()
+            if n_days else [],
+        },
+    }
@@ -0,0 +1,251 @@
+"""Banc de charge reproductible des routes chaudes de l'API.
+
+Exemples (depuis la racine du dépôt) :
+
+    python -m benchmarks.load_test --mongo-url mongodb://localhost:27017 --habits 50 --years 3
+    python -m benchmarks.load_test --backend memory --requests 500 --output bench.json
+    python -m benchmarks.load_test --backend sqlite --sqlite-path /tmp/bench.sqlite3
+
+La base cible (--db-name, ou le stockage embarqué choisi par --backend) est remplie avec --users joueurs synthétiques
+(bench-0, bench-1, ...) dont les données sont d'abord remises à zéro.
+Chaque route est mesurée dans sa propre phase, avec --concurrency clients
+asynchrones en parallèle : débit, latences p50/p95/p99 et commandes MongoDB
+par requête (via le monitoring de pymongo, backend mongo seulement). Le rapport est du JSON.
+
+Dépendance du banc : httpx.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+
+import numpy as np
+from pymongo import monitoring
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Compte les commandes MongoDB envoyées, par nom de commande et par collection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands = Counter()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        key = f"{event.command_name}:{collection}" if isinstance(collection, str) else event.command_name
+        with self._lock:
+            self.commands[key] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self.commands)
+
+
+def load_app(args, counter: CommandCounter):
+    """Importe server.py après avoir configuré le stockage cible"""
+    os.environ["STORAGE_BACKEND"] = args.backend
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db_name
+    os.environ["SQLITE_PATH"] = args.sqlite_path
+    if args.backend == "mongo":
+        monitoring.register(counter)
+    import server
+    return server
+
+
+async def seed_user(server, args, rng: random.Random, user_id: str) -> dict:
+    """Un joueur : habitudes avec plusieurs années d'historique et missions sur la période"""
+    store = server.store
+    await server.init_demo_data(user_id=user_id)
+    await store.update_one("user_stats", {"user_id": user_id}, {"$set": {"coins": 10 ** 9}})
+
+    skills = list(server.SKILL_RANKS)
+    habits = [
+        server.Habit(user_id=user_id, name=f"Habitude {i}", skill=rng.choice(skills), coin_reward=10, exp_reward=5).model_dump()
+        for i in range(args.habits)
+    ]
+    if habits:
+        await store.insert_many("habits", habits)
+
+    today = date.today()
+    history = []
+    for habit in habits:
+        for year in range(today.year - args.years + 1, today.year + 1):
+            doc = {"user_id": user_id, "habit_id": habit["id"], "year": year}
+            for month in range(1, 13):
+                doc[f"m{month:02d}"] = sum(1 << d for d in range(31) if rng.random() < args.completion_rate)
+            history.append(doc)
+    if history:
+        await store.insert_many("habit_history", history)
+
+    missions = []
+    days = args.years * 365
+    for i in range(args.missions):
+        day = (today - timedelta(days=rng.randrange(days))).isoformat()
+        missions.append(server.Mission(
+            id=str(uuid.uuid4()), user_id=user_id, title=f"Mission {i}", date=day,
+            crucial=rng.random() < 0.3, skill=rng.choice(skills)
+        ).model_dump())
+    if missions:
+        await store.insert_many("missions", missions)
+
+    return {"habit_ids": [h["id"] for h in habits], "mission_ids": [m["id"] for m in missions]}
+
+
+async def seed(server, args, rng: random.Random) -> dict:
+    """Données synthétiques de --users joueurs ; joueur -> ids de ses habitudes et missions"""
+    return {f"bench-{n}": await seed_user(server, args, rng, f"bench-{n}") for n in range(args.users)}
+
+
+SHOP_ITEM_IDS = ["health_potion", "bakery", "drink"]
+
+
+def scenarios(players: dict, rng: random.Random) -> dict:
+    """Route mesurée -> fabrique (méthode, url, params, en-têtes) d'une requête d'un joueur tiré au hasard"""
+    user_ids = list(players)
+
+    def request(method, url, params=None, user_id=None):
+        user_id = user_id or rng.choice(user_ids)
+        return method, url, params, {"X-User-Id": user_id}
+
+    def habit():
+        user_id = rng.choice(user_ids)
+        habit_id = rng.choice(players[user_id]["habit_ids"])
+        return request("PATCH", f"/api/habits/{habit_id}", {"completed_today": rng.random() < 0.8}, user_id)
+
+    def mission():
+        user_id = rng.choice(user_ids)
+        mission_id = rng.choice(players[user_id]["mission_ids"])
+        return request("PATCH", f"/api/missions/{mission_id}", {"completed": rng.random() < 0.5}, user_id)
+
+    def stats():
+        return request("GET", "/api/stats")
+
+    def purchase():
+        return request("POST", "/api/shop/purchase", {"item_id": rng.choice(SHOP_ITEM_IDS)})
+
+    routes = {"GET /stats": stats, "POST /shop/purchase": purchase}
+    if all(p["habit_ids"] for p in players.values()):
+        routes["PATCH /habits/{id}"] = habit
+    if all(p["mission_ids"] for p in players.values()):
+        routes["PATCH /missions/{id}"] = mission
+    return routes
+
+
+async def run_phase(client, make_request, total: int, concurrency: int) -> dict:
+    latencies = []
+    errors = Counter()
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(make_request())
+
+    async def worker():
+        while not queue.empty():
+            method, url, params, headers = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, params=params, headers=headers)
+                if response.status_code >= 500:
+                    errors[str(response.status_code)] += 1
+            except Exception as exc:
+                errors[type(exc).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": total,
+        "errors": dict(errors),
+        "duration_s": round(elapsed, 4),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 3),
+            "p50": round(float(np.percentile(ms, 50)), 3),
+            "p95": round(float(np.percentile(ms, 95)), 3),
+            "p99": round(float(np.percentile(ms, 99)), 3),
+            "max": round(float(ms.max()), 3),
+        },
+    }
+
+
+async def main(args) -> dict:
+    import httpx
+
+    rng = random.Random(args.seed)
+    counter = CommandCounter()
+    server = load_app(args, counter)
+    players = await seed(server, args, rng)
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "dataset": {
+            "users": len(players),
+            "habits": sum(len(p["habit_ids"]) for p in players.values()),
+            "missions": sum(len(p["mission_ids"]) for p in players.values()),
+            "history_years": args.years,
+        },
+        "routes": {},
+    }
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, make_request in scenarios(players, rng).items():
+            # Échauffement hors mesure (caches, pool de connexions)
+            await run_phase(client, make_request, min(args.warmup, args.requests), args.concurrency)
+            before = counter.snapshot()
+            result = await run_phase(client, make_request, args.requests, args.concurrency)
+            commands = counter.snapshot() - before
+            result["mongo"] = None if args.backend != "mongo" else {
+                "commands": sum(commands.values()),
+                "round_trips_per_request": round(sum(commands.values()) / args.requests, 3),
+                "by_command": dict(commands.most_common()),
+            }
+            report["routes"][name] = result
+
+    await server.store.close()
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="rpg_benchmark")
+    parser.add_argument("--backend", choices=["mongo", "memory", "sqlite"], default="mongo", help="stockage du serveur mesuré")
+    parser.add_argument("--sqlite-path", default="rpg_benchmark.sqlite3")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--habits", type=int, default=30, help="habitudes par joueur")
+    parser.add_argument("--years", type=int, default=3, help="années d'historique par habitude")
+    parser.add_argument("--completion-rate", type=float, default=0.7)
+    parser.add_argument("--missions", type=int, default=500, help="missions par joueur")
+    parser.add_argument("--requests", type=int, default=1000, help="requêtes mesurées par route")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="fichier JSON du rapport (sinon stdout)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
@@ -0,0 +1,110 @@
+"""Coût CPU de la sérialisation des grandes listes (habitudes, missions).
+
+    python -m benchmarks.serialization --sizes 100 1000 5000 --repeat 20
+
+Compare, à documents Mongo identiques (déjà projetés) :
+  - legacy    : Model(**doc) par document, puis response_model de FastAPI
+                (serialize_response) et JSONResponse (json de la stdlib) ;
+  - validated : une seule validation par TypeAdapter en cache, JSON produit par pydantic ;
+  - trusted   : lecture de confiance (défauts, pas de validation) et ORJSONResponse.
+Le rapport JSON donne le temps CPU (process_time) par requête et le gain sur legacy.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from serialization import list_adapter, trusted_documents
+
+
+def habit_documents(n: int, rng: random.Random) -> list:
+    return [{
+        "id": str(uuid.uuid4()), "user_id": "bench", "name": f"Habitude {i}", "description": "Tous les jours" * rng.randint(0, 3),
+        "skill": rng.choice(["tech", "sport", "culture"]), "coin_reward": 10, "exp_reward": 5, "completed_today": rng.random() < 0.5,
+    } for i in range(n)]
+
+
+def mission_documents(n: int, rng: random.Random) -> list:
+    today = date.today()
+    return [{
+        "id": str(uuid.uuid4()), "user_id": "bench", "title": f"Mission {i}", "description": "",
+        "date": (today - timedelta(days=rng.randrange(365))).isoformat(), "crucial": rng.random() < 0.3,
+        "completed": rng.random() < 0.5, "skill": rng.choice(["tech", "sport", "culture"]),
+    } for i in range(n)]
+
+
+def legacy(model, docs: list) -> bytes:
+    field = create_response_field(name="response", type_=List[model])
+    content = asyncio.run(serialize_response(field=field, response_content=[model(**d) for d in docs]))
+    return JSONResponse(content).body
+
+
+def validated(model, docs: list) -> bytes:
+    adapter = list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(docs))
+
+
+def trusted(model, docs: list) -> bytes:
+    return ORJSONResponse(trusted_documents(model, docs)).body
+
+
+VARIANTS = {"legacy": legacy, "validated": validated, "trusted": trusted}
+
+
+def cpu_ms(variant, model, docs: list, repeat: int) -> float:
+    variant(model, docs)
+    start = time.process_time()
+    for _ in range(repeat):
+        variant(model, docs)
+    return (time.process_time() - start) * 1000 / repeat
+
+
+def main(args) -> dict:
+    # Seuls les modèles sont utilisés : aucune connexion n'est ouverte
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "rpg_benchmark")
+    from server import Habit, Mission
+
+    rng = random.Random(args.seed)
+    report = {"config": vars(args), "results": []}
+    for name, model, make_docs in (("habits", Habit, habit_documents), ("missions", Mission, mission_documents)):
+        for size in args.sizes:
+            docs = make_docs(size, rng)
+            timings = {v: round(cpu_ms(fn, model, docs, args.repeat), 3) for v, fn in VARIANTS.items()}
+            report["results"].append({
+                "list": name,
+                "documents": size,
+                "cpu_ms_per_request": timings,
+                "speedup_vs_legacy": {v: round(timings["legacy"] / t, 2) for v, t in timings.items() if t},
+                "body_bytes": {v: len(fn(model, docs)) for v, fn in VARIANTS.items()},
+            })
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="fichier JSON du rapport (sinon stdout)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    text = json.dumps(main(args), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import time
+from typing import NamedTuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from serialization import dumps
+
+# --- CACHE DES DONNEES QUASI STATIQUES ---
+# Catalogue de la boutique, succès, rangs : chargés une fois, sérialisés une fois,
+# servis avec ETag. Un tampon de version partagé (collection cache_versions) permet
+# à tous les workers de voir une invalidation au plus tard après `ttl` secondes.
+
+
+class CacheEntry(NamedTuple):
+    version: int
+    payload: list
+    body: bytes
+    etag: str
+
+
+class CachedResource:
+    """Ressource en cache mémoire avec TTL, invalidation explicite et version partagée"""
+
+    def __init__(self, name: str, loader, store=None, ttl: float = 30.0, versions: str = "cache_versions"):
+        self.name = name
+        self.loader = loader
+        self.store = store
+        self.versions = versions
+        self.ttl = ttl
+        self._entry = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def current_version(self) -> int:
+        if self.store is None:
+            return 0
+        doc = await self.store.find_one(self.versions, {"_id": self.name})
+        return doc["version"] if doc else 0
+
+    def _fresh(self) -> bool:
+        if self._entry is None:
+            return False
+        return self.store is None or time.monotonic() - self._checked_at < self.ttl
+
+    async def get(self) -> CacheEntry:
+        if self._fresh():
+            return self._entry
+        async with self._lock:
+            if self._fresh():
+                return self._entry
+            version = await self.current_version()
+            if self._entry is None or self._entry.version != version:
+                self._entry = build_entry(self.name, version, await self.loader())
+            self._checked_at = time.monotonic()
+            return self._entry
+
+    async def invalidate(self):
+        """Vide le cache local et publie une nouvelle version pour les autres workers"""
+        self._entry = None
+        self._checked_at = 0.0
+        if self.store is not None:
+            await self.store.update_one(self.versions, {"_id": self.name}, {"$inc": {"version": 1}}, upsert=True)
+
+
+def build_entry(name: str, version: int, payload: list) -> CacheEntry:
+    """Sérialise une fois et calcule l'ETag (nom, version, empreinte du corps)"""
+    body = dumps(payload)
+    digest = hashlib.sha1(body).hexdigest()[:16]
+    return CacheEntry(version, payload, body, f'"{name}-{version}-{digest}"')
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def cached_response(request: Request, entry: CacheEntry, cache_control: str) -> Response:
+    """200 avec le corps déjà sérialisé, ou 304 si le client a déjà cette version"""
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
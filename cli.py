@@ -0,0 +1,176 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import typer
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from indexes import ensure_indexes, explain_queries
+from ledger import Ledger
+from progression import recompute_skills
+from simulation import Balance, Profile, simulate, summarize, sweep
+from storage import BACKENDS, open_storage
+from transfer import BATCH_SIZE, EXPORT_COLLECTIONS, FORMATS, export_data, import_data
+
+# --- OUTILS EN LIGNE DE COMMANDE ---
+# python cli.py <commande> ; même configuration (.env) que le serveur
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+app = typer.Typer(help="Outils d'exploitation du backend RPG")
+
+
+def run(job):
+    """Exécute job(db) avec un client dédié, fermé à la fin"""
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            return await job(client[os.environ['DB_NAME']])
+        finally:
+            client.close()
+    return asyncio.run(main())
+
+
+def run_store(job, backend: str = None, prepare: bool = False):
+    """Exécute job(store) sur le backend configuré (STORAGE_BACKEND) ou celui demandé"""
+    async def main():
+        store = open_storage(backend)
+        try:
+            if prepare:
+                await store.prepare()
+            return await job(store)
+        finally:
+            await store.close()
+    return asyncio.run(main())
+
+
+def check_choices(collections: list, fmt: str, backend: str):
+    unknown = [c for c in collections if c not in EXPORT_COLLECTIONS]
+    if unknown:
+        raise typer.BadParameter(f"collections inconnues : {', '.join(unknown)} (attendues : {', '.join(EXPORT_COLLECTIONS)})")
+    if fmt not in FORMATS:
+        raise typer.BadParameter(f"format inconnu : {fmt} (attendus : {', '.join(FORMATS)})")
+    if backend and backend not in BACKENDS:
+        raise typer.BadParameter(f"backend inconnu : {backend} (attendus : {', '.join(BACKENDS)})")
+
+
+@app.command("export")
+def export_command(
+    directory: Path,
+    fmt: str = typer.Option("ndjson", "--format", help="ndjson ou parquet"),
+    collections: List[str] = typer.Option(list(EXPORT_COLLECTIONS), "--collection", help="Collection à exporter (répétable)"),
+    user: str = typer.Option(None, help="Un seul joueur (les catalogues sont exportés en entier)"),
+    backend: str = typer.Option(None, help="Backend source (défaut : STORAGE_BACKEND)"),
+    batch_size: int = typer.Option(BATCH_SIZE, min=1),
+):
+    """Exporte les données de jeu dans un répertoire (un fichier par collection)"""
+    check_choices(collections, fmt, backend)
+    counts = run_store(lambda store: export_data(store, directory, collections, fmt, user, batch_size), backend)
+    for name, count in counts.items():
+        typer.echo(f"{name:<20} {count:>9} document(s)")
+
+
+@app.command("import")
+def import_command(
+    directory: Path,
+    fmt: str = typer.Option("ndjson", "--format", help="ndjson ou parquet"),
+    collections: List[str] = typer.Option(list(EXPORT_COLLECTIONS), "--collection", help="Collection à importer (répétable)"),
+    user: str = typer.Option(None, help="Un seul joueur (les catalogues sont importés en entier)"),
+    replace: bool = typer.Option(False, help="Vide d'abord la collection (ou les données du joueur)"),
+    backend: str = typer.Option(None, help="Backend cible (défaut : STORAGE_BACKEND)"),
+    batch_size: int = typer.Option(BATCH_SIZE, min=1),
+):
+    """Importe un répertoire exporté ; les documents déjà présents sont ignorés"""
+    check_choices(collections, fmt, backend)
+    # prepare() : index uniques (et migrations) en place avant d'écrire
+    results = run_store(lambda store: import_data(store, directory, collections, fmt, user, batch_size, replace), backend, prepare=True)
+    for name, result in results.items():
+        if result.get("missing"):
+            note = "fichier absent"
+        else:
+            note = "doublons ignorés" if result["duplicates"] else ""
+        typer.echo(f"{name:<20} {result['documents']:>9} document(s)  {note}".rstrip())
+
+
+def parse_grid(assignments: List[str]) -> dict:
+    """["habit_miss_damage=2,3", ...] -> {"habit_miss_damage": [2, 3]}, typés comme la valeur par défaut"""
+    defaults = {**Balance()._asdict(), **Profile()._asdict()}
+    grid = {}
+    for assignment in assignments:
+        name, _, values = assignment.partition("=")
+        if name not in defaults or not values:
+            raise typer.BadParameter(f"{assignment} (paramètres : {', '.join(defaults)})")
+        kind = type(defaults[name])
+        if kind is bool:
+            grid[name] = [v.lower() in ("1", "true", "oui", "yes") for v in values.split(",")]
+        else:
+            grid[name] = [kind(v) for v in values.split(",")]
+    return grid
+
+
+@app.command("recompute-skills")
+def recompute_skills_command(
+    user: str = typer.Option(None, help="Un seul joueur (défaut : tous)"),
+    backend: str = typer.Option(None, help="Backend (défaut : STORAGE_BACKEND)"),
+):
+    """Renormalise les compétences stockées (niveaux, EXP, titres) sur la table de progression"""
+    if backend and backend not in BACKENDS:
+        raise typer.BadParameter(f"backend inconnu : {backend} (attendus : {', '.join(BACKENDS)})")
+    query = {"user_id": user} if user else {}
+    operations = run_store(lambda store: recompute_skills(store, query), backend, prepare=True)
+    typer.echo(json.dumps({"updated": len(operations)}, indent=2))
+
+
+@app.command("compact-ledger")
+def compact_ledger_command(backend: str = typer.Option(None, help="Backend (défaut : STORAGE_BACKEND)")):
+    """Replie le journal des coins / EXP de tous les joueurs dans leurs instantanés et purge l'historique expiré"""
+    if backend and backend not in BACKENDS:
+        raise typer.BadParameter(f"backend inconnu : {backend} (attendus : {', '.join(BACKENDS)})")
+    typer.echo(json.dumps(run_store(lambda store: Ledger(store).compact(), backend, prepare=True), indent=2))
+
+
+@app.command("simulate")
+def simulate_command(
+    players: int = typer.Option(10_000, min=1),
+    days: int = typer.Option(365, min=1),
+    assignments: List[str] = typer.Option([], "--set", help="paramètre=valeur[,valeur...] (répétable) ; plusieurs valeurs : balayage"),
+    seed: int = typer.Option(0),
+):
+    """Simule l'équilibrage (PV, streaks, coins, succès) sur des joueurs synthétiques"""
+    grid = parse_grid(assignments)
+    if any(len(values) > 1 for values in grid.values()):
+        table = sweep(grid, players, days, seed=seed)
+        typer.echo(table.to_string(index=False))
+        return
+    params = {name: values[0] for name, values in grid.items()}
+    balance = Balance()._replace(**{k: v for k, v in params.items() if k in Balance._fields})
+    profile = Profile()._replace(**{k: v for k, v in params.items() if k in Profile._fields})
+    typer.echo(json.dumps(summarize(simulate(players, days, balance, profile, seed)), indent=2))
+
+
+@app.command("ensure-indexes")
+def ensure_indexes_command():
+    """Crée les index déclarés dans indexes.py"""
+    result = run(ensure_indexes)
+    typer.echo(json.dumps(result, indent=2))
+    if result["failed"]:
+        raise typer.Exit(code=1)
+
+
+@app.command("check-indexes")
+def check_indexes_command():
+    """explain() sur les requêtes des routes ; code de sortie 1 si un COLLSCAN subsiste"""
+    queries = run(explain_queries)
+    for q in queries:
+        flag = "COLLSCAN" if q["collscan"] else "ok"
+        typer.echo(f"{flag:<9} {q['collection']:<17} {q['route']}  [{', '.join(q['stages'])}]")
+    if any(q["collscan"] for q in queries):
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import socket
+from contextlib import asynccontextmanager
+from typing import NamedTuple
+
+import orjson
+
+# --- EVENEMENTS POUSSES AUX CLIENTS (SSE) ---
+# Les routes qui changent l'état d'un joueur (habitudes, missions, compétences,
+# achats, daily reset) publient les champs modifiés ; GET /api/events les pousse
+# en Server-Sent Events au lieu d'un polling de /api/stats. La diffusion se fait
+# en mémoire, par joueur ; avec plusieurs workers, un relais (SocketRelay) fait
+# suivre chaque événement aux autres processus de la machine.
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15.0
+MAX_DATAGRAM = 65536
+
+
+class Event(NamedTuple):
+    user_id: str
+    event: str
+    data: dict
+
+
+class Broadcaster:
+    """Diffuse les événements d'un joueur à ses abonnés (une file bornée par connexion)"""
+
+    def __init__(self, relay=None, queue_size: int = 100):
+        self.relay = relay
+        self.queue_size = queue_size
+        self._subscribers = {}
+
+    def subscribers(self, user_id: str) -> int:
+        return len(self._subscribers.get(user_id, ()))
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(user_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id: str, event: str, data: dict):
+        """Sans attente : livré aux abonnés locaux puis relayé aux autres workers"""
+        message = Event(user_id, event, data)
+        self.deliver(message)
+        if self.relay is not None:
+            self.relay.send(message)
+
+    def deliver(self, message: Event):
+        for queue in self._subscribers.get(message.user_id, ()):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Client trop lent : on jette sa file et il relit tout son état
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(Event(message.user_id, "resync", {}))
+
+    async def start(self):
+        if self.relay is not None:
+            await self.relay.start(self.deliver)
+
+    async def stop(self):
+        if self.relay is not None:
+            await self.relay.stop()
+
+
+class SocketRelay:
+    """Relais entre les workers d'une même machine : un socket Unix (datagrammes) par worker dans `directory`"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        self._sock = None
+
+    async def start(self, deliver):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._receive, deliver)
+
+    def _receive(self, deliver):
+        while True:
+            try:
+                data = self._sock.recv(MAX_DATAGRAM)
+            except BlockingIOError:
+                return
+            try:
+                deliver(Event(*orjson.loads(data)))
+            except Exception:
+                logger.exception("Événement relayé illisible")
+
+    def send(self, message: Event):
+        if self._sock is None:
+            return
+        data = orjson.dumps(list(message), default=str)
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if path == self.path or not name.endswith(".sock"):
+                continue
+            try:
+                self._sock.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker arrêté sans nettoyage
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except (BlockingIOError, OSError):
+                logger.warning("Événement non relayé vers %s", path)
+
+    async def stop(self):
+        if self._sock is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def relay_from_env():
+    """EVENTS_RELAY_DIR active le relais entre workers (uvicorn --workers N)"""
+    directory = os.environ.get("EVENTS_RELAY_DIR")
+    return SocketRelay(directory) if directory else None
+
+
+def format_event(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data, default=str) + b"\n\n"
+
+
+async def sse_stream(broadcaster: Broadcaster, user_id: str, snapshot, is_disconnected, heartbeat: float = HEARTBEAT_SECONDS):
+    """État complet à la connexion (snapshot()), puis les événements du joueur et un ping régulier"""
+    async with broadcaster.subscribe(user_id) as queue:
+        # Abonné avant la lecture : aucun changement ne passe entre les deux
+        yield format_event("stats", await snapshot())
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield b": ping\n\n"
+                continue
+            yield format_event(message.event, message.data)
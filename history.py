@@ -0,0 +1,68 @@
+from datetime import date, timedelta
+
+# --- HISTORIQUE COMPACT DES HABITUDES ---
+# Un document par (joueur, habitude, année) dans habit_history, avec un masque de bits
+# par mois : m01 ... m12, le bit (jour - 1) vaut 1 si l'habitude a été faite.
+# 31 jours tiennent dans un int32 positif, et $bit permet une mise à jour atomique.
+
+DEFAULT_RANGE_DAYS = 365
+# Au-delà, une seule requête pourrait parcourir des milliers d'années de documents
+MAX_RANGE_DAYS = 5 * 366
+
+
+def month_field(month: int) -> str:
+    return f"m{month:02d}"
+
+
+def mark_done(user_id: str, habit_id: str, day: date) -> tuple:
+    """(filtre, update) qui coche un jour ; à utiliser avec upsert=True"""
+    return (
+        {"user_id": user_id, "habit_id": habit_id, "year": day.year},
+        {"$bit": {month_field(day.month): {"or": 1 << (day.day - 1)}}},
+    )
+
+
+def encode(days) -> dict:
+    """Dates ISO -> {année: {champ mois: masque}}"""
+    years = {}
+    for iso in days:
+        day = date.fromisoformat(iso)
+        months = years.setdefault(day.year, {})
+        field = month_field(day.month)
+        months[field] = months.get(field, 0) | 1 << (day.day - 1)
+    return years
+
+
+def decode(doc: dict, start: date, end: date) -> list:
+    """Jours cochés d'un document annuel, bornés à [start, end]"""
+    year = doc["year"]
+    days = []
+    for month in range(1, 13):
+        mask = doc.get(month_field(month), 0)
+        while mask:
+            bit = mask & -mask
+            day = date(year, month, bit.bit_length())
+            if start <= day <= end:
+                days.append(day.isoformat())
+            mask ^= bit
+    return days
+
+
+def range_filter(user_id: str, habit_ids, start: date, end: date) -> dict:
+    """Filtre des documents annuels d'un joueur couvrant [start, end]"""
+    query = {"user_id": user_id, "year": {"$gte": start.year, "$lte": end.year}}
+    if habit_ids is not None:
+        query["habit_id"] = {"$in": list(habit_ids)}
+    return query
+
+
+def parse_range(start: str = None, end: str = None, today: str = None, default_days: int = DEFAULT_RANGE_DAYS,
+                max_days: int = MAX_RANGE_DAYS) -> tuple:
+    """Bornes ISO optionnelles -> (start, end) ; par défaut les `default_days` derniers jours, au plus `max_days`"""
+    end_day = date.fromisoformat(end or today or date.today().isoformat())
+    start_day = date.fromisoformat(start) if start else end_day - timedelta(days=default_days - 1)
+    if start_day > end_day:
+        raise ValueError("start > end")
+    if (end_day - start_day).days >= max_days:
+        raise ValueError(f"période de plus de {max_days} jours")
+    return start_day, end_day
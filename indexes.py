@@ -0,0 +1,196 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+# --- INDEX DES COLLECTIONS ---
+# Tous les index sont déclarés ici et créés au démarrage (create_indexes est
+# idempotent) ; les index des données de jeu commencent tous par user_id.
+# QUERY_PLANS recense les requêtes filtrées des routes : explain() permet de
+# vérifier qu'aucune ne retombe sur un COLLSCAN.
+
+logger = logging.getLogger(__name__)
+
+
+def user_key(*fields, unique: bool = False, **options) -> IndexModel:
+    """Index composé mené par user_id (ex : user_key("id", unique=True))"""
+    keys = [("user_id", ASCENDING)] + [f if isinstance(f, tuple) else (f, ASCENDING) for f in fields]
+    return IndexModel(keys, unique=unique, **options)
+
+
+INDEXES = {
+    "user_stats": [
+        user_key(unique=True),
+        # Seaux du scheduler : joueurs d'un fuseau en retard d'au moins un jour (tous joueurs confondus)
+        IndexModel([("timezone", ASCENDING), ("last_streak_update", ASCENDING)]),
+    ],
+    "habits": [user_key("id", unique=True)],
+    "habit_history": [user_key("habit_id", "year", unique=True), user_key("year")],
+    "missions": [
+        user_key("id", unique=True),
+        # Listes du jour et missions manquées du daily reset
+        user_key("date", "crucial"),
+        user_key("toggle_token"),
+    ],
+    # Compteurs de quotas : l'unicité (joueur, jour) refuse une réservation au-delà du quota (quotas.py)
+    "mission_quotas": [user_key("date", unique=True)],
+    "skills": [user_key("id", unique=True)],
+    "achievement_unlocks": [user_key("id", unique=True)],
+    "daily_reviews": [
+        user_key("id", unique=True),
+        user_key(("date", DESCENDING), ("_id", DESCENDING)),
+        # Recherche dans les notes : index texte préfixé par user_id (la recherche fixe toujours le joueur)
+        user_key(("notes", TEXT), default_language="french"),
+    ],
+    "daily_outcomes": [user_key("date", unique=True)],
+    "daily_rollups": [user_key("month", unique=True)],
+    "ledger": [user_key("key", unique=True)],
+    "ledger_snapshots": [user_key(("last_entry_id", DESCENDING))],
+    # Catalogues communs à tous les joueurs
+    "shop_items": [IndexModel([("id", ASCENDING)], unique=True)],
+    "achievements": [IndexModel([("id", ASCENDING)], unique=True)],
+}
+
+# Index des versions précédentes, remplacés par ceux d'INDEXES (id unique tous
+# joueurs confondus, index sans user_id en tête) : les seuls que ensure_indexes supprime
+LEGACY_INDEXES = {
+    "user_stats": ["id_unique"],
+    "habits": ["id_unique"],
+    "habit_history": ["habit_id_1_year_1", "year_1"],
+    "missions": ["id_unique", "date_1_crucial_1", "toggle_token_1"],
+    "skills": ["id_unique"],
+    "daily_reviews": ["id_unique", "date_-1__id_-1"],
+    "daily_outcomes": ["date_1"],
+    "daily_rollups": ["month_1"],
+    "ledger": ["key_1"],
+    "ledger_snapshots": ["last_entry_id_-1"],
+    "shop_items": ["id_unique"],
+    "achievements": ["id_unique", "unlocked_1"],
+}
+
+# Clés de partitionnement : user_id en tête, complété par le reste de l'index
+# unique de la collection (un index unique doit commencer par la clé de partition).
+# Les catalogues et cache_versions restent sur le shard primaire.
+SHARD_KEYS = {
+    "user_stats": {"user_id": 1},
+    "habits": {"user_id": 1, "id": 1},
+    "habit_history": {"user_id": 1, "habit_id": 1},
+    "missions": {"user_id": 1, "id": 1},
+    "mission_quotas": {"user_id": 1, "date": 1},
+    "skills": {"user_id": 1, "id": 1},
+    "achievement_unlocks": {"user_id": 1, "id": 1},
+    "daily_reviews": {"user_id": 1, "id": 1},
+    "daily_outcomes": {"user_id": 1, "date": 1},
+    "daily_rollups": {"user_id": 1, "month": 1},
+    "ledger": {"user_id": 1, "key": 1},
+    "ledger_snapshots": {"user_id": 1},
+}
+
+
+async def ensure_indexes(db, indexes: dict = INDEXES, legacy: dict = LEGACY_INDEXES) -> dict:
+    """Remplace les anciens index connus par ceux déclarés ; les index inconnus (TTL, index
+    ad hoc posés par un opérateur) sont signalés sans être touchés, et une collection en
+    échec (ex : doublons d'id) est signalée sans bloquer le démarrage"""
+    created, dropped, unknown, failed = {}, {}, {}, {}
+    for name, models in indexes.items():
+        try:
+            existing = await db[name].index_information()
+            # Avant la création : un ancien index sur les mêmes champs sous un autre nom la ferait échouer
+            stale = [index for index in legacy.get(name, ()) if index in existing]
+            for index in stale:
+                await db[name].drop_index(index)
+            declared = set(await db[name].create_indexes(models))
+            created[name] = sorted(declared)
+            if stale:
+                dropped[name] = stale
+            extra = sorted(index for index in existing if index != "_id_" and index not in declared and index not in stale)
+            if extra:
+                unknown[name] = extra
+                logger.warning("Index non déclarés sur %s (conservés) : %s", name, ", ".join(extra))
+        except OperationFailure as exc:
+            failed[name] = str(exc)
+            logger.error("Index de %s non créés : %s", name, exc)
+    return {"created": created, "dropped": dropped, "unknown": unknown, "failed": failed}
+
+
+async def shard_collections(client, db_name: str, shard_keys: dict = SHARD_KEYS) -> dict:
+    """Active le partitionnement de la base (cluster mongos) selon SHARD_KEYS"""
+    await client.admin.command("enableSharding", db_name)
+    sharded = {}
+    for name, key in shard_keys.items():
+        await client.admin.command("shardCollection", f"{db_name}.{name}", key=key)
+        sharded[name] = key
+    return sharded
+
+
+# (route, collection, commande) : find -> (filtre, tri), aggregate -> pipeline.
+# Les valeurs n'ont pas d'importance pour le plan, seules les formes comptent.
+QUERY_PLANS = [
+    ("daily reset (missions manquées)", "missions", "find",
+     ({"user_id": "", "date": {"$gte": "", "$lt": ""}, "completed": {"$ne": True}}, None)),
+    ("daily reset (habitudes)", "habits", "find", ({"user_id": ""}, None)),
+    ("scheduler", "user_stats", "find", ({"timezone": "UTC", "last_streak_update": {"$lt": ""}}, None)),
+    ("GET /api/stats", "user_stats", "find", ({"user_id": ""}, None)),
+    ("PATCH /api/habits/{habit_id}", "habits", "find", ({"user_id": "", "id": ""}, None)),
+    ("POST /api/habits/complete", "habits", "find", ({"user_id": "", "id": {"$in": [""]}}, None)),
+    ("GET /api/habits/history", "habit_history", "find", ({"user_id": "", "year": {"$gte": 0, "$lte": 0}}, None)),
+    ("GET /api/habits/{habit_id}/history", "habit_history", "find",
+     ({"user_id": "", "habit_id": {"$in": [""]}, "year": {"$gte": 0, "$lte": 0}}, {"year": 1})),
+    ("GET /api/missions?date=", "missions", "find", ({"user_id": "", "date": ""}, {"_id": 1})),
+    ("PATCH /api/missions/{mission_id}", "missions", "find", ({"user_id": "", "id": "", "completed": {"$ne": True}}, None)),
+    ("POST /api/missions/complete", "missions", "find", ({"user_id": "", "toggle_token": ""}, None)),
+    ("POST /api/missions (quota)", "mission_quotas", "find", ({"user_id": "", "date": "", "crucial": {"$lte": 0}}, None)),
+    ("PATCH /api/skills/{skill_id}", "skills", "find", ({"user_id": "", "id": ""}, None)),
+    ("POST /api/shop/purchase", "shop_items", "find", ({"id": ""}, None)),
+    ("achievements (débloqués)", "achievement_unlocks", "find", ({"user_id": ""}, None)),
+    ("GET /api/reviews", "daily_reviews", "find", ({"user_id": ""}, {"date": -1, "_id": -1})),
+    ("GET /api/reviews?start=&end=", "daily_reviews", "find",
+     ({"user_id": "", "date": {"$gte": "", "$lte": ""}}, {"date": -1, "_id": -1})),
+    ("GET /api/reviews/search", "daily_reviews", "aggregate", [
+        {"$match": {"user_id": "", "$text": {"$search": "x"}, "date": {"$gte": "", "$lte": ""}}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$sort": {"score": -1, "_id": -1}},
+    ]),
+    ("GET /api/history/daily", "daily_outcomes", "find",
+     ({"user_id": "", "date": {"$gte": "", "$lte": ""}}, {"date": 1})),
+    ("GET /api/history/monthly/{month}", "daily_rollups", "find", ({"user_id": "", "month": ""}, None)),
+    ("ledger (idempotence)", "ledger", "find", ({"user_id": "", "key": ""}, None)),
+    ("ledger (instantané)", "ledger_snapshots", "find", ({"user_id": ""}, {"last_entry_id": -1})),
+]
+
+
+def plan_stages(explain) -> list:
+    """Toutes les étapes (stage) d'un plan d'exécution, quelle que soit sa forme"""
+    stages = []
+    if isinstance(explain, dict):
+        if isinstance(explain.get("stage"), str):
+            stages.append(explain["stage"])
+        for key, value in explain.items():
+            if key != "rejectedPlans":
+                stages.extend(plan_stages(value))
+    elif isinstance(explain, list):
+        for value in explain:
+            stages.extend(plan_stages(value))
+    return stages
+
+
+async def explain_queries(db, plans: list = QUERY_PLANS) -> list:
+    """Plan gagnant de chaque requête de route ; collscan=True si elle parcourt toute la collection"""
+    report = []
+    for route, collection, command, shape in plans:
+        if command == "find":
+            query, sort = shape
+            cmd = {"find": collection, "filter": query}
+            if sort:
+                cmd["sort"] = sort
+        else:
+            cmd = {"aggregate": collection, "pipeline": shape, "cursor": {}}
+        explain = await db.command({"explain": cmd, "verbosity": "queryPlanner"})
+        stages = plan_stages(explain)
+        report.append({
+            "route": route,
+            "collection": collection,
+            "stages": sorted(set(stages)),
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
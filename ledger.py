@@ -0,0 +1,152 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from storage import DuplicateKey
+
+# --- JOURNAL DES COINS ET DE L'EXP ---
+# Chaque gain ou dépense est ajouté (jamais modifié) dans ledger avec une clé
+# d'idempotence unique : rejouer une requête avec la même clé renvoie la réponse
+# enregistrée sans rien réappliquer. Les soldes restent dans user_stats / skills ;
+# le journal permet de les reconstruire à partir du dernier instantané
+# (ledger_snapshots) sans relire tout l'historique. Entrées, clés et instantanés
+# sont propres à chaque joueur (user_id).
+
+PENDING = "pending"
+APPLIED = "applied"
+
+
+class LedgerConflict(Exception):
+    """Une requête avec la même clé d'idempotence est encore en cours"""
+
+
+class LedgerMismatch(Exception):
+    """La clé d'idempotence a déjà servi à une autre opération"""
+
+
+class Ledger:
+    def __init__(self, store, entries: str = "ledger", snapshots: str = "ledger_snapshots", retention: timedelta = timedelta(hours=24),
+                 settle_delay: timedelta = timedelta(seconds=60), keep_snapshots: int = 2):
+        self.store = store
+        self.entries = entries
+        self.snapshots = snapshots
+        # Durée pendant laquelle une clé d'idempotence reste connue
+        self.retention = retention
+        # Les écritures plus récentes ne sont pas encore figées dans un instantané
+        self.settle_delay = settle_delay
+        self.keep_snapshots = keep_snapshots
+
+    async def claim(self, user_id: str, key: str, kind: str, request: str = None):
+        """Réserve une clé pour une opération (kind, request) ; retourne l'entrée existante si la même
+        opération l'a déjà utilisée, sinon None"""
+        try:
+            await self.store.insert_one(self.entries, {
+                "user_id": user_id, "key": key, "kind": kind, "request": request, "status": PENDING, "ts": now()
+            })
+        except DuplicateKey:
+            existing = await self.store.find_one(self.entries, {"user_id": user_id, "key": key}, {"_id": 0})
+            # Les entrées enregistrées avant la signature des requêtes n'ont que leur kind
+            if existing is not None and (existing["kind"] != kind or existing.get("request", request) != request):
+                raise LedgerMismatch(key)
+            if existing is None or existing["status"] == PENDING:
+                raise LedgerConflict(key)
+            return existing
+        return None
+
+    async def release(self, user_id: str, key: str):
+        """Libère une clé réservée dont l'opération a échoué"""
+        await self.store.delete_one(self.entries, {"user_id": user_id, "key": key, "status": PENDING})
+
+    async def record(self, user_id: str, kind: str, coins: int = 0, exp: dict = None, response=None, key: str = None, claimed: bool = False):
+        """Ajoute (ou finalise, si la clé a été réservée) une entrée du journal"""
+        entry = {
+            "kind": kind,
+            "status": APPLIED,
+            "coins": coins,
+            "exp": {skill: delta for skill, delta in (exp or {}).items() if delta},
+            "response": response,
+            "ts": now(),
+        }
+        if claimed:
+            await self.store.update_one(self.entries, {"user_id": user_id, "key": key}, {"$set": entry})
+        else:
+            await self.store.insert_one(self.entries, {"user_id": user_id, "key": key or str(uuid.uuid4()), **entry})
+
+    async def last_snapshot(self, user_id: str) -> dict:
+        snapshot = await self.store.find_one(self.snapshots, {"user_id": user_id}, {"_id": 0}, sort=[("last_entry_id", -1)])
+        return snapshot or {"user_id": user_id, "last_entry_id": None, "coins": 0, "exp": {}}
+
+    async def sum_entries(self, user_id: str, after, before=None) -> dict:
+        """Somme des entrées appliquées d'un joueur dans (after, before), en une agrégation"""
+        id_range = {}
+        if after is not None:
+            id_range["$gt"] = after
+        if before is not None:
+            id_range["$lt"] = before
+        match = {"user_id": user_id, "status": APPLIED}
+        if id_range:
+            match["_id"] = id_range
+        return await self.store.ledger_totals(match)
+
+    async def balances(self, user_id: str) -> dict:
+        """Soldes reconstruits : dernier instantané + entrées postérieures"""
+        snapshot = await self.last_snapshot(user_id)
+        delta = await self.sum_entries(user_id, snapshot["last_entry_id"])
+        return {
+            "coins": snapshot["coins"] + delta["coins"],
+            "exp": merge(snapshot["exp"], delta["exp"]),
+            "snapshot_entry_id": str(snapshot["last_entry_id"]) if snapshot["last_entry_id"] else None,
+            "entries_replayed": delta["count"],
+        }
+
+    async def snapshot(self, user_id: str, coins: int, exp: dict, boundary: ObjectId = None):
+        """Fige des soldes connus à une borne donnée (par défaut : maintenant)"""
+        boundary = boundary or ObjectId.from_datetime(now())
+        await self.store.insert_one(self.snapshots, {
+            "user_id": user_id, "last_entry_id": boundary, "coins": coins, "exp": exp, "created_at": now()
+        })
+
+    async def compact_user(self, user_id: str, boundary: ObjectId) -> int:
+        """Replie dans un nouvel instantané les entrées d'un joueur antérieures à `boundary`"""
+        snapshot = await self.last_snapshot(user_id)
+        if snapshot["last_entry_id"] is not None and snapshot["last_entry_id"] >= boundary:
+            return 0
+
+        delta = await self.sum_entries(user_id, snapshot["last_entry_id"], boundary)
+        if not delta["count"]:
+            return 0
+        await self.snapshot(user_id, snapshot["coins"] + delta["coins"], merge(snapshot["exp"], delta["exp"]), boundary)
+        old = await self.store.find(self.snapshots, {"user_id": user_id}, {"_id": 1}, sort=[("last_entry_id", -1)], skip=self.keep_snapshots)
+        if old:
+            await self.store.delete_many(self.snapshots, {"_id": {"$in": [s["_id"] for s in old]}})
+        return delta["count"]
+
+    async def compact(self) -> dict:
+        """Replie les entrées stabilisées de chaque joueur et purge l'historique expiré"""
+        boundary = ObjectId.from_datetime(now() - self.settle_delay)
+        # Seuls les joueurs ayant écrit depuis leur dernier instantané ont quelque chose à replier
+        user_ids = await self.store.distinct(self.entries, "user_id", {"_id": {"$lt": boundary}, "status": APPLIED})
+        folded = 0
+        for user_id in user_ids:
+            folded += await self.compact_user(user_id, boundary)
+
+        # Les entrées déjà repliées ne servent plus qu'à l'idempotence : on garde `retention`
+        expired = ObjectId.from_datetime(min(boundary.generation_time, now() - self.retention))
+        deleted = await self.store.delete_many(self.entries, {"_id": {"$lt": expired}})
+        return {"players": len(user_ids), "folded": folded, "deleted": deleted}
+
+    async def reset(self, user_id: str):
+        await self.store.delete_many(self.entries, {"user_id": user_id})
+        await self.store.delete_many(self.snapshots, {"user_id": user_id})
+
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def merge(base: dict, delta: dict) -> dict:
+    merged = dict(base)
+    for key, value in delta.items():
+        merged[key] = merged.get(key, 0) + value
+    return merged
@@ -0,0 +1,216 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+
+from pymongo import monitoring
+
+# --- METRIQUES (FORMAT PROMETHEUS) ---
+# Le middleware mesure chaque requête HTTP et rattache à sa route les commandes
+# MongoDB qu'elle déclenche : Motor exécute pymongo dans un pool de threads en
+# copiant le contexte, donc le listener retrouve la requête courante via une
+# ContextVar. Les commandes lancées hors requête (scheduler, compaction) sont
+# comptées sous la route "background". Tout est exposé en texte sur /metrics.
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUND_TRIP_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55)
+BACKGROUND_ROUTE = "background"
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class RequestContext:
+    """Ce que le listener sait de la requête en cours"""
+    __slots__ = ("scope", "commands", "mongo_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.commands = 0
+        self.mongo_seconds = 0.0
+
+
+_current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class Metrics:
+    def __init__(self, slow_request_ms: float = None):
+        self.slow_request_ms = slow_request_ms
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._routes_source = None
+        # (méthode, route, statut) -> Histogram
+        self.requests = {}
+        # route -> Histogram du nombre d'allers-retours MongoDB par requête
+        self.round_trips = {}
+        # (route, collection, commande) -> [nombre, échecs, secondes]
+        self.mongo = {}
+        self.command_listener = MongoCommandListener(self)
+
+    def route_of(self, scope) -> str:
+        """Gabarit de la route résolue par le routeur (ex : /api/habits/{habit_id})"""
+        endpoint = scope.get("endpoint")
+        app = scope.get("app")
+        if endpoint is None or app is None:
+            return UNMATCHED_ROUTE
+        if self._routes_source is not app:
+            self._routes = {getattr(r, "endpoint", None): r.path for r in app.routes}
+            self._routes_source = app
+        return self._routes.get(endpoint, UNMATCHED_ROUTE)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, context: RequestContext):
+        with self._lock:
+            key = (method, route, str(status))
+            if key not in self.requests:
+                self.requests[key] = Histogram(LATENCY_BUCKETS)
+            self.requests[key].observe(seconds)
+            if route not in self.round_trips:
+                self.round_trips[route] = Histogram(ROUND_TRIP_BUCKETS)
+            self.round_trips[route].observe(context.commands)
+
+        if self.slow_request_ms is not None and seconds * 1000 >= self.slow_request_ms:
+            logger.warning(
+                "Requête lente : %s %s -> %s en %.1f ms (%d commandes MongoDB, %.1f ms côté base)",
+                method, route, status, seconds * 1000, context.commands, context.mongo_seconds * 1000,
+            )
+
+    def observe_command(self, collection: str, command: str, seconds: float, failed: bool):
+        context = _current_request.get()
+        route = self.route_of(context.scope) if context is not None else BACKGROUND_ROUTE
+        if context is not None:
+            context.commands += 1
+            context.mongo_seconds += seconds
+        with self._lock:
+            totals = self.mongo.setdefault((route, collection, command), [0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += int(failed)
+            totals[2] += seconds
+
+    def render(self) -> str:
+        """Exposition au format texte Prometheus 0.0.4"""
+        lines = []
+        with self._lock:
+            lines += histogram_lines(
+                "http_request_duration_seconds", "Durée des requêtes HTTP par route",
+                self.requests, ("method", "route", "status"),
+            )
+            lines += histogram_lines(
+                "mongo_round_trips_per_request", "Commandes MongoDB envoyées par requête HTTP",
+                {(route,): h for route, h in self.round_trips.items()}, ("route",),
+            )
+            mongo_labels = ("route", "collection", "command")
+            for name, index, kind, help_text in (
+                ("mongo_commands_total", 0, "counter", "Commandes MongoDB par route et par collection"),
+                ("mongo_command_failures_total", 1, "counter", "Commandes MongoDB en échec"),
+                ("mongo_command_duration_seconds_total", 2, "counter", "Temps passé dans MongoDB"),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for key, totals in sorted(self.mongo.items()):
+                    lines.append(f"{name}{{{labels(mongo_labels, key)}}} {format_value(totals[index])}")
+        return "\n".join(lines) + "\n"
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Compte les commandes MongoDB (= allers-retours) par collection et par route"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        # getMore porte l'id du curseur ; la collection est dans un champ à part
+        collection = target if isinstance(target, str) else event.command.get("collection", "")
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "")
+        self.metrics.observe_command(collection, event.command_name, event.duration_micros / 1e6, failed)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : chronomètre la requête et ouvre le contexte lu par le listener"""
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        context = RequestContext(scope)
+        token = _current_request.set(context)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_request.reset(token)
+            self.metrics.observe_request(scope["method"], self.metrics.route_of(scope), status, elapsed, context)
+
+
+def slow_request_threshold() -> float:
+    """Seuil du log des requêtes lentes (SLOW_REQUEST_MS), désactivé si absent"""
+    value = os.environ.get("SLOW_REQUEST_MS")
+    return float(value) if value else None
+
+
+def histogram_lines(name: str, help_text: str, histograms: dict, label_names: tuple) -> list:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, histogram in sorted(histograms.items()):
+        base = labels(label_names, key)
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{base},le="{format_value(bound)}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{base},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{base}}} {format_value(histogram.sum)}")
+        lines.append(f"{name}_count{{{base}}} {histogram.count}")
+    return lines
+
+
+def labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{n}="{escape(str(v))}"' for n, v in zip(names, values))
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,63 @@
+# --- JOURNAL DES BILANS QUOTIDIENS ---
+# Chaque jour réglé par le daily reset est écrit une seule fois dans daily_outcomes.
+# Des compteurs cumulés (dans user_stats) et des agrégats mensuels (daily_rollups)
+# sont incrémentés au même moment : les succès « journées parfaites » et les
+# questions du type « comment s'est passé le mois dernier » sont des lectures directes.
+
+# Champ du bilan -> compteur cumulé dans user_stats
+STATS_COUNTERS = {
+    "perfect": "perfect_days",
+    "damage": "total_damage_taken",
+    "shield_used": "shields_used",
+    "died": "deaths",
+}
+
+# Champ du bilan -> compteur de l'agrégat mensuel
+ROLLUP_COUNTERS = {
+    "perfect": "perfect_days",
+    "damage": "damage",
+    "shield_used": "shields_used",
+    "died": "deaths",
+    "missed_habits": "missed_habits",
+    "missed_missions": "missed_missions",
+}
+
+
+def outcome_document(user_id: str, day: str, missed_habits: int, missed_crucial: int, missed_normal: int,
+                     potential_damage: int, outcome: dict, state: dict) -> dict:
+    return {
+        "user_id": user_id,
+        "date": day,
+        "missed_habits": missed_habits,
+        "missed_crucial": missed_crucial,
+        "missed_normal": missed_normal,
+        "missed_missions": missed_crucial + missed_normal,
+        "potential_damage": potential_damage,
+        "damage": outcome["damage"],
+        "shield_used": outcome["shield_used"],
+        "perfect": outcome["perfect"],
+        "died": outcome["died"],
+        "hp": state["hp"],
+        "coins": state["coins"],
+        "streak": state["streak"],
+    }
+
+
+def sum_counters(outcomes: list, mapping: dict) -> dict:
+    """Somme des champs des bilans (les booléens comptent pour 1) sous les noms de compteurs"""
+    return {counter: sum(int(o[field]) for o in outcomes) for field, counter in mapping.items()}
+
+
+def stats_increments(outcomes: list) -> dict:
+    return {**sum_counters(outcomes, STATS_COUNTERS), "days_settled": len(outcomes)}
+
+
+def rollup_operations(user_id: str, outcomes: list) -> list:
+    """(filtre, $inc) par mois touché, à appliquer en upsert"""
+    months = {}
+    for o in outcomes:
+        months.setdefault(o["date"][:7], []).append(o)
+    return [
+        ({"user_id": user_id, "month": month}, {"$inc": {**sum_counters(items, ROLLUP_COUNTERS), "days": len(items)}})
+        for month, items in months.items()
+    ]
@@ -0,0 +1,95 @@
+import base64
+
+import orjson
+from bson import json_util
+
+# --- PAGINATION PAR CURSEUR (KEYSET) ---
+# Le curseur encode les valeurs de tri du dernier document renvoyé :
+# la page suivante repart de là avec un filtre indexé, sans skip.
+
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Tri par défaut : ordre d'insertion (_id), qui est aussi l'ordre historique des listes
+INSERTION_ORDER = [("_id", 1)]
+# Recherche plein texte : du plus pertinent au moins pertinent, puis du plus récent
+RELEVANCE_ORDER = [("score", -1), ("_id", -1)]
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    return values
+
+
+def after_filter(sort: list, values: list) -> dict:
+    """Filtre « strictement après » pour un tri composé, ex : (a > x) ou (a = x et b > y)"""
+    if len(values) != len(sort):
+        raise ValueError("invalid cursor")
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def page_query(query: dict, sort: list, after: str = None) -> dict:
+    if not after:
+        return query
+    keyset = after_filter(sort, decode_cursor(after))
+    return {"$and": [query, keyset]} if query else keyset
+
+
+def _with_fields(projection: dict, fields: list) -> dict:
+    """Projection qui garde les champs de tri (le curseur en a besoin)"""
+    projection = dict(projection or {})
+    if projection and any(v for v in projection.values()):
+        projection.update({field: 1 for field in fields})
+    else:
+        for field in fields:
+            projection.pop(field, None)
+    return projection
+
+
+def _page(docs: list, fields: list, limit: int) -> tuple:
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor([docs[-1][field] for field in fields])
+    for doc in docs:
+        doc.pop("_id", None)
+    return docs, next_cursor
+
+
+async def fetch_page(store, collection: str, query: dict, sort: list, limit: int, after: str = None, projection: dict = None) -> tuple:
+    """Retourne (documents, curseur suivant ou None) ; lit limit + 1 documents pour savoir s'il reste une page"""
+    fields = [field for field, _ in sort]
+    docs = await store.find(collection, page_query(query, sort, after), _with_fields(projection, fields), sort=sort, limit=limit + 1)
+    return _page(docs, fields, limit)
+
+
+async def fetch_search_page(store, collection: str, text: str, query: dict, limit: int, after: str = None,
+                            projection: dict = None) -> tuple:
+    """Comme fetch_page pour une recherche plein texte, triée par pertinence (le curseur porte [score, _id])"""
+    fields = [field for field, _ in RELEVANCE_ORDER]
+    keyset = decode_cursor(after) if after else None
+    if keyset is not None and len(keyset) != len(fields):
+        raise ValueError("invalid cursor")
+    docs = await store.search(collection, text, query, _with_fields(projection, fields), limit=limit + 1, after=keyset)
+    return _page(docs, fields, limit)
+
+
+async def stream_ndjson(documents):
+    """Génère une ligne JSON par document, directement depuis le parcours du Storage"""
+    async for doc in documents:
+        doc.pop("_id", None)
+        yield orjson.dumps(doc, default=str, option=orjson.OPT_APPEND_NEWLINE)
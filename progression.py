@@ -0,0 +1,210 @@
+from bisect import bisect_right
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from rules import LEVEL_EXP_GROWTH
+
+# --- DEFINITION DES RANGS (TITRES) ---
+SKILL_RANKS = {
+    "tech": {
+        1: "Noob", 2: "Script Kiddie", 3: "Debugger", 4: "Codeur", 5: "Développeur",
+        6: "Ingénieur", 7: "Hacker", 8: "Tech Lead", 9: "Architecte", 10: "Deus Ex Machina"
+    },
+    "sport": {
+        1: "Canapé", 2: "Promeneur", 3: "Échauffé", 4: "Actif", 5: "Athlète",
+        6: "Compétiteur", 7: "Spartiate", 8: "Titan", 9: "Olympien", 10: "Demi-Dieu"
+    },
+    "cooking": {
+        1: "Micro-ondes", 2: "Commis", 3: "Cuistot", 4: "Gourmet", 5: "Cuisinier",
+        6: "Chef de Partie", 7: "Sous-Chef", 8: "Chef", 9: "Chef Étoilé", 10: "Gordon Ramsay"
+    },
+    "cleaning": {
+        1: "Bordélique", 2: "Balayeur", 3: "Rangeur", 4: "Propre", 5: "Organisé",
+        6: "Méticuleux", 7: "Minimaliste", 8: "Purificateur", 9: "Maniac", 10: "Sanctuaire"
+    },
+    "culture": {
+        1: "Ignorant", 2: "Curieux", 3: "Lecteur", 4: "Cultivé", 5: "Érudit",
+        6: "Intellectuel", 7: "Savant", 8: "Philosophe", 9: "Encyclopédie", 10: "Sage"
+    },
+    "communication": {
+        1: "Timide", 2: "Observateur", 3: "Bavard", 4: "Sociable", 5: "Négociateur",
+        6: "Charismatique", 7: "Orateur", 8: "Diplomate", 9: "Leader", 10: "Voix d'Or"
+    },
+    "music": {
+        1: "Sourd", 2: "Auditeur", 3: "Rythmique", 4: "Amateur", 5: "Interprète",
+        6: "Musicien", 7: "Compositeur", 8: "Soliste", 9: "Maestro", 10: "Virtuose"
+    },
+    "languages": {
+        1: "Touriste", 2: "Élève", 3: "Débrouillard", 4: "Intermédiaire", 5: "Opérationnel",
+        6: "Fluide", 7: "Avancé", 8: "Bilingue", 9: "Polyglotte", 10: "Tour de Babel"
+    },
+    "health": {
+        1: "Fragile", 2: "Vivant", 3: "Équilibré", 4: "Reposé", 5: "Tonique",
+        6: "Robuste", 7: "Résistant", 8: "Vigoureux", 9: "Inébranlable", 10: "Immortel"
+    }
+}
+
+# --- TABLES DE PROGRESSION ---
+# L'EXP cumulée nécessaire pour chaque niveau est précalculée une fois :
+# un gain d'EXP devient une recherche dichotomique au lieu d'une boucle par niveau.
+
+BASE_MAX_EXP = 100
+# Au-delà, plus aucun niveau n'est atteignable (tient dans un int64)
+MAX_TOTAL_EXP = 2 ** 62
+
+
+class Progress(NamedTuple):
+    level: int
+    exp: int
+    max_exp: int
+    rank: str
+
+
+@lru_cache(maxsize=None)
+def get_rank(skill_id: str, level: int) -> str:
+    specific_ranks = SKILL_RANKS.get(skill_id, {})
+    if level >= 10:
+        return specific_ranks.get(10, "Maître")
+    return specific_ranks.get(level, "Novice")
+
+
+@lru_cache(maxsize=None)
+def skill_ranks(skill_id: str) -> list:
+    """Titres des niveaux 1 à 10, utilisés par les pipelines de montée de niveau"""
+    return [get_rank(skill_id, level) for level in range(1, 11)]
+
+
+class ProgressionTable:
+    """EXP cumulée par niveau à partir d'un max_exp de départ"""
+
+    def __init__(self, base_max_exp: int = BASE_MAX_EXP, start_level: int = 1):
+        self.start_level = start_level
+        self.max_exps = [base_max_exp]
+        # thresholds[i] = EXP cumulée pour atteindre le niveau start_level + i
+        self.thresholds = [0]
+        while self.thresholds[-1] < MAX_TOTAL_EXP and self.max_exps[-1] > 0:
+            self.thresholds.append(self.thresholds[-1] + self.max_exps[-1])
+            self.max_exps.append(int(self.max_exps[-1] * LEVEL_EXP_GROWTH))
+        self.thresholds_array = np.array(self.thresholds, dtype=np.int64)
+        self.max_exps_array = np.array(self.max_exps, dtype=np.int64)
+
+    def covers(self, level: int, max_exp: int) -> bool:
+        """Vrai si l'état (level, max_exp) suit bien cette courbe"""
+        index = level - self.start_level
+        return 0 <= index < len(self.max_exps) and self.max_exps[index] == max_exp
+
+    def total_exp(self, level: int, exp: int) -> int:
+        return self.thresholds[level - self.start_level] + exp
+
+    def locate(self, total_exp: int) -> tuple:
+        """EXP cumulée -> (level, exp, max_exp) en O(log n)"""
+        index = max(0, bisect_right(self.thresholds, total_exp) - 1)
+        return self.start_level + index, total_exp - self.thresholds[index], self.max_exps[index]
+
+
+@lru_cache(maxsize=None)
+def progression_table(base_max_exp: int = BASE_MAX_EXP, start_level: int = 1) -> ProgressionTable:
+    return ProgressionTable(base_max_exp, start_level)
+
+
+def table_for(level: int, max_exp: int) -> ProgressionTable:
+    """Table standard si la compétence la suit, sinon une table qui démarre à son état actuel"""
+    table = progression_table()
+    if table.covers(level, max_exp):
+        return table
+    return progression_table(max_exp, level)
+
+
+def total_exp(level: int, exp: int) -> int:
+    """EXP cumulée depuis le niveau 1 sur la courbe standard"""
+    table = progression_table()
+    index = min(max(level - table.start_level, 0), len(table.thresholds) - 1)
+    return table.thresholds[index] + exp
+
+
+def grant_exp(skill_id: str, level: int, exp: int, max_exp: int, amount: int) -> Progress:
+    """Applique un gain d'EXP (même sur plusieurs niveaux) sans boucler"""
+    new_exp = exp + amount
+    if new_exp < max_exp:
+        return Progress(level, new_exp, max_exp, get_rank(skill_id, level))
+    table = table_for(level, max_exp)
+    new_level, new_exp, new_max_exp = table.locate(table.total_exp(level, new_exp))
+    return Progress(new_level, new_exp, new_max_exp, get_rank(skill_id, new_level))
+
+
+def bulk_grant_exp(levels, exps, max_exps, amounts, base_max_exp: int = BASE_MAX_EXP) -> tuple:
+    """Version vectorisée de grant_exp sur des tableaux (toutes les compétences en une passe).
+
+    Les lignes qui ne suivent pas la courbe standard sont laissées telles quelles et
+    signalées dans le masque retourné, à traiter avec grant_exp."""
+    table = progression_table(base_max_exp)
+    levels = np.asarray(levels, dtype=np.int64)
+    exps = np.asarray(exps, dtype=np.int64)
+    max_exps = np.asarray(max_exps, dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=np.int64)
+
+    index = levels - table.start_level
+    in_table = (index >= 0) & (index < len(table.max_exps))
+    safe_index = np.clip(index, 0, len(table.max_exps) - 1)
+    on_curve = in_table & (table.max_exps_array[safe_index] == max_exps)
+
+    new_exp = exps + amounts
+    level_up = on_curve & (new_exp >= max_exps)
+    total = table.thresholds_array[safe_index] + new_exp
+    target = np.clip(np.searchsorted(table.thresholds_array, total, side="right") - 1, 0, None)
+
+    out_levels = np.where(level_up, table.start_level + target, levels)
+    out_exps = np.where(level_up, total - table.thresholds_array[target], new_exp)
+    out_max_exps = np.where(level_up, table.max_exps_array[target], max_exps)
+    return out_levels, out_exps, out_max_exps, ~on_curve
+
+
+def bulk_progress(skills: list, amounts) -> list:
+    """Recalcule (level, exp, max_exp, rank) pour une liste de documents de compétences"""
+    if not skills:
+        return []
+    levels, exps, max_exps, off_curve = bulk_grant_exp(
+        [s["level"] for s in skills], [s["exp"] for s in skills], [s["max_exp"] for s in skills], amounts
+    )
+    amounts = np.broadcast_to(np.asarray(amounts, dtype=np.int64), levels.shape)
+    results = []
+    for i, skill in enumerate(skills):
+        if off_curve[i]:
+            results.append(grant_exp(skill["id"], skill["level"], skill["exp"], skill["max_exp"], int(amounts[i])))
+        else:
+            level = int(levels[i])
+            results.append(Progress(level, int(exps[i]), int(max_exps[i]), get_rank(skill["id"], level)))
+    return results
+
+
+# --- RECALCUL DES COMPETENCES STOCKEES ---
+
+SKILL_FIELDS = {"_id": 0, "user_id": 1, "id": 1, "level": 1, "exp": 1, "max_exp": 1, "rank": 1}
+
+
+async def recompute_skills(store, query: dict = None, batch_size: int = 1000) -> list:
+    """Renormalise les compétences du filtre (tous les joueurs par défaut) par lots vectorisés ;
+    retourne les (filtre, $set) des compétences réécrites"""
+    written = []
+
+    async def flush(skills: list):
+        operations = [
+            ({"user_id": s["user_id"], "id": s["id"]}, {"$set": p._asdict()})
+            for s, p in zip(skills, bulk_progress(skills, 0))
+            if (s["level"], s["exp"], s["max_exp"], s.get("rank")) != tuple(p)
+        ]
+        if operations:
+            await store.bulk_update("skills", operations)
+            written.extend(operations)
+
+    batch = []
+    async for skill in store.iterate("skills", query or {}, SKILL_FIELDS, batch_size=batch_size):
+        batch.append(skill)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    return written
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Optional
+
+from rules import mission_quota
+from storage import DuplicateKey
+
+# --- QUOTAS JOURNALIERS DES MISSIONS ---
+# Un compteur par (joueur, jour) : {crucial, normal}. Créer des missions réserve
+# leurs places par un $inc conditionnel (le compteur doit rester <= quota) en upsert :
+#   - pas encore de compteur ce jour-là : il est créé avec la réservation ;
+#   - compteur sous le quota : il est incrémenté ;
+#   - quota atteint : le filtre ne correspond plus, l'upsert tente de créer un
+#     second compteur pour le même (joueur, jour) et l'index unique le refuse.
+# Un seul aller-retour indexé, atomique même entre requêtes parallèles : deux
+# créations ne peuvent plus passer toutes les deux la dernière place.
+# Supprimer une mission (ou échouer à l'insérer) rend sa place.
+
+QUOTAS = "mission_quotas"
+
+
+def quota_field(crucial: bool) -> str:
+    return "crucial" if crucial else "normal"
+
+
+async def reserve(store, user_id: str, day: str, crucial: bool, count: int = 1) -> bool:
+    """Réserve `count` places du jour ; False si le quota serait dépassé"""
+    quota = mission_quota(crucial)
+    if count > quota:
+        return False
+    field = quota_field(crucial)
+    query = {"user_id": user_id, "date": day, field: {"$lte": quota - count}}
+    # L'autre compteur est initialisé à 0 : sans champ, son filtre $lte ne correspondrait jamais
+    update = {"$inc": {field: count}, "$setOnInsert": {quota_field(not crucial): 0}}
+    try:
+        await store.update_one(QUOTAS, query, update, upsert=True)
+        return True
+    except DuplicateKey:
+        # Quota atteint, ou compteur créé au même instant par une autre requête : on retente sans upsert
+        return await store.update_one(QUOTAS, query, update) is not None
+
+
+async def release(store, user_id: str, day: str, crucial: bool, count: int = 1):
+    """Rend `count` places du jour (jamais en dessous de 0)"""
+    field = quota_field(crucial)
+    await store.update_one(QUOTAS, {"user_id": user_id, "date": day, field: {"$gte": count}}, {"$inc": {field: -count}})
+
+
+async def reserve_many(store, user_id: str, requested: dict) -> Optional[bool]:
+    """Réserve un lot {(jour, crucial): nombre}, tout ou rien ; retourne le `crucial` du quota dépassé, None si tout est réservé"""
+    keys = list(requested)
+    reserved = await asyncio.gather(*(reserve(store, user_id, day, crucial, requested[(day, crucial)]) for day, crucial in keys))
+    if all(reserved):
+        return None
+    await release_many(store, user_id, {key: requested[key] for key, ok in zip(keys, reserved) if ok})
+    return next(crucial for (_, crucial), ok in zip(keys, reserved) if not ok)
+
+
+async def release_many(store, user_id: str, requested: dict):
+    await asyncio.gather(*(release(store, user_id, day, crucial, count) for (day, crucial), count in requested.items()))
+
+
+def requested_places(missions: list) -> dict:
+    """{(jour, crucial): nombre} d'un lot de missions"""
+    requested = {}
+    for m in missions:
+        requested[(m.date, m.crucial)] = requested.get((m.date, m.crucial), 0) + 1
+    return requested
+
+
+async def rebuild_quotas(store, query: dict = None) -> int:
+    """Recalcule les compteurs des jours qui ont des missions dans le filtre ; nombre de compteurs écrits"""
+    counts = {}
+    projection = {"_id": 0, "user_id": 1, "date": 1, "crucial": 1}
+    async for mission in store.iterate("missions", query or {}, projection, batch_size=1000):
+        counter = counts.setdefault((mission["user_id"], mission["date"]), {"crucial": 0, "normal": 0})
+        counter[quota_field(mission.get("crucial", False))] += 1
+    operations = [({"user_id": user_id, "date": day}, {"$set": counter}) for (user_id, day), counter in counts.items()]
+    await store.bulk_update(QUOTAS, operations, upsert=True)
+    return len(operations)
+
+
+async def backfill_quotas(store) -> int:
+    """Compteurs des missions créées avant les quotas atomiques (une seule fois, tant qu'il n'existe aucun compteur)"""
+    if await store.find_one(QUOTAS, {}, {"_id": 1}) is not None:
+        return 0
+    return await rebuild_quotas(store)
@@ -0,0 +1,124 @@
+from progression import ProgressionTable, grant_exp, progression_table
+from rules import POTION_HEAL
+
+# --- MISES A JOUR ATOMIQUES DES RECOMPENSES ---
+# Chaque opération est une seule mise à jour conditionnelle côté MongoDB :
+# plus de lecture / calcul Python / réécriture, donc pas de mise à jour perdue.
+
+
+def rank_expression(ranks: list) -> dict:
+    """Expression d'agrégation qui choisit le titre à partir du champ level (ranks[0] = niveau 1)"""
+    return {"$arrayElemAt": [ranks, {"$subtract": [{"$max": [1, {"$min": ["$level", len(ranks)]}]}, 1]}]}
+
+
+def on_curve_expression(table: ProgressionTable) -> dict:
+    """Vrai si (level, max_exp) suit la table (équivalent de ProgressionTable.covers)"""
+    index = {"$subtract": ["$level", table.start_level]}
+    return {"$and": [
+        {"$gte": [index, 0]},
+        {"$lt": [index, len(table.max_exps)]},
+        {"$eq": [{"$arrayElemAt": [table.max_exps, index]}, "$max_exp"]},
+    ]}
+
+
+def grant_exp_guard(exp: int, table: ProgressionTable) -> dict:
+    """Condition ($expr) sous laquelle grant_exp_pipeline s'applique : pas de montée de niveau, ou compétence sur la table"""
+    return {"$or": [{"$lt": [{"$add": ["$exp", exp]}, "$max_exp"]}, on_curve_expression(table)]}
+
+
+def bisect_expression(thresholds: list, value) -> dict:
+    """Dichotomie en log2(n) étapes : {lo, hi} où lo est l'index du dernier seuil <= value (bisect_right - 1)"""
+    return {
+        "$reduce": {
+            "input": {"$range": [0, len(thresholds).bit_length()]},
+            "initialValue": {"lo": 0, "hi": len(thresholds)},
+            "in": {"$let": {
+                "vars": {"mid": {"$toInt": {"$trunc": {"$divide": [{"$add": ["$$value.lo", "$$value.hi"]}, 2]}}}},
+                "in": {"$cond": [
+                    {"$lte": [{"$arrayElemAt": [thresholds, "$$mid"]}, value]},
+                    {"lo": "$$mid", "hi": "$$value.hi"},
+                    {"lo": "$$value.lo", "hi": "$$mid"},
+                ]},
+            }},
+        }
+    }
+
+
+def grant_exp_pipeline(exp: int, ranks: list, table: ProgressionTable = None) -> list:
+    """Pipeline qui ajoute de l'EXP à une compétence et place le niveau sur la table de progression
+    (même calcul que progression.grant_exp, sans limite de niveaux gagnés) ; à appliquer sous grant_exp_guard"""
+    table = table or progression_table()
+    level_up = {"$gte": [{"$add": ["$exp", exp]}, "$max_exp"]}
+    return [
+        # EXP cumulée après le gain, puis index de son niveau dans la table
+        {"$set": {"_total": {"$add": [
+            {"$arrayElemAt": [table.thresholds, {"$subtract": ["$level", table.start_level]}]}, "$exp", exp,
+        ]}}},
+        {"$set": {"_bisect": bisect_expression(table.thresholds, "$_total")}},
+        {"$set": {
+            "level": {"$cond": [level_up, {"$add": ["$_bisect.lo", table.start_level]}, "$level"]},
+            "exp": {"$cond": [
+                level_up, {"$subtract": ["$_total", {"$arrayElemAt": [table.thresholds, "$_bisect.lo"]}]},
+                {"$add": ["$exp", exp]},
+            ]},
+            "max_exp": {"$cond": [level_up, {"$arrayElemAt": [table.max_exps, "$_bisect.lo"]}, "$max_exp"]},
+        }},
+        {"$set": {"rank": rank_expression(ranks)}},
+        {"$unset": ["_total", "_bisect"]},
+    ]
+
+
+def revoke_exp_pipeline(exp: int) -> list:
+    """Pipeline qui retire de l'EXP sans descendre sous 0 (pas de perte de niveau)"""
+    return [{"$set": {"exp": {"$max": [0, {"$subtract": ["$exp", exp]}]}}}]
+
+
+def grant_coins_update(coins: int) -> dict:
+    return {"$inc": {"coins": coins}}
+
+
+def revoke_coins_pipeline(coins: int) -> list:
+    """Pipeline qui retire des coins sans passer en négatif"""
+    return [{"$set": {"coins": {"$max": [0, {"$subtract": ["$coins", coins]}]}}}]
+
+
+def purchase_filter(price: int) -> dict:
+    """Garde de l'achat : le solde doit couvrir le prix"""
+    return {"coins": {"$gte": price}}
+
+
+def purchase_pipeline(item: dict) -> list:
+    """Pipeline qui débite le prix et applique l'effet de l'objet en une seule écriture"""
+    fields = {"coins": {"$subtract": ["$coins", item["price"]]}}
+    if item["type"] == "shield":
+        fields["has_shield"] = {"$literal": True}
+    elif item["type"] == "potion":
+        fields["hp"] = {"$min": [{"$add": ["$hp", POTION_HEAL]}, "$max_hp"]}
+    return [{"$set": fields}]
+
+
+# --- EQUIVALENTS PYTHON (STOCKAGE EMBARQUE) ---
+# Mêmes règles que les pipelines ci-dessus, appliquées par les backends memory / sqlite
+# au document lu dans leur transaction. Chaque fonction retourne les champs modifiés.
+
+def granted_exp(skill: dict, skill_id: str, exp: int) -> dict:
+    """Équivalent de grant_exp_pipeline : le calcul de progression.grant_exp, hors table compris"""
+    return grant_exp(skill_id, skill["level"], skill["exp"], skill["max_exp"], exp)._asdict()
+
+
+def revoked_exp(skill: dict, exp: int) -> dict:
+    return {"exp": max(0, skill["exp"] - exp)}
+
+
+def revoked_coins(stats: dict, coins: int) -> dict:
+    return {"coins": max(0, stats["coins"] - coins)}
+
+
+def purchased(stats: dict, item: dict) -> dict:
+    """Équivalent de purchase_pipeline (la garde purchase_filter est appliquée par le filtre)"""
+    fields = {"coins": stats["coins"] - item["price"]}
+    if item["type"] == "shield":
+        fields["has_shield"] = True
+    elif item["type"] == "potion":
+        fields["hp"] = min(stats["hp"] + POTION_HEAL, stats["max_hp"])
+    return fields
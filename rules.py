@@ -0,0 +1,92 @@
+import numpy as np
+
+# --- REGLES DU JEU ---
+# Constantes partagées par les routes, les mises à jour atomiques et les outils hors ligne
+
+# Récompenses des missions : (coins, exp)
+CRUCIAL_MISSION_REWARD = (50, 30)
+NORMAL_MISSION_REWARD = (20, 10)
+
+# Boutique
+POTION_HEAL = 30
+
+# Progression des compétences : max_exp est multiplié à chaque niveau
+LEVEL_EXP_GROWTH = 1.5
+
+
+def mission_reward(crucial: bool) -> tuple:
+    """Retourne (coins, exp) gagnés pour une mission"""
+    return CRUCIAL_MISSION_REWARD if crucial else NORMAL_MISSION_REWARD
+
+# Bilan quotidien : dégâts par élément manqué
+HABIT_MISS_DAMAGE = 2
+CRUCIAL_MISSION_MISS_DAMAGE = 5
+NORMAL_MISSION_MISS_DAMAGE = 2
+
+# Mort du personnage (PV = 0) : résurrection et pénalité sur les coins
+RESURRECTION_HP = 50
+DEATH_COIN_RATIO = 0.9
+
+
+def day_damage(missed_habits: int, missed_crucial: int, missed_normal: int) -> int:
+    """Dégâts potentiels d'une journée"""
+    return (missed_habits * HABIT_MISS_DAMAGE
+            + missed_crucial * CRUCIAL_MISSION_MISS_DAMAGE
+            + missed_normal * NORMAL_MISSION_MISS_DAMAGE)
+
+
+def settle_day(state: dict, damage: int) -> dict:
+    """Applique le bilan d'une journée sur state (hp, coins, streak, has_shield) et retourne son résultat"""
+    outcome = {"damage": 0, "shield_used": False, "perfect": False, "died": False}
+
+    if damage > 0:
+        if state["has_shield"]:
+            # Le bouclier casse : streak sauvé mais pas augmenté
+            state["has_shield"] = False
+            outcome["shield_used"] = True
+        else:
+            outcome["damage"] = damage
+            state["hp"] = max(0, state["hp"] - damage)
+            state["streak"] = 0
+    else:
+        # Journée parfaite (aucun dégât) -> streak +1
+        state["streak"] += 1
+        outcome["perfect"] = True
+
+    if state["hp"] == 0:
+        state["hp"] = RESURRECTION_HP
+        state["coins"] = int(state["coins"] * DEATH_COIN_RATIO)
+        state["streak"] = 0
+        outcome["died"] = True
+
+    return outcome
+
+
+def bulk_settle_day(hp, coins, streak, has_shield, damage, resurrection_hp: int = RESURRECTION_HP,
+                    death_coin_ratio: float = DEATH_COIN_RATIO) -> tuple:
+    """Version vectorisée de settle_day sur des tableaux NumPy (un joueur par ligne).
+
+    Retourne (hp, coins, streak, has_shield) après le bilan et les masques (shield_used, perfect, died)"""
+    hurt = damage > 0
+    shield_used = hurt & has_shield
+    hit = hurt & ~has_shield
+    perfect = ~hurt
+
+    hp = np.where(hit, np.maximum(0, hp - damage), hp)
+    streak = np.where(hit, 0, np.where(perfect, streak + 1, streak))
+    has_shield = has_shield & ~shield_used
+
+    died = hp == 0
+    hp = np.where(died, resurrection_hp, hp)
+    # int() de settle_day : troncature vers zéro
+    coins = np.where(died, np.trunc(coins * death_coin_ratio).astype(coins.dtype), coins)
+    streak = np.where(died, 0, streak)
+    return (hp, coins, streak, has_shield), (shield_used, perfect, died)
+
+# Quotas de missions par jour
+MAX_CRUCIAL_MISSIONS = 3
+MAX_NORMAL_MISSIONS = 7
+
+
+def mission_quota(crucial: bool) -> int:
+    return MAX_CRUCIAL_MISSIONS if crucial else MAX_NORMAL_MISSIONS
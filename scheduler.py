@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEZONE = "UTC"
+
+
+def zone(tz_name: str):
+    try:
+        return ZoneInfo(tz_name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def is_valid_timezone(tz_name: str) -> bool:
+    try:
+        ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def local_today(tz_name: str) -> str:
+    """Date du jour (ISO) dans le fuseau de l'utilisateur"""
+    return datetime.now(zone(tz_name)).date().isoformat()
+
+
+def seconds_until_midnight(tz_name: str) -> float:
+    now = datetime.now(zone(tz_name))
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+    return (midnight - now).total_seconds()
+
+
+class DailyResetScheduler:
+    """Tâche de fond qui passe les joueurs au jour suivant, par lots et par fuseau horaire"""
+
+    def __init__(self, store, reset_user, batch_size: int = 100, max_sleep: float = 900.0, collection: str = "user_stats"):
+        self.store = store
+        self.collection = collection
+        self.reset_user = reset_user
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def timezones(self) -> set:
+        found = await self.store.distinct(self.collection, "timezone")
+        return {tz for tz in found if tz} | {DEFAULT_TIMEZONE}
+
+    def bucket_filter(self, tz_name: str, today: str) -> dict:
+        # Les joueurs sans fuseau sont rangés dans le seau UTC
+        tz_filter = {"$in": [None, tz_name]} if tz_name == DEFAULT_TIMEZONE else tz_name
+        return {"timezone": tz_filter, "last_streak_update": {"$lt": today}}
+
+    async def run_once(self) -> int:
+        """Traite tous les joueurs en retard d'au moins un jour ; retourne le nombre traité"""
+        processed = 0
+        for tz_name in await self.timezones():
+            today = local_today(tz_name)
+            players = self.store.iterate(self.collection, self.bucket_filter(tz_name, today), {"_id": 0}, batch_size=self.batch_size)
+            batch = []
+            async for stats in players:
+                batch.append(stats)
+                if len(batch) >= self.batch_size:
+                    processed += await self._reset_batch(batch, today)
+                    batch = []
+            if batch:
+                processed += await self._reset_batch(batch, today)
+        return processed
+
+    async def _reset_batch(self, batch: list, today: str) -> int:
+        results = await asyncio.gather(*(self.reset_user(stats, today) for stats in batch), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Daily reset failed", exc_info=result)
+        return len(batch)
+
+    async def next_delay(self) -> float:
+        """Attente jusqu'au prochain minuit local parmi les fuseaux connus"""
+        delays = [seconds_until_midnight(tz) + 1.0 for tz in await self.timezones()]
+        return max(1.0, min(delays + [self.max_sleep]))
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.run_once()
+                if processed:
+                    logger.info("Daily reset : %d joueur(s) passés au jour suivant", processed)
+                delay = await self.next_delay()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Daily reset scheduler error")
+                delay = self.max_sleep
+            await asyncio.sleep(delay)
+
+
+class PeriodicTask:
+    """Exécute une coroutine à intervalle régulier en tâche de fond"""
+
+    def __init__(self, name: str, job, interval: float):
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                result = await self.job()
+                logger.info("%s : %s", self.name, result)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("%s failed", self.name)
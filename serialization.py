@@ -0,0 +1,64 @@
+from functools import lru_cache
+from typing import List
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+# --- SERIALISATION RAPIDE DES LECTURES ---
+# Les documents lus en base ont été écrits par l'API à partir des mêmes modèles :
+# on ne les revalide pas. La projection ne ramène que les champs du modèle, les
+# valeurs par défaut comblent les champs absents des anciens documents, et le
+# JSON est encodé par orjson. Les données venues de l'extérieur passent, elles,
+# par un TypeAdapter construit une seule fois par modèle.
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+@lru_cache(maxsize=None)
+def _projection(model, exclude: frozenset) -> tuple:
+    return tuple(name for name in model.model_fields if name not in exclude)
+
+
+def model_projection(model, exclude=()) -> dict:
+    """Projection Mongo qui ne ramène que les champs du modèle"""
+    return {"_id": 0, **{name: 1 for name in _projection(model, frozenset(exclude))}}
+
+
+_MISSING = object()
+
+
+@lru_cache(maxsize=None)
+def _fields(model, exclude: frozenset) -> tuple:
+    """(champ, défaut) dans l'ordre du modèle ; les default_factory (ex : id) sont toujours stockées"""
+    return tuple(
+        (name, _MISSING if field.is_required() or field.default_factory is not None else field.default)
+        for name, field in model.model_fields.items() if name not in exclude
+    )
+
+
+def trusted_documents(model, docs: list, exclude=()) -> list:
+    """Documents de confiance remis dans l'ordre du modèle et complétés par les défauts, sans validation"""
+    fields = _fields(model, frozenset(exclude))
+    return [
+        {name: doc.get(name, default) for name, default in fields if default is not _MISSING or name in doc}
+        for doc in docs
+    ]
+
+
+def validated_documents(model, docs: list) -> list:
+    """Valide une liste en une passe (adapter en cache) et la redonne en types JSON"""
+    adapter = list_adapter(model)
+    return adapter.dump_python(adapter.validate_python(docs), mode="json")
+
+
+def json_response(content, headers: dict = None, status_code: int = 200) -> ORJSONResponse:
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def dumps(content) -> bytes:
+    """JSON compact (UTF-8) ; les types inconnus (ObjectId...) passent par str"""
+    return orjson.dumps(content, default=str)
@@ -1,24 +1,49 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+import hashlib
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
-from datetime import datetime, timezone, date
+from typing import Dict, List, Literal, Optional
+from datetime import datetime, timezone, date, timedelta
 import uuid
 
+from achievements import AchievementEngine
+from analytics import habit_analytics
+from cache import CachedResource, build_entry, cached_response
+from events import Broadcaster, relay_from_env, sse_stream
+from history import MAX_RANGE_DAYS, decode, mark_done, parse_range, range_filter
+from ledger import Ledger, LedgerConflict, LedgerMismatch
+from metrics import Metrics, MetricsMiddleware, slow_request_threshold
+from outcomes import outcome_document, rollup_operations, stats_increments
+from pagination import (
+    INSERTION_ORDER, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, fetch_page, fetch_search_page, page_query, stream_ndjson,
+)
+from progression import SKILL_RANKS, get_rank, recompute_skills, skill_ranks, total_exp
+from quotas import backfill_quotas, release, release_many, requested_places, reserve_many
+from rules import MAX_CRUCIAL_MISSIONS, MAX_NORMAL_MISSIONS, day_damage, mission_reward, settle_day
+from serialization import json_response, model_projection, trusted_documents, validated_documents
+from scheduler import DailyResetScheduler, PeriodicTask, is_valid_timezone, local_today
+from singleflight import SingleFlight
+from storage import DuplicateKey, open_storage
+from tenancy import DEFAULT_USER_ID, current_user, stream_user
+
 # --- CONFIGURATION INITIALE ---
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+metrics = Metrics(slow_request_ms=slow_request_threshold())
+# MongoDB par défaut ; STORAGE_BACKEND=memory|sqlite pour une instance mono-joueur sans service externe
+store = open_storage(event_listeners=[metrics.command_listener])
+daily_reset_flight = SingleFlight()
+# Changements d'état poussés aux clients (GET /api/events)
+broadcaster = Broadcaster(relay_from_env())
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # --- AJOUT ICI : ROUTE POUR LE PING (UPTIMEROBOT) ---
 # Cette route permet à UptimeRobot de "réveiller" le serveur à la racine "/"
@@ -26,53 +51,19 @@ app = FastAPI()
 async def health_check():
     return {"status": "alive", "message": "Le serveur RPG ne dort jamais !"}
 
-api_router = APIRouter(prefix="/api")
+# Latences par route et commandes MongoDB (backend mongo), au format Prometheus
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-# --- DEFINITION DES RANGS (TITRES) ---
-SKILL_RANKS = {
-    "tech": {
-        1: "Noob", 2: "Script Kiddie", 3: "Debugger", 4: "Codeur", 5: "Développeur",
-        6: "Ingénieur", 7: "Hacker", 8: "Tech Lead", 9: "Architecte", 10: "Deus Ex Machina"
-    },
-    "sport": {
-        1: "Canapé", 2: "Promeneur", 3: "Échauffé", 4: "Actif", 5: "Athlète",
-        6: "Compétiteur", 7: "Spartiate", 8: "Titan", 9: "Olympien", 10: "Demi-Dieu"
-    },
-    "cooking": {
-        1: "Micro-ondes", 2: "Commis", 3: "Cuistot", 4: "Gourmet", 5: "Cuisinier",
-        6: "Chef de Partie", 7: "Sous-Chef", 8: "Chef", 9: "Chef Étoilé", 10: "Gordon Ramsay"
-    },
-    "cleaning": {
-        1: "Bordélique", 2: "Balayeur", 3: "Rangeur", 4: "Propre", 5: "Organisé",
-        6: "Méticuleux", 7: "Minimaliste", 8: "Purificateur", 9: "Maniac", 10: "Sanctuaire"
-    },
-    "culture": {
-        1: "Ignorant", 2: "Curieux", 3: "Lecteur", 4: "Cultivé", 5: "Érudit",
-        6: "Intellectuel", 7: "Savant", 8: "Philosophe", 9: "Encyclopédie", 10: "Sage"
-    },
-    "communication": {
-        1: "Timide", 2: "Observateur", 3: "Bavard", 4: "Sociable", 5: "Négociateur",
-        6: "Charismatique", 7: "Orateur", 8: "Diplomate", 9: "Leader", 10: "Voix d'Or"
-    },
-    "music": {
-        1: "Sourd", 2: "Auditeur", 3: "Rythmique", 4: "Amateur", 5: "Interprète",
-        6: "Musicien", 7: "Compositeur", 8: "Soliste", 9: "Maestro", 10: "Virtuose"
-    },
-    "languages": {
-        1: "Touriste", 2: "Élève", 3: "Débrouillard", 4: "Intermédiaire", 5: "Opérationnel",
-        6: "Fluide", 7: "Avancé", 8: "Bilingue", 9: "Polyglotte", 10: "Tour de Babel"
-    },
-    "health": {
-        1: "Fragile", 2: "Vivant", 3: "Équilibré", 4: "Reposé", 5: "Tonique",
-        6: "Robuste", 7: "Résistant", 8: "Vigoureux", 9: "Inébranlable", 10: "Immortel"
-    }
-}
+api_router = APIRouter(prefix="/api")
 
 # --- MODELES DE DONNEES ---
 
 class UserStats(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str = DEFAULT_USER_ID
     hp: int = 100
     max_hp: int = 100
     coins: int = 0
@@ -81,21 +72,29 @@ class UserStats(BaseModel):
     last_streak_update: str = Field(default_factory=lambda: datetime.now(timezone.utc).date().isoformat())
     has_shield: bool = False
     last_damage_taken: int = 0 
+    timezone: str = "UTC"
+    # Compteurs cumulés du journal des bilans quotidiens
+    days_settled: int = 0
+    perfect_days: int = 0
+    total_damage_taken: int = 0
+    shields_used: int = 0
+    deaths: int = 0
 
 class Habit(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str = DEFAULT_USER_ID
     name: str
     description: str = ""
     skill: str
     coin_reward: int
     exp_reward: int
     completed_today: bool = False
-    completion_history: List[str] = []
 
 class Mission(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str = DEFAULT_USER_ID
     title: str
     description: str = ""
     date: str
@@ -106,6 +105,7 @@ class Mission(BaseModel):
 class Skill(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
+    user_id: str = DEFAULT_USER_ID
     name: str
     level: int = 1
     exp: int = 0
@@ -121,6 +121,7 @@ class ShopItem(BaseModel):
     type: str
     image_url: str
 
+# Catalogue commun ; `unlocked` est propre au joueur (collection achievement_unlocks)
 class Achievement(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
@@ -132,140 +133,353 @@ class Achievement(BaseModel):
 class DailyReview(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str = DEFAULT_USER_ID
     date: str
     notes: str
 
-# --- FONCTIONS UTILITAIRES & LOGIQUE ---
+class ReviewSearchResult(DailyReview):
+    score: float
 
-def get_rank(skill_id: str, level: int) -> str:
-    specific_ranks = SKILL_RANKS.get(skill_id, {})
-    if level >= 10:
-        return specific_ranks.get(10, "Maître")
-    return specific_ranks.get(level, "Novice")
+# Requêtes groupées
+class HabitBatch(BaseModel):
+    ids: List[str]
 
-async def check_and_unlock_achievements():
-    """Vérifie et débloque les succès"""
-    stats = await db.user_stats.find_one({})
-    if not stats: return
+class MissionCompletionBatch(BaseModel):
+    ids: List[str]
+    completed: bool = True
 
-    habits = await db.habits.find({}).to_list(1000)
-    skills = await db.skills.find({}).to_list(1000)
-    
-    total_completed_habits = sum(1 for h in habits if h['completed_today'] or len(h.get('completion_history', [])) > 0)
-    current_streak = stats['streak']
-    current_coins = stats['coins']
-
-    updates = []
-    # 1. Habitudes
-    if total_completed_habits >= 1: updates.append("first_habit")
-    # 2. Streak
-    if current_streak >= 7: updates.append("streak_7")
-    if current_streak >= 14: updates.append("streak_14")
-    if current_streak >= 30: updates.append("streak_30")
-    if current_streak >= 90: updates.append("streak_90")
-    if current_streak >= 365: updates.append("streak_365")
-    # 3. Économie
-    if current_coins >= 2500: updates.append("coins_2500")
-    if current_coins >= 5500: updates.append("coins_5500")
-    if current_coins >= 10000: updates.append("coins_10000")
-    if current_coins >= 25000: updates.append("coins_25000")
-    if current_coins >= 50000: updates.append("coins_50000")
-    # 4. Skills
-    max_level = max([s['level'] for s in skills]) if skills else 0
-    if max_level >= 2: updates.append("skill_lvl_2")
-    if max_level >= 5: updates.append("skill_lvl_5")
-    if max_level >= 8: updates.append("skill_lvl_8")
-    if max_level >= 10: updates.append("skill_lvl_10")
-
-    if updates:
-        await db.achievements.update_many(
-            {"id": {"$in": updates}, "unlocked": False},
-            {"$set": {"unlocked": True}}
-        )
+class SkillExpBatch(BaseModel):
+    grants: Dict[str, int]
+
+# --- CACHES (BOUTIQUE, SUCCES, RANGS) ---
 
-async def process_daily_reset(stats):
-    """Calcule les dégâts de la veille et reset les habitudes"""
-    today = datetime.now(timezone.utc).date().isoformat()
+SHOP_CACHE_CONTROL = "public, max-age=60"
+ACHIEVEMENTS_CACHE_CONTROL = "private, no-cache"
+RANKS_CACHE_CONTROL = "public, max-age=86400"
+
+async def load_shop_items():
+    items = await store.find("shop_items", {}, model_projection(ShopItem), sort=INSERTION_ORDER)
+    return validated_documents(ShopItem, items)
+
+async def load_achievements():
+    # `unlocked` vaut False dans le catalogue ; player_achievements le remplit par joueur
+    achievements = await store.find("achievements", {}, model_projection(Achievement, exclude=("unlocked",)), sort=INSERTION_ORDER)
+    return validated_documents(Achievement, achievements)
+
+async def load_skill_ranks():
+    return [{"skill": skill_id, "ranks": skill_ranks(skill_id)} for skill_id in SKILL_RANKS]
+
+shop_cache = CachedResource("shop_items", load_shop_items, store)
+achievements_cache = CachedResource("achievements", load_achievements, store)
+ranks_cache = CachedResource("skill_ranks", load_skill_ranks)
+achievement_engine = AchievementEngine(
+    store, on_unlock=lambda user_id, ids: broadcaster.publish(user_id, "achievements", {"unlocked": ids})
+)
+ledger = Ledger(store)
+
+def is_default_page(after: Optional[str], limit: Optional[int], format: str) -> bool:
+    return after is None and limit is None and format == "json"
+
+async def player_achievements(user_id: str):
+    """Catalogue en cache + succès débloqués du joueur (relus en base), sérialisés avec leur ETag"""
+    catalog, unlocked = await asyncio.gather(achievements_cache.get(), achievement_engine.load_unlocked(user_id))
+    payload = [{**a, "unlocked": a["id"] in unlocked} for a in catalog.payload]
+    return build_entry("achievements", catalog.version, payload)
+
+# --- FONCTIONS UTILITAIRES & LOGIQUE ---
+
+def days_between(start: str, end: str) -> List[str]:
+    """Jours ISO de start (inclus) à end (exclu)"""
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days)]
+
+# État du joueur que le bilan recalcule (et qui sert de garde au compare-and-set)
+SETTLED_FIELDS = ("hp", "coins", "streak", "has_shield")
+
+async def process_daily_reset(stats, today: Optional[str] = None):
+    """Rejoue le bilan de chaque jour écoulé depuis last_streak_update et reset les habitudes"""
+    today = today or local_today(stats.get("timezone"))
     last_update = stats.get("last_streak_update", today)
     
     # Si on est toujours le même jour, on ne fait rien
-    if last_update == today:
+    if last_update >= today:
         return stats
 
-    print(f"🔄 Passage au jour suivant. Bilan du : {last_update}")
-    
-    # 1. Calcul dégâts Habitudes (-2 PV par habitude non faite)
-    habits = await db.habits.find({}).to_list(1000)
-    missed_habits_count = sum(1 for h in habits if not h['completed_today'])
-    damage_habits = missed_habits_count * 2
-    
-    # 2. Calcul dégâts Missions (-5 Cruciale, -2 Classique)
-    past_missions = await db.missions.find({"date": last_update}).to_list(1000)
-    damage_missions = 0
-    for m in past_missions:
-        if not m.get('completed', False):
-            if m.get('crucial', False):
-                damage_missions += 5
-            else:
-                damage_missions += 2
+    user_id = stats.get("user_id", DEFAULT_USER_ID)
+    days = days_between(last_update, today)
+    print(f"🔄 [{user_id}] Passage au jour suivant. Bilan du {last_update} au {days[-1]} ({len(days)} jour(s))")
     
-    total_potential_damage = damage_habits + damage_missions
+    # 1. Habitudes : seul le premier jour a un état réel, les suivants sont tous manqués
+    habits = await store.find("habits", {"user_id": user_id}, {"_id": 0, "completed_today": 1})
+    missed_first_day = sum(1 for h in habits if not h.get('completed_today', False))
     
-    # 3. Application des dégâts
-    new_hp = stats['hp']
-    new_has_shield = stats['has_shield']
-    new_streak = stats['streak']
-    actual_damage_taken = 0
+    # 2. Missions non faites sur toute la période, en une requête
+    missed_missions = await store.find(
+        "missions",
+        {"user_id": user_id, "date": {"$gte": last_update, "$lt": today}, "completed": {"$ne": True}},
+        {"_id": 0, "date": 1, "crucial": 1}
+    )
+    missed_by_day = {}
+    for m in missed_missions:
+        crucial, normal = missed_by_day.get(m["date"], (0, 0))
+        missed_by_day[m["date"]] = (crucial + 1, normal) if m.get("crucial", False) else (crucial, normal + 1)
     
-    if total_potential_damage > 0:
-        if new_has_shield:
-            print("🛡️ Bouclier utilisé ! Aucun dégât subi.")
-            new_has_shield = False # Le bouclier casse
-            actual_damage_taken = 0
-            # Streak sauvé mais pas augmenté
+    # 3. Application jour par jour (dégâts, bouclier, streak, mort), sauvegardée en
+    # compare-and-set sur le jour ET sur l'état lu : un seul worker peut passer ce jour,
+    # et des coins ou PV modifiés entre la lecture et l'écriture (achat, récompense)
+    # font rejouer le bilan sur l'état à jour au lieu d'être écrasés
+    while True:
+        state = {k: stats[k] for k in SETTLED_FIELDS}
+        outcomes = []
+        for i, day in enumerate(days):
+            missed_habits = missed_first_day if i == 0 else len(habits)
+            crucial, normal = missed_by_day.get(day, (0, 0))
+            potential_damage = day_damage(missed_habits, crucial, normal)
+            outcome = settle_day(state, potential_damage)
+            outcomes.append(outcome_document(user_id, day, missed_habits, crucial, normal, potential_damage, outcome, state))
+
+        # Les compteurs cumulés sont incrémentés dans la même écriture
+        update_fields = {**state, "last_streak_update": today, "last_damage_taken": outcome["damage"]}
+        increments = stats_increments(outcomes)
+        settled = await store.update_one(
+            "user_stats",
+            {"user_id": user_id, "last_streak_update": last_update, **{k: stats[k] for k in SETTLED_FIELDS}},
+            {"$set": update_fields, "$inc": increments}
+        )
+        if settled is not None:
+            break
+        current = await store.find_one("user_stats", {"user_id": user_id}, {"_id": 0})
+        if current is None or current.get("last_streak_update", today) != last_update:
+            print("⏭️ Bilan déjà appliqué par un autre worker.")
+            return current or stats
+        stats = current
+
+    for day, doc in zip(days, outcomes):
+        if doc["shield_used"]:
+            print(f"🛡️ {day} : Bouclier utilisé ! Aucun dégât subi.")
+        elif doc["damage"]:
+            print(f"💥 {day} : Dégâts subis : {doc['damage']}")
         else:
-            print(f"💥 Dégâts subis : {total_potential_damage}")
-            actual_damage_taken = total_potential_damage
-            new_hp = max(0, new_hp - total_potential_damage)
-            new_streak = 0 # Streak brisé
-    else:
-        # Journée parfaite (Aucun dégât) -> Streak augmente
-        print("🔥 Journée parfaite ! Streak +1")
-        new_streak += 1
-
-    # 4. Gestion de la Mort (HP = 0)
-    new_coins = stats['coins']
-    if new_hp == 0:
-        print("💀 Mort du personnage. Résurrection et pénalité.")
-        new_hp = 50 
-        new_coins = int(new_coins * 0.9)
-        new_streak = 0
+            print(f"🔥 {day} : Journée parfaite ! Streak +1")
+        if doc["died"]:
+            print(f"💀 {day} : Mort du personnage. Résurrection et pénalité.")
+    coins_delta = state["coins"] - stats["coins"]
+    stats.update(update_fields)
+    for counter, value in increments.items():
+        stats[counter] = stats.get(counter, 0) + value
+    broadcaster.publish(user_id, "stats", {**update_fields, **{counter: stats[counter] for counter in increments}})
+    broadcaster.publish(user_id, "daily_reset", {"date": today, "days": len(days)})
+    
+    # 4. Journal des jours réglés, agrégats mensuels et reset des habitudes
+    writes = [
+        record_outcomes(user_id, outcomes),
+        store.update_many("habits", {"user_id": user_id}, {"$set": {"completed_today": False}}),
+    ]
+    if coins_delta:
+        # Pénalités de mort : la clé (joueur, jour) rend l'écriture idempotente
+        writes.append(ledger.record(user_id, "daily_reset", coins_delta, key=f"daily_reset:{today}"))
+    await asyncio.gather(*writes)
+
+    await achievement_engine.record(user_id, streak=state["streak"], perfect_days=stats["perfect_days"])
         
-    # 5. Reset des habitudes
-    await db.habits.update_many({}, {"$set": {"completed_today": False}})
+    return stats
+
+async def record_outcomes(user_id: str, outcomes: list):
+    """Journal des jours réglés puis agrégats mensuels ; un jour déjà journalisé (bilan rejoué après un recul de
+    last_streak_update) garde son premier bilan et n'est pas recompté"""
+    try:
+        await store.insert_many("daily_outcomes", outcomes)
+    except DuplicateKey as exc:
+        rejected = set(exc.rejected)
+        outcomes = [doc for position, doc in enumerate(outcomes) if position not in rejected]
+    if outcomes:
+        await store.bulk_update("daily_rollups", rollup_operations(user_id, outcomes), upsert=True)
+
+async def user_timezone(user_id: str) -> Optional[str]:
+    stats = await store.find_one("user_stats", {"user_id": user_id}, {"_id": 0, "timezone": 1}) or {}
+    return stats.get("timezone")
+
+async def history_range(user_id: str, start: Optional[str], end: Optional[str]) -> tuple:
+    try:
+        return parse_range(start, end, today=local_today(await user_timezone(user_id)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Période invalide (dates AAAA-MM-JJ, start <= end, au plus {MAX_RANGE_DAYS} jours)")
+
+async def settle_daily_reset(stats, today: Optional[str] = None):
+    """Point d'entrée unique du daily reset : les appels concurrents pour un même jour sont fusionnés"""
+    today = today or local_today(stats.get("timezone"))
+    return await daily_reset_flight.do((stats.get("user_id"), today), process_daily_reset, stats, today)
+
+def publish_created(user_id: str, event: str, docs: list):
+    """Documents insérés, poussés aux abonnés SSE du joueur (sans l'_id de la base)"""
+    if docs:
+        broadcaster.publish(user_id, event, {"created": [{k: v for k, v in d.items() if k != "_id"} for d in docs]})
+
+async def insert_missions(user_id: str, missions: List[Mission]):
+    """Réserve les places des quotas journaliers (cruciales / classiques) puis insère le lot ; les places des missions
+    non insérées sont rendues"""
+    requested = requested_places(missions)
+    exceeded = await reserve_many(store, user_id, requested)
+    if exceeded is not None:
+        if exceeded:
+            raise HTTPException(status_code=400, detail=f"Limite atteinte : Max {MAX_CRUCIAL_MISSIONS} missions cruciales par jour.")
+        raise HTTPException(status_code=400, detail=f"Limite atteinte : Max {MAX_NORMAL_MISSIONS} missions classiques par jour.")
+    docs = [m.model_dump() for m in missions]
+    try:
+        await store.insert_many("missions", docs)
+    except DuplicateKey as exc:
+        # Insertion non ordonnée : le reste du lot est enregistré, seules les places des doublons sont rendues
+        duplicates = [missions[i] for i in exc.rejected]
+        await release_many(store, user_id, requested_places(duplicates))
+        rejected = set(exc.rejected)
+        publish_created(user_id, "missions", [doc for i, doc in enumerate(docs) if i not in rejected])
+        raise HTTPException(status_code=409, detail=f"Mission déjà existante : {', '.join(m.id for m in duplicates)}")
+    except Exception:
+        await release_many(store, user_id, requested)
+        raise
+    publish_created(user_id, "missions", docs)
+
+async def grant_skill_exp(user_id: str, grants: dict) -> list:
+    """Applique les gains d'EXP (une mise à jour atomique par compétence, en parallèle) ; retourne les compétences trouvées"""
+    skills = [s for s in await asyncio.gather(*(store.grant_exp(user_id, skill_id, exp) for skill_id, exp in grants.items())) if s]
+    if skills:
+        broadcaster.publish(user_id, "skills", skills)
+    return skills
+
+async def apply_mission_rewards(user_id: str, missions: list, completed: bool) -> tuple:
+    """Donne (ou reprend) les récompenses d'un lot de missions : un $inc de coins et une mise à jour par compétence.
+
+    Retourne les variations réellement appliquées (coins, EXP par compétence) pour le journal."""
+    total_coins = 0
+    exp_by_skill = {}
+    for m in missions:
+        coin_reward, exp_reward = mission_reward(m.get("crucial", False))
+        total_coins += coin_reward
+        exp_by_skill[m.get("skill")] = exp_by_skill.get(m.get("skill"), 0) + exp_reward
+
+    if completed:
+        coins, skills = await asyncio.gather(
+            store.grant_coins(user_id, total_coins),
+            grant_skill_exp(user_id, exp_by_skill),
+        )
+        if coins is not None:
+            broadcaster.publish(user_id, "stats", {"coins": coins})
+        await achievement_engine.record(
+            user_id,
+            coins=coins,
+            skill_level=max((s["level"] for s in skills), default=None)
+        )
+        return (total_coins if coins is not None else 0), {s["id"]: exp_by_skill[s["id"]] for s in skills}
     
-    # 6. Sauvegarde
-    await db.user_stats.update_one(
-        {}, 
-        {"$set": {
-            "hp": new_hp, 
-            "coins": new_coins,
-            "last_streak_update": today,
-            "has_shield": new_has_shield,
-            "streak": new_streak,
-            "last_damage_taken": actual_damage_taken
-        }}
+    # Retrait plafonné à 0 : on relit l'état d'avant pour journaliser la variation exacte
+    coins, *skills = await asyncio.gather(
+        store.revoke_coins(user_id, total_coins),
+        *(store.revoke_exp(user_id, skill_id, exp) for skill_id, exp in exp_by_skill.items()),
     )
-    
-    stats['hp'] = new_hp
-    stats['coins'] = new_coins
-    stats['last_streak_update'] = today
-    stats['has_shield'] = new_has_shield
-    stats['streak'] = new_streak
-    stats['last_damage_taken'] = actual_damage_taken
-        
+    skills = [s for s in skills if s]
+    if coins is not None:
+        broadcaster.publish(user_id, "stats", {"coins": max(0, coins - total_coins)})
+    if skills:
+        broadcaster.publish(user_id, "skills", [{"id": s["id"], "exp": max(0, s["exp"] - exp_by_skill[s["id"]])} for s in skills])
+    coins_delta = max(0, coins - total_coins) - coins if coins is not None else 0
+    return coins_delta, {s["id"]: max(0, s["exp"] - exp_by_skill[s["id"]]) - s["exp"] for s in skills}
+
+async def request_signature(request: Request) -> str:
+    """Opération désignée par une requête : méthode, chemin, paramètres et empreinte du corps"""
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    signature = f"{request.method} {request.url.path}" + (f"?{query}" if query else "")
+    body = await request.body()
+    if body:
+        signature += f" sha256:{hashlib.sha256(body).hexdigest()}"
+    return signature
+
+async def idempotent(request: Request, user_id: str, key: Optional[str], kind: str, operation):
+    """Exécute une opération de récompense une seule fois par clé d'idempotence (et par joueur) et l'inscrit au journal.
+
+    operation() retourne (réponse, variation de coins, variations d'EXP par compétence).
+    Une clé déjà utilisée par une autre requête (autre route, autres paramètres) est refusée."""
+    if key:
+        try:
+            existing = await ledger.claim(user_id, key, kind, await request_signature(request))
+        except LedgerConflict:
+            raise HTTPException(status_code=409, detail="Requête déjà en cours de traitement")
+        except LedgerMismatch:
+            raise HTTPException(status_code=422, detail="Clé d'idempotence déjà utilisée pour une autre requête")
+        if existing is not None:
+            return existing["response"]
+    try:
+        response, coins, exp = await operation()
+    except BaseException:
+        if key:
+            await ledger.release(user_id, key)
+        raise
+    if key or coins or any(exp.values()):
+        await ledger.record(user_id, kind, coins, exp, response, key=key, claimed=bool(key))
+    return response
+
+async def current_balances(user_id: str) -> dict:
+    """Soldes courants (coins, EXP cumulée par compétence) lus dans user_stats et skills"""
+    stats, skills = await asyncio.gather(
+        store.find_one("user_stats", {"user_id": user_id}, {"_id": 0, "coins": 1}),
+        store.find("skills", {"user_id": user_id}, {"_id": 0, "id": 1, "level": 1, "exp": 1}),
+    )
+    return {
+        "coins": (stats or {}).get("coins", 0),
+        "exp": {s["id"]: total_exp(s["level"], s["exp"]) for s in skills},
+    }
+
+STARTER_SKILLS = [
+    ("tech", "Technologie"), ("sport", "Sport"), ("culture", "Culture"),
+    ("communication", "Communication"), ("cooking", "Cuisine"), ("cleaning", "Nettoyage"),
+    ("music", "Musique"), ("languages", "Langues vivantes"), ("health", "Santé"),
+]
+
+def starter_skills(user_id: str) -> List[Skill]:
+    return [
+        Skill(id=skill_id, user_id=user_id, name=name, level=1, exp=0, max_exp=100, rank=get_rank(skill_id, 1))
+        for skill_id, name in STARTER_SKILLS
+    ]
+
+async def create_player(user_id: str) -> UserStats:
+    """Premier accès d'un joueur : stats par défaut, compétences de départ et instantané du journal"""
+    stats = UserStats(user_id=user_id)
+    try:
+        await store.insert_one("user_stats", stats.model_dump())
+    except DuplicateKey:
+        # Créé entre-temps par une requête concurrente
+        return UserStats(**await store.find_one("user_stats", {"user_id": user_id}, {"_id": 0}))
+    await store.insert_many("skills", [s.model_dump() for s in starter_skills(user_id)])
+    await ledger.snapshot(user_id, **await current_balances(user_id))
     return stats
 
+# --- PAGINATION DES LISTES ---
+# ?after=<curseur>&limit=<n> : le curseur de la page suivante est renvoyé dans X-Next-Cursor.
+# ?format=ndjson : flux d'un document JSON par ligne, lu directement depuis le Storage.
+# Les documents ne sont pas revalidés : projection sur les champs du modèle, défauts, orjson.
+
+PAGE_LIMIT = Query(None, ge=1, le=MAX_PAGE_SIZE)
+ListFormat = Literal["json", "ndjson"]
+
+async def list_page(collection: str, model, query: Optional[dict] = None, sort: list = INSERTION_ORDER,
+                    after: Optional[str] = None, limit: Optional[int] = None, format: str = "json",
+                    projection: Optional[dict] = None, default_limit: int = MAX_PAGE_SIZE, transform=None):
+    """transform(doc) complète chaque document lu (ex : état propre au joueur d'un catalogue commun)"""
+    query = query or {}
+    projection = projection or model_projection(model)
+    try:
+        if format == "ndjson":
+            documents = store.iterate(collection, page_query(query, sort, after), projection, sort=sort, limit=limit or 0)
+            if transform:
+                documents = (transform(doc) async for doc in documents)
+            return StreamingResponse(stream_ndjson(documents), media_type="application/x-ndjson")
+        docs, next_cursor = await fetch_page(store, collection, query, sort, limit or default_limit, after, projection)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    if transform:
+        docs = [transform(doc) for doc in docs]
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return json_response(trusted_documents(model, docs), headers=headers)
+
 # --- ROUTES API ---
 
 @api_router.get("/")
@@ -273,22 +487,79 @@ async def root():
     return {"message": "Objectif 1% API"}
 
 @api_router.get("/stats", response_model=UserStats)
-async def get_stats():
-    stats = await db.user_stats.find_one({}, {"_id": 0})
+async def get_stats(user_id: str = Depends(current_user)):
+    return await load_stats(user_id)
+
+async def load_stats(user_id: str) -> UserStats:
+    stats = await store.find_one("user_stats", {"user_id": user_id}, {"_id": 0})
     if not stats:
-        default_stats = UserStats()
-        await db.user_stats.insert_one(default_stats.model_dump())
-        return default_stats
+        return await create_player(user_id)
     
-    # --- DAILY RESET ---
-    updated_stats = await process_daily_reset(stats)
-    # -------------------
+    # Le daily reset est fait en tâche de fond par daily_reset_scheduler ;
+    # si le scheduler n'est pas encore passé, on rejoint (ou lance) le bilan en cours.
+    if stats.get("last_streak_update", "") < local_today(stats.get("timezone")):
+        stats = await settle_daily_reset(stats)
+    return UserStats(**stats)
+
+# --- TABLEAU DE BORD ---
+# Un seul appel pour l'écran d'accueil : stats, habitudes, missions du jour, compétences, succès.
+# Les lectures partent en parallèle ; ?fields= choisit les sections, ?compact=true retire les descriptions.
+
+DASHBOARD_SECTIONS = ("stats", "habits", "missions", "skills", "achievements")
+COMPACT_EXCLUDED_FIELDS = ("description",)
+
+@api_router.get("/dashboard")
+async def get_dashboard(fields: Optional[str] = None, compact: bool = False, day: Optional[str] = Query(None, alias="date"),
+                        user_id: str = Depends(current_user)):
+    sections = [f.strip() for f in fields.split(",")] if fields else list(DASHBOARD_SECTIONS)
+    unknown = [f for f in sections if f not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Sections inconnues : {', '.join(unknown)}")
+    
+    excluded = COMPACT_EXCLUDED_FIELDS if compact else ()
     
-    return UserStats(**updated_stats)
+    # Sans date explicite, le « jour » dépend du fuseau du joueur : on lit la fenêtre
+    # [veille, lendemain] UTC en parallèle des stats et on filtre ensuite.
+    utc_today = datetime.now(timezone.utc).date()
+    mission_days = [day] if day else [(utc_today + timedelta(days=d)).isoformat() for d in (-1, 0, 1)]
+    
+    tasks = {
+        "stats": load_stats(user_id) if "stats" in sections or ("missions" in sections and not day) else None,
+        "habits": store.find("habits", {"user_id": user_id}, model_projection(Habit, excluded))
+        if "habits" in sections else None,
+        "missions": store.find("missions", {"user_id": user_id, "date": {"$in": mission_days}}, model_projection(Mission, excluded))
+        if "missions" in sections else None,
+        "skills": store.find("skills", {"user_id": user_id}, model_projection(Skill)) if "skills" in sections else None,
+        "achievements": player_achievements(user_id) if "achievements" in sections else None,
+    }
+    pending = {name: task for name, task in tasks.items() if task is not None}
+    results = dict(zip(pending, await asyncio.gather(*pending.values())))
+    
+    dashboard = {}
+    if "stats" in sections:
+        dashboard["stats"] = results["stats"].model_dump()
+    if "habits" in sections:
+        dashboard["habits"] = trusted_documents(Habit, results["habits"], excluded)
+    if "missions" in sections:
+        today = day or local_today(results["stats"].timezone)
+        dashboard["missions"] = trusted_documents(Mission, [m for m in results["missions"] if m.get("date") == today], excluded)
+    if "skills" in sections:
+        dashboard["skills"] = trusted_documents(Skill, results["skills"])
+    if "achievements" in sections:
+        achievements = results["achievements"].payload
+        if compact:
+            achievements = [{k: v for k, v in a.items() if k not in COMPACT_EXCLUDED_FIELDS} for a in achievements]
+        dashboard["achievements"] = achievements
+    return json_response(dashboard)
 
 @api_router.patch("/stats")
-async def update_stats(hp: Optional[int] = None, coins: Optional[int] = None, streak: Optional[int] = None, streak_active: Optional[bool] = None, has_shield: Optional[bool] = None):
+async def update_stats(request: Request, hp: Optional[int] = None, coins: Optional[int] = None, streak: Optional[int] = None, streak_active: Optional[bool] = None, has_shield: Optional[bool] = None, tz: Optional[str] = Query(None, alias="timezone"), idempotency_key: Optional[str] = Header(None),
+                       user_id: str = Depends(current_user)):
     update_fields = {}
+    if tz is not None:
+        if not is_valid_timezone(tz):
+            raise HTTPException(status_code=400, detail="Fuseau horaire inconnu")
+        update_fields["timezone"] = tz
     if hp is not None:
         update_fields["hp"] = hp
     if coins is not None:
@@ -298,250 +569,395 @@ async def update_stats(hp: Optional[int] = None, coins: Optional[int] = None, st
     if streak_active is not None:
         update_fields["streak_active"] = streak_active
         if streak_active:
-            update_fields["last_streak_update"] = datetime.now(timezone.utc).date().isoformat()
+            if tz is None:
+                tz = await user_timezone(user_id)
+            update_fields["last_streak_update"] = local_today(tz)
     if has_shield is not None:
         update_fields["has_shield"] = has_shield
     
-    await db.user_stats.update_one({}, {"$set": update_fields})
-    
-    if hp is not None and hp == 100:
-        await db.achievements.update_one(
-            {"id": "heal_hp", "unlocked": False},
-            {"$set": {"unlocked": True}}
-        )
+    async def operation():
+        # L'état d'avant donne la variation exacte de coins pour le journal
+        before = await store.update_one("user_stats", {"user_id": user_id}, {"$set": update_fields}, projection={"_id": 0, "coins": 1})
+        if before and update_fields:
+            broadcaster.publish(user_id, "stats", update_fields)
         
-    return {"success": True}
+        await achievement_engine.record(user_id, coins=coins, streak=streak, hp=hp if hp == 100 else None)
+        coins_delta = coins - before.get("coins", 0) if before and coins is not None else 0
+        return {"success": True}, coins_delta, {}
+
+    return await idempotent(request, user_id, idempotency_key, "stats", operation)
+
+# --- EVENEMENTS (SSE) ---
+# Remplace le polling de /stats : état complet à la connexion, puis les champs modifiés.
+# Événements : stats, skills, habits, missions, achievements, daily_reset, resync (tout relire).
+# habits / missions : {"ids", état coché}, {"created": [documents]} ou {"deleted": [ids]}.
+
+@api_router.get("/events")
+async def stream_events(request: Request, user_id: str = Depends(stream_user)):
+    async def snapshot():
+        return (await load_stats(user_id)).model_dump()
+    return StreamingResponse(
+        sse_stream(broadcaster, user_id, snapshot, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @api_router.get("/habits", response_model=List[Habit])
-async def get_habits():
-    habits = await db.habits.find({}, {"_id": 0}).to_list(1000)
-    return [Habit(**h) for h in habits]
+async def get_habits(after: Optional[str] = None, limit: Optional[int] = PAGE_LIMIT, format: ListFormat = "json",
+                     user_id: str = Depends(current_user)):
+    # L'historique n'est plus embarqué : voir /habits/history
+    return await list_page("habits", Habit, query={"user_id": user_id}, after=after, limit=limit, format=format,
+                           default_limit=1000)
+
+@api_router.get("/habits/history")
+async def get_habits_history(start: Optional[str] = None, end: Optional[str] = None, user_id: str = Depends(current_user)):
+    """Jours de complétion de toutes les habitudes sur une période"""
+    start_day, end_day = await history_range(user_id, start, end)
+    history = {}
+    async for doc in store.iterate("habit_history", range_filter(user_id, None, start_day, end_day), {"_id": 0}):
+        history.setdefault(doc["habit_id"], []).extend(decode(doc, start_day, end_day))
+    return json_response({"start": start_day.isoformat(), "end": end_day.isoformat(), "history": history})
+
+@api_router.get("/habits/{habit_id}/history")
+async def get_habit_history(habit_id: str, start: Optional[str] = None, end: Optional[str] = None, user_id: str = Depends(current_user)):
+    start_day, end_day = await history_range(user_id, start, end)
+    docs = await store.find("habit_history", range_filter(user_id, [habit_id], start_day, end_day), {"_id": 0}, sort=[("year", 1)])
+    days = [d for doc in docs for d in decode(doc, start_day, end_day)]
+    return {"habit_id": habit_id, "start": start_day.isoformat(), "end": end_day.isoformat(), "dates": days}
+
+@api_router.get("/analytics/habits")
+async def get_habit_analytics(start: Optional[str] = None, end: Optional[str] = None, window: int = Query(7, ge=1, le=365),
+                              user_id: str = Depends(current_user)):
+    """Cartes de chaleur, taux de complétion glissants et séries, par habitude et par compétence"""
+    start_day, end_day = await history_range(user_id, start, end)
+    habits, history_docs = await asyncio.gather(
+        store.find("habits", {"user_id": user_id}, {"_id": 0, "id": 1, "name": 1, "skill": 1}, sort=INSERTION_ORDER),
+        store.find("habit_history", range_filter(user_id, None, start_day, end_day), {"_id": 0}),
+    )
+    return json_response(habit_analytics(habits, history_docs, start_day, end_day, window))
 
 @api_router.post("/habits", response_model=Habit)
-async def create_habit(habit: Habit):
+async def create_habit(habit: Habit, user_id: str = Depends(current_user)):
+    habit.user_id = user_id
     habit_dict = habit.model_dump()
-    await db.habits.insert_one(habit_dict)
+    try:
+        await store.insert_one("habits", habit_dict)
+    except DuplicateKey:
+        raise HTTPException(status_code=409, detail=f"Habitude déjà existante : {habit.id}")
+    publish_created(user_id, "habits", [habit_dict])
     return habit
 
 @api_router.patch("/habits/{habit_id}")
-async def update_habit(habit_id: str, completed_today: Optional[bool] = None):
-    update_fields = {}
-    if completed_today is not None:
-        update_fields["completed_today"] = completed_today
-        if completed_today:
-            today = datetime.now(timezone.utc).date().isoformat()
-            habit = await db.habits.find_one({"id": habit_id}, {"_id": 0})
-            if habit:
-                history = habit.get("completion_history", [])
-                if today not in history:
-                    history.append(today)
-                    update_fields["completion_history"] = history
+async def update_habit(habit_id: str, completed_today: Optional[bool] = None, user_id: str = Depends(current_user)):
+    if completed_today is None:
+        return {"success": True}
     
-    await db.habits.update_one({"id": habit_id}, {"$set": update_fields})
+    habit, tz = await asyncio.gather(
+        store.update_one("habits", {"user_id": user_id, "id": habit_id}, {"$set": {"completed_today": completed_today}}),
+        user_timezone(user_id),
+    )
     
-    if completed_today:
-        await check_and_unlock_achievements()
+    if habit:
+        broadcaster.publish(user_id, "habits", {"ids": [habit_id], "completed_today": completed_today})
+    if completed_today and habit:
+        # Coche atomique du jour dans l'historique compact
+        query, update = mark_done(user_id, habit_id, date.fromisoformat(local_today(tz)))
+        await store.update_one("habit_history", query, update, upsert=True)
+        await achievement_engine.record(user_id, habits_completed=1)
         
     return {"success": True}
 
+@api_router.post("/habits/complete")
+async def complete_habits(batch: HabitBatch, user_id: str = Depends(current_user)):
+    """Coche plusieurs habitudes en une fois (un update_many + un lot d'écritures d'historique)"""
+    habit_ids, tz = await asyncio.gather(
+        store.distinct("habits", "id", {"user_id": user_id, "id": {"$in": batch.ids}}),
+        user_timezone(user_id),
+    )
+    if not habit_ids:
+        return {"success": True, "updated": 0}
+    
+    today = date.fromisoformat(local_today(tz))
+    await asyncio.gather(
+        store.update_many("habits", {"user_id": user_id, "id": {"$in": habit_ids}}, {"$set": {"completed_today": True}}),
+        store.bulk_update("habit_history", [mark_done(user_id, habit_id, today) for habit_id in habit_ids], upsert=True),
+    )
+    broadcaster.publish(user_id, "habits", {"ids": habit_ids, "completed_today": True})
+    await achievement_engine.record(user_id, habits_completed=len(habit_ids))
+    return {"success": True, "updated": len(habit_ids)}
+
 @api_router.delete("/habits/{habit_id}")
-async def delete_habit(habit_id: str):
-    await db.habits.delete_one({"id": habit_id})
+async def delete_habit(habit_id: str, user_id: str = Depends(current_user)):
+    habit, _ = await asyncio.gather(
+        store.delete_one("habits", {"user_id": user_id, "id": habit_id}, {"_id": 1}),
+        store.delete_many("habit_history", {"user_id": user_id, "habit_id": habit_id}),
+    )
+    if habit:
+        broadcaster.publish(user_id, "habits", {"deleted": [habit_id]})
     return {"success": True}
 
 @api_router.get("/missions", response_model=List[Mission])
-async def get_missions(date: Optional[str] = None):
-    query = {} if not date else {"date": date}
-    missions = await db.missions.find(query, {"_id": 0}).to_list(1000)
-    return [Mission(**m) for m in missions]
+async def get_missions(date: Optional[str] = None, after: Optional[str] = None, limit: Optional[int] = PAGE_LIMIT, format: ListFormat = "json",
+                       user_id: str = Depends(current_user)):
+    query = {"user_id": user_id} if not date else {"user_id": user_id, "date": date}
+    return await list_page("missions", Mission, query=query, after=after, limit=limit, format=format,
+                           default_limit=1000)
 
 @api_router.post("/missions", response_model=Mission)
-async def create_mission(mission: Mission):
-    existing_missions = await db.missions.find({"date": mission.date}).to_list(100)
-    
-    crucial_count = sum(1 for m in existing_missions if m['crucial'])
-    normal_count = sum(1 for m in existing_missions if not m['crucial'])
-
-    if mission.crucial:
-        if crucial_count >= 3:
-            raise HTTPException(status_code=400, detail="Limite atteinte : Max 3 missions cruciales par jour.")
-    else:
-        if normal_count >= 7:
-            raise HTTPException(status_code=400, detail="Limite atteinte : Max 7 missions classiques par jour.")
-
-    mission_dict = mission.model_dump()
-    await db.missions.insert_one(mission_dict)
+async def create_mission(mission: Mission, user_id: str = Depends(current_user)):
+    mission.user_id = user_id
+    await insert_missions(user_id, [mission])
     return mission
 
+@api_router.post("/missions/batch", response_model=List[Mission])
+async def create_missions(missions: List[Mission], user_id: str = Depends(current_user)):
+    """Crée plusieurs missions en un seul insert_many (tout ou rien sur les quotas)"""
+    for m in missions:
+        m.user_id = user_id
+    if missions:
+        await insert_missions(user_id, missions)
+    return missions
+
 @api_router.patch("/missions/{mission_id}")
-async def update_mission(mission_id: str, completed: Optional[bool] = None):
-    mission = await db.missions.find_one({"id": mission_id})
-    if not mission:
-        raise HTTPException(status_code=404, detail="Mission introuvable")
+async def update_mission(request: Request, mission_id: str, completed: Optional[bool] = None, idempotency_key: Optional[str] = Header(None),
+                         user_id: str = Depends(current_user)):
+    if completed is None:
+        if not await store.find_one("missions", {"user_id": user_id, "id": mission_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Mission introuvable")
+        return {"success": True}
 
-    update_fields = {}
-    
-    if completed is not None:
-        update_fields["completed"] = completed
-        
-        current_status = mission.get("completed", False)
-        
-        if completed != current_status:
-            is_crucial = mission.get("crucial", False)
-            coin_reward = 50 if is_crucial else 20
-            exp_reward = 30 if is_crucial else 10 
-            
-            stats = await db.user_stats.find_one({})
-            skill_id = mission.get("skill")
-            skill = await db.skills.find_one({"id": skill_id})
-            
-            if stats and skill:
-                if completed:
-                    new_coins = stats["coins"] + coin_reward
-                    await db.user_stats.update_one({}, {"$set": {"coins": new_coins}})
-                    
-                    new_exp = skill["exp"] + exp_reward
-                    level = skill["level"]
-                    max_exp = skill["max_exp"]
-                    
-                    while new_exp >= max_exp:
-                        new_exp -= max_exp
-                        level += 1
-                        max_exp = int(max_exp * 1.5)
-                    
-                    rank = get_rank(skill_id, level)
-                    
-                    await db.skills.update_one(
-                        {"id": skill_id}, 
-                        {"$set": {"exp": new_exp, "level": level, "max_exp": max_exp, "rank": rank}}
-                    )
-                else:
-                    new_coins = max(0, stats["coins"] - coin_reward)
-                    await db.user_stats.update_one({}, {"$set": {"coins": new_coins}})
-                    
-                    current_exp_loss = max(0, skill["exp"] - exp_reward)
-                    await db.skills.update_one(
-                        {"id": skill_id}, 
-                        {"$set": {"exp": current_exp_loss}}
-                    )
-
-    if update_fields:
-        await db.missions.update_one({"id": mission_id}, {"$set": update_fields})
-    
-    if completed:
-        await check_and_unlock_achievements()
-        
-    return {"success": True}
+    async def operation():
+        # Bascule atomique : seule la requête qui change réellement l'état touche la récompense
+        mission = await store.update_one(
+            "missions",
+            {"user_id": user_id, "id": mission_id, "completed": {"$ne": completed}},
+            {"$set": {"completed": completed}},
+            projection={"_id": 0, "crucial": 1, "skill": 1}
+        )
+        if not mission:
+            if not await store.find_one("missions", {"user_id": user_id, "id": mission_id}, {"_id": 1}):
+                raise HTTPException(status_code=404, detail="Mission introuvable")
+            return {"success": True}, 0, {}
+
+        broadcaster.publish(user_id, "missions", {"ids": [mission_id], "completed": completed})
+        coins, exp = await apply_mission_rewards(user_id, [mission], completed)
+        return {"success": True}, coins, exp
+
+    return await idempotent(request, user_id, idempotency_key, "mission", operation)
+
+@api_router.post("/missions/complete")
+async def complete_missions(request: Request, batch: MissionCompletionBatch, idempotency_key: Optional[str] = Header(None),
+                            user_id: str = Depends(current_user)):
+    """Coche / décoche plusieurs missions ; récompenses et succès calculés une seule fois"""
+    async def operation():
+        # Bascule atomique marquée d'un jeton : on relit exactement les missions qui ont changé
+        token = str(uuid.uuid4())
+        modified = await store.update_many(
+            "missions",
+            {"user_id": user_id, "id": {"$in": batch.ids}, "completed": {"$ne": batch.completed}},
+            {"$set": {"completed": batch.completed, "toggle_token": token}}
+        )
+        coins, exp = 0, {}
+        if modified:
+            missions = await store.find("missions", {"user_id": user_id, "toggle_token": token}, {"_id": 0, "id": 1, "crucial": 1, "skill": 1})
+            broadcaster.publish(user_id, "missions", {"ids": [m["id"] for m in missions], "completed": batch.completed})
+            coins, exp = await apply_mission_rewards(user_id, missions, batch.completed)
+        return {"success": True, "updated": modified}, coins, exp
+
+    return await idempotent(request, user_id, idempotency_key, "missions_batch", operation)
 
 @api_router.delete("/missions/{mission_id}")
-async def delete_mission(mission_id: str):
-    await db.missions.delete_one({"id": mission_id})
+async def delete_mission(mission_id: str, user_id: str = Depends(current_user)):
+    mission = await store.delete_one("missions", {"user_id": user_id, "id": mission_id}, {"_id": 0, "date": 1, "crucial": 1})
+    if mission:
+        await release(store, user_id, mission["date"], mission.get("crucial", False))
+        broadcaster.publish(user_id, "missions", {"deleted": [mission_id]})
     return {"success": True}
 
 @api_router.get("/skills", response_model=List[Skill])
-async def get_skills():
-    skills = await db.skills.find({}, {"_id": 0}).to_list(1000)
-    return [Skill(**s) for s in skills]
+async def get_skills(after: Optional[str] = None, limit: Optional[int] = PAGE_LIMIT, format: ListFormat = "json",
+                     user_id: str = Depends(current_user)):
+    return await list_page("skills", Skill, query={"user_id": user_id}, after=after, limit=limit, format=format, default_limit=1000)
 
 @api_router.patch("/skills/{skill_id}")
-async def update_skill(skill_id: str, exp: int):
-    skill = await db.skills.find_one({"id": skill_id}, {"_id": 0})
-    if not skill:
-        raise HTTPException(status_code=404, detail="Skill not found")
-    
-    new_exp = skill["exp"] + exp
-    level = skill["level"]
-    max_exp = skill["max_exp"]
-    
-    while new_exp >= max_exp:
-        new_exp -= max_exp
-        level += 1
-        max_exp = int(max_exp * 1.5)
-    
-    rank = get_rank(skill_id, level)
-    
-    await db.skills.update_one(
-        {"id": skill_id},
-        {"$set": {"exp": new_exp, "level": level, "max_exp": max_exp, "rank": rank}}
-    )
-    await check_and_unlock_achievements()
-    return {"success": True}
+async def update_skill(request: Request, skill_id: str, exp: int, idempotency_key: Optional[str] = Header(None), user_id: str = Depends(current_user)):
+    async def operation():
+        skills = await grant_skill_exp(user_id, {skill_id: exp})
+        if not skills:
+            raise HTTPException(status_code=404, detail="Skill not found")
+        
+        await achievement_engine.record(user_id, skill_level=skills[0]["level"])
+        return {"success": True}, 0, {skill_id: exp}
+
+    return await idempotent(request, user_id, idempotency_key, "skill", operation)
+
+@api_router.post("/skills/exp")
+async def grant_skills_exp(request: Request, batch: SkillExpBatch, idempotency_key: Optional[str] = Header(None), user_id: str = Depends(current_user)):
+    """Donne de l'EXP à plusieurs compétences ; succès vérifiés une seule fois"""
+    async def operation():
+        skills = await grant_skill_exp(user_id, batch.grants)
+        found = {s["id"] for s in skills}
+        
+        await achievement_engine.record(user_id, skill_level=max((s["level"] for s in skills), default=None))
+        response = {"success": True, "updated": len(found), "missing": [s for s in batch.grants if s not in found]}
+        return response, 0, {skill_id: batch.grants[skill_id] for skill_id in found}
+
+    return await idempotent(request, user_id, idempotency_key, "skills_batch", operation)
+
+@api_router.post("/skills/recompute")
+async def recompute_player_skills(user_id: str = Depends(current_user)):
+    """Renormalise toutes les compétences du joueur (niveaux, EXP, titres) en une passe vectorisée.
+
+    Limité au joueur de la requête ; tous les joueurs : python cli.py recompute-skills"""
+    operations = await recompute_skills(store, {"user_id": user_id})
+    if operations:
+        broadcaster.publish(user_id, "skills", [{"id": q["id"], **u["$set"]} for q, u in operations])
+    return {"success": True, "updated": len(operations)}
 
 @api_router.get("/shop", response_model=List[ShopItem])
-async def get_shop_items():
-    items = await db.shop_items.find({}, {"_id": 0}).to_list(1000)
-    return [ShopItem(**i) for i in items]
+async def get_shop_items(request: Request, after: Optional[str] = None, limit: Optional[int] = PAGE_LIMIT, format: ListFormat = "json"):
+    if is_default_page(after, limit, format):
+        return cached_response(request, await shop_cache.get(), SHOP_CACHE_CONTROL)
+    return await list_page("shop_items", ShopItem, after=after, limit=limit, format=format, default_limit=1000)
+
+@api_router.get("/skills/ranks")
+async def get_skill_ranks(request: Request):
+    return cached_response(request, await ranks_cache.get(), RANKS_CACHE_CONTROL)
 
 @api_router.post("/shop/purchase")
-async def purchase_item(item_id: str):
-    item = await db.shop_items.find_one({"id": item_id}, {"_id": 0})
+async def purchase_item(request: Request, item_id: str, idempotency_key: Optional[str] = Header(None), user_id: str = Depends(current_user)):
+    catalog = await shop_cache.get()
+    item = next((i for i in catalog.payload if i["id"] == item_id), None)
+    if not item:
+        item = await store.find_one("shop_items", {"id": item_id}, {"_id": 0})
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    stats = await db.user_stats.find_one({}, {"_id": 0})
-    if not stats:
-        raise HTTPException(status_code=404, detail="Stats not found")
-    
-    if stats["coins"] < item["price"]:
-        raise HTTPException(status_code=400, detail="Pas assez de coins")
-    
-    new_coins = stats["coins"] - item["price"]
-    await db.user_stats.update_one({}, {"$set": {"coins": new_coins}})
-    
-    if item["type"] == "shield":
-        await db.user_stats.update_one({}, {"$set": {"has_shield": True}})
-    elif item["type"] == "potion":
-        new_hp = min(stats["hp"] + 30, stats["max_hp"])
-        await db.user_stats.update_one({}, {"$set": {"hp": new_hp}})
-    
-    return {"success": True, "remaining_coins": new_coins}
+    async def operation():
+        # Débit + effet en une seule écriture, gardée par coins >= prix
+        stats = await store.purchase(user_id, item)
+        if stats is None:
+            if not await store.find_one("user_stats", {"user_id": user_id}, {"_id": 1}):
+                raise HTTPException(status_code=404, detail="Stats not found")
+            raise HTTPException(status_code=400, detail="Pas assez de coins")
+        
+        broadcaster.publish(user_id, "stats", stats)
+        return {"success": True, "remaining_coins": stats["coins"]}, -item["price"], {}
+
+    return await idempotent(request, user_id, idempotency_key, "purchase", operation)
 
 @api_router.get("/achievements", response_model=List[Achievement])
-async def get_achievements():
-    achievements = await db.achievements.find({}, {"_id": 0}).to_list(1000)
-    return [Achievement(**a) for a in achievements]
+async def get_achievements(request: Request, after: Optional[str] = None, limit: Optional[int] = PAGE_LIMIT,
+                           format: ListFormat = "json", user_id: str = Depends(current_user)):
+    if is_default_page(after, limit, format):
+        return cached_response(request, await player_achievements(user_id), ACHIEVEMENTS_CACHE_CONTROL)
+    # Pages du catalogue commun, complétées par les succès débloqués du joueur
+    unlocked = await achievement_engine.load_unlocked(user_id)
+    return await list_page(
+        "achievements", Achievement, after=after, limit=limit, format=format, default_limit=1000,
+        projection=model_projection(Achievement, exclude=("unlocked",)),
+        transform=lambda a: {**a, "unlocked": a["id"] in unlocked},
+    )
+
+@api_router.get("/history/daily")
+async def get_daily_outcomes(start: Optional[str] = None, end: Optional[str] = None, user_id: str = Depends(current_user)):
+    """Bilans quotidiens enregistrés sur une période (30 derniers jours par défaut)"""
+    try:
+        start_day, end_day = parse_range(start, end, today=local_today(await user_timezone(user_id)), default_days=30)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Période invalide (dates AAAA-MM-JJ, start <= end, au plus {MAX_RANGE_DAYS} jours)")
+    outcomes = await store.find(
+        "daily_outcomes", {"user_id": user_id, "date": {"$gte": start_day.isoformat(), "$lte": end_day.isoformat()}}, {"_id": 0},
+        sort=[("date", 1)]
+    )
+    return {"start": start_day.isoformat(), "end": end_day.isoformat(), "days": outcomes}
+
+@api_router.get("/history/monthly/{month}")
+async def get_monthly_rollup(month: str, user_id: str = Depends(current_user)):
+    """Agrégat d'un mois (AAAA-MM) : jours réglés, journées parfaites, dégâts, boucliers, morts"""
+    # Format strict : les agrégats sont rangés sous « 2026-01 », strptime accepterait aussi « 2026-1 »
+    try:
+        if datetime.strptime(month, "%Y-%m").strftime("%Y-%m") != month:
+            raise ValueError(month)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Mois invalide (AAAA-MM)")
+    rollup = await store.find_one("daily_rollups", {"user_id": user_id, "month": month}, {"_id": 0})
+    return rollup or {"user_id": user_id, "month": month, "days": 0}
+
+@api_router.get("/ledger/balances")
+async def get_ledger_balances(user_id: str = Depends(current_user)):
+    """Soldes reconstruits depuis le dernier instantané du journal, comparés aux soldes courants"""
+    rebuilt, current = await asyncio.gather(ledger.balances(user_id), current_balances(user_id))
+    return {"ledger": rebuilt, "current": current, "consistent": rebuilt["coins"] == current["coins"] and rebuilt["exp"] == current["exp"]}
+
+@api_router.get("/diagnostics/indexes")
+async def diagnose_indexes():
+    """Plans d'exécution des requêtes des routes ; liste celles qui font encore un COLLSCAN"""
+    queries = await store.diagnostics()
+    if queries is None:
+        raise HTTPException(status_code=501, detail=f"Pas de plans d'exécution avec le stockage {store.name}")
+    return {"collscans": [q["route"] for q in queries if q["collscan"]], "queries": queries}
+
+def review_query(user_id: str, start: Optional[str], end: Optional[str]) -> dict:
+    """Bilans du joueur entre start et end (AAAA-MM-JJ, inclus, chacun facultatif)"""
+    query = {"user_id": user_id}
+    try:
+        bounds = {op: date.fromisoformat(day).isoformat() for op, day in (("$gte", start), ("$lte", end)) if day}
+    except ValueError:
+        bounds = None
+    if bounds is None or bounds.get("$gte", "") > bounds.get("$lte", "9999-12-31"):
+        raise HTTPException(status_code=400, detail="Période invalide (dates AAAA-MM-JJ, start <= end)")
+    if bounds:
+        query["date"] = bounds
+    return query
 
 @api_router.get("/reviews", response_model=List[DailyReview])
-async def get_reviews():
-    reviews = await db.daily_reviews.find({}, {"_id": 0}).sort("date", -1).to_list(100)
-    return [DailyReview(**r) for r in reviews]
+async def get_reviews(start: Optional[str] = None, end: Optional[str] = None, after: Optional[str] = None,
+                      limit: Optional[int] = PAGE_LIMIT, format: ListFormat = "json", user_id: str = Depends(current_user)):
+    return await list_page("daily_reviews", DailyReview, query=review_query(user_id, start, end), sort=[("date", -1), ("_id", -1)],
+                           after=after, limit=limit, format=format, default_limit=100)
+
+@api_router.get("/reviews/search", response_model=List[ReviewSearchResult])
+async def search_reviews(q: str = Query(..., min_length=1, max_length=200), start: Optional[str] = None, end: Optional[str] = None,
+                         after: Optional[str] = None, limit: Optional[int] = PAGE_LIMIT, user_id: str = Depends(current_user)):
+    """Recherche dans les notes (index texte) : les bilans qui contiennent au moins un des mots, du plus pertinent au moins pertinent"""
+    query = review_query(user_id, start, end)
+    try:
+        docs, next_cursor = await fetch_search_page(store, "daily_reviews", q, query, limit or 100, after,
+                                                    model_projection(ReviewSearchResult))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return json_response(trusted_documents(ReviewSearchResult, docs), headers=headers)
 
 @api_router.post("/reviews", response_model=DailyReview)
-async def create_review(review: DailyReview):
+async def create_review(review: DailyReview, user_id: str = Depends(current_user)):
+    review.user_id = user_id
     review_dict = review.model_dump()
-    await db.daily_reviews.insert_one(review_dict)
+    try:
+        await store.insert_one("daily_reviews", review_dict)
+    except DuplicateKey:
+        raise HTTPException(status_code=409, detail=f"Bilan déjà existant : {review.id}")
     return review
 
 # --- INITIALISATION DES DONNEES (RESET) ---
+# Les données du joueur sont remises à zéro ; les catalogues communs (boutique, succès) sont réécrits.
+# Le journal des bilans (daily_outcomes, daily_rollups) part avec les compteurs de user_stats
+PLAYER_COLLECTIONS = [
+    "user_stats", "habits", "habit_history", "missions", "mission_quotas", "skills",
+    "achievement_unlocks", "daily_reviews", "daily_outcomes", "daily_rollups",
+]
+
 @api_router.post("/init-demo-data")
-async def init_demo_data():
-    await db.user_stats.delete_many({})
-    await db.habits.delete_many({})
-    await db.missions.delete_many({})
-    await db.skills.delete_many({})
-    await db.shop_items.delete_many({})
-    await db.achievements.delete_many({})
-    await db.daily_reviews.delete_many({})
+async def init_demo_data(user_id: str = Depends(current_user)):
+    await asyncio.gather(*(store.delete_many(name, {"user_id": user_id}) for name in PLAYER_COLLECTIONS))
     
-    stats = UserStats(hp=100, coins=0, streak=0, streak_active=True, last_damage_taken=0)
-    await db.user_stats.insert_one(stats.model_dump())
+    stats = UserStats(user_id=user_id, hp=100, coins=0, streak=0, streak_active=True, last_damage_taken=0)
     
     demo_habits = []
     demo_missions = []
     
-    demo_skills = [
-        Skill(id="tech", name="Technologie", level=1, exp=0, max_exp=100, rank=get_rank("tech", 1)),
-        Skill(id="sport", name="Sport", level=1, exp=0, max_exp=100, rank=get_rank("sport", 1)),
-        Skill(id="culture", name="Culture", level=1, exp=0, max_exp=100, rank=get_rank("culture", 1)),
-        Skill(id="communication", name="Communication", level=1, exp=0, max_exp=100, rank=get_rank("communication", 1)),
-        Skill(id="cooking", name="Cuisine", level=1, exp=0, max_exp=100, rank=get_rank("cooking", 1)),
-        Skill(id="cleaning", name="Nettoyage", level=1, exp=0, max_exp=100, rank=get_rank("cleaning", 1)),
-        Skill(id="music", name="Musique", level=1, exp=0, max_exp=100, rank=get_rank("music", 1)),
-        Skill(id="languages", name="Langues vivantes", level=1, exp=0, max_exp=100, rank=get_rank("languages", 1)),
-        Skill(id="health", name="Santé", level=1, exp=0, max_exp=100, rank=get_rank("health", 1)),
-    ]
-    for s in demo_skills:
-        await db.skills.insert_one(s.model_dump())
+    demo_skills = starter_skills(user_id)
     
     demo_shop_items = [
         # SURVIE
@@ -558,8 +974,6 @@ async def init_demo_data():
         ShopItem(id="cheat_meal", name="Repas Plaisir", description="Commande ou resto.", price=800, type="reward", image_url="https://images.unsplash.com/photo-1565299624946-b28f40a0ae38?auto=format&fit=crop&q=80"),
         ShopItem(id="cinema", name="Sortie Cinéma", description="Une place pour un film.", price=1200, type="reward", image_url="https://images.unsplash.com/photo-1489599849927-2ee91cede3ba?auto=format&fit=crop&q=80"),
     ]
-    for i in demo_shop_items:
-        await db.shop_items.insert_one(i.model_dump())
     
     demo_achievements = [
         Achievement(id="first_habit", name="Premier Pas", description="Complète ta première habitude.", condition="habit_1", unlocked=False),
@@ -584,8 +998,18 @@ async def init_demo_data():
         Achievement(id="perfect_50", name="Demi-Cent", description="Fais 50 journées parfaites.", condition="perfect_50", unlocked=False),
         Achievement(id="perfect_100", name="Centenaire", description="Fais 100 journées parfaites.", condition="perfect_100", unlocked=False),
     ]
-    for a in demo_achievements:
-        await db.achievements.insert_one(a.model_dump())
+    
+    # Insertion groupée : un insert_many par collection, en parallèle
+    await asyncio.gather(
+        store.insert_one("user_stats", stats.model_dump()),
+        store.insert_many("skills", [s.model_dump() for s in demo_skills]),
+        store.replace_many("shop_items", [i.model_dump() for i in demo_shop_items]),
+        store.replace_many("achievements", [a.model_dump(exclude={"unlocked"}) for a in demo_achievements]),
+    )
+    achievement_engine.invalidate(user_id)
+    await asyncio.gather(shop_cache.invalidate(), achievements_cache.invalidate(), ledger.reset(user_id))
+    await ledger.snapshot(user_id, **await current_balances(user_id))
+    broadcaster.publish(user_id, "resync", {})
     
     return {"success": True, "message": "Initialisation RPG terminée : Prêt pour l'aventure !"}
 
@@ -597,7 +1021,9 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(MetricsMiddleware, metrics=metrics)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -605,6 +1031,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+daily_reset_scheduler = DailyResetScheduler(store, settle_daily_reset)
+# Compaction : tâche de fond de chaque worker, ou `python cli.py compact-ledger` (pas de route publique, elle touche tous les joueurs)
+ledger_compaction = PeriodicTask("Ledger compaction", ledger.compact, interval=3600)
+
+@app.on_event("startup")
+async def start_daily_reset_scheduler():
+    # Index et migrations du backend (MongoDB) avant de servir
+    await store.prepare()
+    backfilled = await backfill_quotas(store)
+    if backfilled:
+        print(f"🎯 Compteurs de quotas créés pour {backfilled} journée(s) de missions.")
+    legacy_player = await store.find_one("user_stats", {"user_id": DEFAULT_USER_ID}, {"_id": 1})
+    if legacy_player and (await ledger.last_snapshot(DEFAULT_USER_ID))["last_entry_id"] is None:
+        await ledger.snapshot(DEFAULT_USER_ID, **await current_balances(DEFAULT_USER_ID))
+    await broadcaster.start()
+    daily_reset_scheduler.start()
+    ledger_compaction.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await daily_reset_scheduler.stop()
+    await ledger_compaction.stop()
+    await broadcaster.stop()
+    await store.close()
\ No newline at end of file
@@ -0,0 +1,234 @@
+import itertools
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from achievements import ACHIEVEMENT_RULES
+from progression import progression_table
+from rules import (
+    CRUCIAL_MISSION_MISS_DAMAGE, CRUCIAL_MISSION_REWARD, DEATH_COIN_RATIO, HABIT_MISS_DAMAGE, NORMAL_MISSION_MISS_DAMAGE,
+    NORMAL_MISSION_REWARD, POTION_HEAL, RESURRECTION_HP, bulk_settle_day, mission_quota,
+)
+
+# --- SIMULATEUR D'EQUILIBRAGE ---
+# Des milliers de joueurs synthétiques joués en parallèle sur des centaines de
+# jours : un tableau NumPy par grandeur (PV, coins, streak...), une ligne par
+# joueur, une itération par jour. Le bilan quotidien est celui du jeu
+# (rules.bulk_settle_day), les récompenses, dégâts et paliers de succès sont
+# ceux de rules.py et achievements.py, sauf surcharge dans Balance pour
+# comparer des variantes. Un balayage (sweep) joue toutes les variantes dans
+# la même passe : chaque variante est un bloc de lignes avec ses paramètres.
+
+
+class Balance(NamedTuple):
+    """Règles simulées ; par défaut celles du jeu"""
+    habit_miss_damage: int = HABIT_MISS_DAMAGE
+    crucial_miss_damage: int = CRUCIAL_MISSION_MISS_DAMAGE
+    normal_miss_damage: int = NORMAL_MISSION_MISS_DAMAGE
+    resurrection_hp: int = RESURRECTION_HP
+    death_coin_ratio: float = DEATH_COIN_RATIO
+    crucial_coins: int = CRUCIAL_MISSION_REWARD[0]
+    crucial_exp: int = CRUCIAL_MISSION_REWARD[1]
+    normal_coins: int = NORMAL_MISSION_REWARD[0]
+    normal_exp: int = NORMAL_MISSION_REWARD[1]
+    potion_heal: int = POTION_HEAL
+    max_hp: int = 100
+    # Prix du catalogue de démonstration (init-demo-data)
+    potion_price: int = 150
+    shield_price: int = 1000
+
+
+class Profile(NamedTuple):
+    """Comportement des joueurs synthétiques"""
+    habits: int = 5
+    # Aucune route ne verse Habit.coin_reward / exp_reward : 0 par défaut, comme dans le jeu
+    # (à surcharger pour mesurer l'effet de récompenses d'habitudes)
+    habit_coins: int = 0
+    habit_exp: int = 0
+    # Missions créées chaque jour (plafonnées par les quotas)
+    crucial_missions: int = 2
+    normal_missions: int = 4
+    # L'EXP gagnée est répartie sur autant de compétences
+    skills: int = 3
+    # Taux de complétion de chaque joueur tiré d'une loi Beta(a, b) : moyenne a / (a + b)
+    diligence_a: float = 8.0
+    diligence_b: float = 2.0
+    # Achète une potion quand ses PV tombent à ce seuil (0 : jamais) ; un bouclier dès qu'il peut
+    potion_below: int = 50
+    buys_shield: bool = True
+
+
+ACHIEVEMENT_THRESHOLDS = [
+    (metric, threshold, achievement_id)
+    for metric, thresholds in ACHIEVEMENT_RULES.items() for threshold, achievement_id in thresholds
+]
+
+
+class SimulationResult(NamedTuple):
+    days: int
+    max_streak: np.ndarray      # meilleur streak de chaque joueur
+    streak_runs: np.ndarray     # streak_runs[n] = nombre de séries de n jours (interrompues ou en cours à la fin)
+    deaths: np.ndarray          # morts de chaque joueur
+    coins: np.ndarray           # solde final
+    coins_median: np.ndarray    # solde médian, jour par jour
+    unlock_days: dict           # id du succès -> jour du déblocage par joueur (-1 : jamais)
+
+
+def _rows(params: NamedTuple, variants: int, players: int) -> NamedTuple:
+    """Paramètres par ligne : une liste de `variants` valeurs devient un tableau (variants * players)"""
+    return params._replace(**{
+        name: np.repeat(np.asarray(value), players) for name, value in params._asdict().items()
+        if isinstance(value, (list, tuple, np.ndarray)) and len(value) == variants
+    })
+
+
+def _run(players: int, days: int, balance: Balance, profile: Profile, seed: int, variants: int = 1) -> list:
+    """Joue `variants` blocs de `players` joueurs ; un SimulationResult par variante"""
+    rng = np.random.default_rng(seed)
+    balance, profile = _rows(balance, variants, players), _rows(profile, variants, players)
+    rows = variants * players
+    crucial = np.minimum(profile.crucial_missions, mission_quota(True))
+    normal = np.minimum(profile.normal_missions, mission_quota(False))
+    diligence = rng.beta(profile.diligence_a, profile.diligence_b, rows)
+    table = progression_table()
+    variant = np.repeat(np.arange(variants), players)
+
+    hp = np.broadcast_to(balance.max_hp, rows).astype(np.int64)
+    coins = np.zeros(rows, dtype=np.int64)
+    streak = np.zeros(rows, dtype=np.int64)
+    has_shield = np.zeros(rows, dtype=bool)
+    exp = np.zeros(rows, dtype=np.int64)
+    habits_completed = np.zeros(rows, dtype=np.int64)
+    perfect_days = np.zeros(rows, dtype=np.int64)
+    deaths = np.zeros(rows, dtype=np.int64)
+    max_streak = np.zeros(rows, dtype=np.int64)
+    # Histogrammes des séries, une ligne par variante (index aplati variante * (days + 1) + longueur)
+    streak_runs = np.zeros(variants * (days + 1), dtype=np.int64)
+    coins_median = np.zeros((variants, days), dtype=np.float64)
+    unlock_days = np.full((len(ACHIEVEMENT_THRESHOLDS), rows), -1, dtype=np.int32)
+
+    def unlock(day: int, **metrics):
+        for row, (metric, threshold, _) in enumerate(ACHIEVEMENT_THRESHOLDS):
+            if metric in metrics:
+                reached = (unlock_days[row] < 0) & (metrics[metric] >= threshold)
+                unlock_days[row, reached] = day
+
+    for day in range(days):
+        # 1. Journée : habitudes et missions faites, récompenses
+        done_habits = rng.binomial(profile.habits, diligence)
+        done_crucial = rng.binomial(crucial, diligence)
+        done_normal = rng.binomial(normal, diligence)
+        coins += (done_habits * profile.habit_coins + done_crucial * balance.crucial_coins
+                  + done_normal * balance.normal_coins)
+        exp += done_habits * profile.habit_exp + done_crucial * balance.crucial_exp + done_normal * balance.normal_exp
+        habits_completed += done_habits
+        skill_exp = exp // np.maximum(profile.skills, 1)
+        level = table.start_level + np.searchsorted(table.thresholds_array, skill_exp, side="right") - 1
+        unlock(day, habits_completed=habits_completed, coins=coins, skill_level=level)
+
+        # 2. Boutique : potion sous le seuil de PV, puis bouclier
+        potion = (hp <= profile.potion_below) & (coins >= balance.potion_price)
+        coins -= np.where(potion, balance.potion_price, 0)
+        hp = np.where(potion, np.minimum(hp + balance.potion_heal, balance.max_hp), hp)
+        # Pas de déblocage « hp » ici : le serveur ne l'évalue que sur PATCH /stats, que la simulation ne joue pas
+        shield = profile.buys_shield & ~has_shield & (coins >= balance.shield_price)
+        coins -= np.where(shield, balance.shield_price, 0)
+        has_shield = has_shield | shield
+
+        # 3. Bilan quotidien du jeu
+        damage = ((profile.habits - done_habits) * balance.habit_miss_damage
+                  + (crucial - done_crucial) * balance.crucial_miss_damage
+                  + (normal - done_normal) * balance.normal_miss_damage)
+        previous_streak = streak
+        (hp, coins, streak, has_shield), (_, perfect, died) = bulk_settle_day(
+            hp, coins, streak, has_shield, damage, balance.resurrection_hp, balance.death_coin_ratio
+        )
+        broken = (previous_streak > 0) & (streak == 0)
+        streak_runs += np.bincount(variant[broken] * (days + 1) + previous_streak[broken], minlength=len(streak_runs))
+        perfect_days += perfect
+        deaths += died
+        max_streak = np.maximum(max_streak, streak)
+        coins_median[:, day] = np.median(coins.reshape(variants, players), axis=1)
+        unlock(day, streak=streak, perfect_days=perfect_days)
+
+    # Séries encore en cours à la fin de la simulation
+    running = streak > 0
+    streak_runs += np.bincount(variant[running] * (days + 1) + streak[running], minlength=len(streak_runs))
+    streak_runs = streak_runs.reshape(variants, days + 1)
+    return [
+        SimulationResult(
+            days=days,
+            max_streak=max_streak[block],
+            streak_runs=streak_runs[v],
+            deaths=deaths[block],
+            coins=coins[block],
+            coins_median=coins_median[v],
+            unlock_days={achievement_id: unlock_days[row, block] for row, (_, _, achievement_id) in enumerate(ACHIEVEMENT_THRESHOLDS)},
+        )
+        for v, block in ((v, slice(v * players, (v + 1) * players)) for v in range(variants))
+    ]
+
+
+def simulate(players: int = 10_000, days: int = 365, balance: Balance = Balance(), profile: Profile = Profile(),
+             seed: int = None) -> SimulationResult:
+    return _run(players, days, balance, profile, seed)[0]
+
+
+def _percentiles(values: np.ndarray, quantiles=(10, 50, 90, 99)) -> dict:
+    return {f"p{q}": float(v) for q, v in zip(quantiles, np.percentile(values, quantiles))}
+
+
+def summarize(result: SimulationResult) -> dict:
+    """Distributions de la simulation : streaks, morts, coins, jours de déblocage des succès"""
+    runs = result.streak_runs
+    lengths = np.arange(len(runs))
+    achievements = {}
+    for achievement_id, days in result.unlock_days.items():
+        unlocked = days[days >= 0]
+        achievements[achievement_id] = {
+            "unlocked": float(len(unlocked) / len(days)),
+            "median_day": float(np.median(unlocked)) if len(unlocked) else None,
+        }
+    return {
+        "players": int(len(result.coins)),
+        "days": result.days,
+        "max_streak": _percentiles(result.max_streak),
+        "mean_streak_run": float((runs * lengths).sum() / runs.sum()) if runs.sum() else 0.0,
+        "deaths_per_100_days": float(result.deaths.mean() * 100 / result.days),
+        "players_dead_once": float((result.deaths > 0).mean()),
+        "coins": _percentiles(result.coins),
+        "achievements": achievements,
+    }
+
+
+def sweep(grid: dict, players: int = 10_000, days: int = 365, balance: Balance = Balance(), profile: Profile = Profile(),
+          seed: int = 0) -> pd.DataFrame:
+    """Une variante par combinaison de la grille {paramètre de Balance ou Profile: valeurs}, toutes dans la même passe"""
+    unknown = [name for name in grid if name not in Balance._fields and name not in Profile._fields]
+    if unknown:
+        raise ValueError(f"paramètres inconnus : {', '.join(unknown)}")
+    names = list(grid)
+    combinations = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    columns = {name: [params[name] for params in combinations] for name in names}
+    results = _run(
+        players, days,
+        balance._replace(**{k: v for k, v in columns.items() if k in Balance._fields}),
+        profile._replace(**{k: v for k, v in columns.items() if k in Profile._fields}),
+        seed, variants=len(combinations),
+    )
+    rows = []
+    for params, result in zip(combinations, results):
+        summary = summarize(result)
+        rows.append({
+            **params,
+            "max_streak_p50": summary["max_streak"]["p50"],
+            "max_streak_p90": summary["max_streak"]["p90"],
+            "mean_streak_run": summary["mean_streak_run"],
+            "deaths_per_100_days": summary["deaths_per_100_days"],
+            "players_dead_once": summary["players_dead_once"],
+            "coins_p50": summary["coins"]["p50"],
+            "coins_p90": summary["coins"]["p90"],
+            **{f"{a}_unlocked": s["unlocked"] for a, s in summary["achievements"].items()},
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,24 @@
+import asyncio
+
+
+class SingleFlight:
+    """Fusionne les appels concurrents d'une même clé : un seul s'exécute, les autres attendent son résultat"""
+
+    def __init__(self):
+        self._calls = {}
+
+    def _forget(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # Marque l'exception comme lue même si plus personne n'attend
+            future.exception()
+
+    async def do(self, key, fn, *args, **kwargs):
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        # shield : l'annulation d'un appelant n'annule pas le calcul partagé
+        return await asyncio.shield(future)
@@ -0,0 +1,25 @@
+import os
+
+from storage.base import DuplicateKey, Storage
+
+# Backend choisi par STORAGE_BACKEND :
+#   mongo  (défaut) MONGO_URL + DB_NAME ;
+#   memory          données du processus, perdues à l'arrêt ;
+#   sqlite          fichier SQLITE_PATH, pour une instance mono-joueur sans service externe.
+BACKENDS = ("mongo", "memory", "sqlite")
+DEFAULT_SQLITE_PATH = "rpg.sqlite3"
+
+
+def open_storage(backend: str = None, event_listeners=()) -> Storage:
+    backend = backend or os.environ.get("STORAGE_BACKEND", "mongo")
+    if backend == "mongo":
+        from storage.mongo import MongoStorage
+        return MongoStorage(os.environ["MONGO_URL"], os.environ["DB_NAME"], event_listeners)
+    if backend == "memory":
+        from storage.memory import MemoryStorage
+        return MemoryStorage()
+    if backend == "sqlite":
+        from storage.sqlite import SQLiteStorage
+        return SQLiteStorage(os.environ.get("SQLITE_PATH", DEFAULT_SQLITE_PATH))
+    raise ValueError(f"STORAGE_BACKEND inconnu : {backend} (attendus : {', '.join(BACKENDS)})")
+
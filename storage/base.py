@@ -0,0 +1,121 @@
+from typing import AsyncIterator, Optional
+
+# --- COUCHE DE STOCKAGE ---
+# Les routes ne parlent plus à Motor : elles passent par un Storage. Les lectures et
+# écritures génériques prennent des filtres et des mises à jour au format MongoDB
+# (le sous-ensemble décrit dans storage/documents.py). Les récompenses, qui sont des
+# pipelines côté MongoDB, et les agrégations ont une opération dédiée par backend ;
+# chacune est atomique pour le document qu'elle touche.
+
+
+# Champs de user_stats qu'un achat peut changer
+PURCHASE_FIELDS = {"_id": 0, "coins": 1, "hp": 1, "has_shield": 1}
+
+
+class DuplicateKey(Exception):
+    """Insertion refusée par une clé unique (équivalent de DuplicateKeyError).
+
+    Pour insert_many, rejected donne les positions des documents du lot non insérés (les autres le sont)."""
+
+    def __init__(self, message: str = "", rejected: tuple = ()):
+        super().__init__(message)
+        self.rejected = tuple(rejected)
+
+
+class Storage:
+    """Interface commune des backends : mongo, memory, sqlite"""
+
+    name = "abstract"
+
+    async def prepare(self):
+        """Index, migrations... avant de servir les requêtes"""
+
+    async def close(self):
+        pass
+
+    # --- LECTURES ---
+
+    async def find(self, collection: str, query: dict = None, projection: dict = None, sort: list = None,
+                   limit: int = 0, skip: int = 0) -> list:
+        raise NotImplementedError
+
+    def iterate(self, collection: str, query: dict = None, projection: dict = None, sort: list = None,
+                limit: int = 0, batch_size: int = 100) -> AsyncIterator[dict]:
+        """Parcours par lots (flux NDJSON, scheduler) sans tout charger d'un coup"""
+        raise NotImplementedError
+
+    async def find_one(self, collection: str, query: dict, projection: dict = None, sort: list = None) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def distinct(self, collection: str, field: str, query: dict = None) -> list:
+        raise NotImplementedError
+
+    async def search(self, collection: str, text: str, query: dict, projection: dict = None, limit: int = 0,
+                     after: list = None) -> list:
+        """Documents du filtre contenant au moins un mot de `text` (index texte), chacun avec son "score",
+        du plus pertinent au moins pertinent (RELEVANCE_ORDER) ; `after` = [score, _id] du dernier document déjà lu"""
+        raise NotImplementedError
+
+    # --- ECRITURES ---
+
+    async def insert_one(self, collection: str, doc: dict):
+        raise NotImplementedError
+
+    async def insert_many(self, collection: str, docs: list):
+        raise NotImplementedError
+
+    async def update_one(self, collection: str, query: dict, update: dict, upsert: bool = False,
+                         projection: dict = None, after: bool = False) -> Optional[dict]:
+        """Met à jour un document ; retourne son état d'avant (ou d'après), None si rien ne correspond"""
+        raise NotImplementedError
+
+    async def update_many(self, collection: str, query: dict, update: dict) -> int:
+        """Retourne le nombre de documents réellement modifiés"""
+        raise NotImplementedError
+
+    async def bulk_update(self, collection: str, operations: list, upsert: bool = False):
+        """Lot de (filtre, mise à jour) envoyé en une fois"""
+        raise NotImplementedError
+
+    async def replace_many(self, collection: str, docs: list, key: str = "id"):
+        """Remplace (ou crée) chaque document identifié par `key`"""
+        raise NotImplementedError
+
+    async def delete_one(self, collection: str, query: dict, projection: dict = None) -> Optional[dict]:
+        """Supprime le premier document du filtre ; le retourne, None si rien ne correspond"""
+        raise NotImplementedError
+
+    async def delete_many(self, collection: str, query: dict) -> int:
+        raise NotImplementedError
+
+    # --- RECOMPENSES ATOMIQUES ---
+
+    async def grant_coins(self, user_id: str, coins: int) -> Optional[int]:
+        """Solde après le gain, None si le joueur n'existe pas"""
+        raise NotImplementedError
+
+    async def revoke_coins(self, user_id: str, coins: int) -> Optional[int]:
+        """Retrait plafonné à 0 ; solde d'avant le retrait"""
+        raise NotImplementedError
+
+    async def purchase(self, user_id: str, item: dict) -> Optional[dict]:
+        """Débit + effet de l'objet si le solde couvre le prix ; {coins, hp, has_shield} après achat, sinon None"""
+        raise NotImplementedError
+
+    async def grant_exp(self, user_id: str, skill_id: str, exp: int) -> Optional[dict]:
+        """Gain d'EXP avec montées de niveau ; la compétence (sans _id) après la mise à jour"""
+        raise NotImplementedError
+
+    async def revoke_exp(self, user_id: str, skill_id: str, exp: int) -> Optional[dict]:
+        """Retrait d'EXP plafonné à 0 ; {id, exp} d'avant le retrait"""
+        raise NotImplementedError
+
+    # --- AGREGATIONS ---
+
+    async def ledger_totals(self, query: dict) -> dict:
+        """Somme des entrées du journal filtrées : {coins, count, exp par compétence}"""
+        raise NotImplementedError
+
+    async def diagnostics(self) -> Optional[list]:
+        """Plans d'exécution des requêtes des routes, si le backend en a"""
+        return None
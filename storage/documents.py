@@ -0,0 +1,137 @@
+import copy
+import operator
+
+# --- FILTRES ET MISES A JOUR AU FORMAT MONGODB, EVALUES EN PYTHON ---
+# Sous-ensemble utilisé par l'API, pour les backends embarqués (memory, sqlite) :
+# égalité, $eq/$ne, $in/$nin, $gt/$gte/$lt/$lte, $exists, $and/$or ;
+# $set, $setOnInsert, $inc, $unset, $bit. Les champs sont de premier niveau
+# (les filtres acceptent aussi les chemins pointés).
+
+MISSING = object()
+
+COMPARISONS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+
+def get_field(doc: dict, path: str):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    return value
+
+
+def _equals(value, operand) -> bool:
+    # Comme MongoDB : null correspond aussi à un champ absent, un tableau à l'un de ses éléments
+    if value is MISSING:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def _compare(op: str, value, operand) -> bool:
+    if value is MISSING or value is None or operand is None:
+        return False
+    try:
+        return COMPARISONS[op](value, operand)
+    except TypeError:
+        # Types différents : jamais comparables (MongoDB compare par type)
+        return False
+
+
+def is_operator_dict(condition) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(k.startswith("$") for k in condition)
+
+
+def _condition(value, condition) -> bool:
+    if not is_operator_dict(condition):
+        return _equals(value, condition)
+    for op, operand in condition.items():
+        if op == "$eq":
+            ok = _equals(value, operand)
+        elif op == "$ne":
+            ok = not _equals(value, operand)
+        elif op == "$in":
+            ok = any(_equals(value, o) for o in operand)
+        elif op == "$nin":
+            ok = not any(_equals(value, o) for o in operand)
+        elif op == "$exists":
+            ok = (value is not MISSING) == bool(operand)
+        elif op in COMPARISONS:
+            ok = _compare(op, value, operand)
+        else:
+            raise ValueError(f"Opérateur de filtre non supporté : {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$and":
+            ok = all(matches(doc, q) for q in condition)
+        elif key == "$or":
+            ok = any(matches(doc, q) for q in condition)
+        else:
+            ok = _condition(get_field(doc, key), condition)
+        if not ok:
+            return False
+    return True
+
+
+def _sort_key(value):
+    # null / absent avant toute valeur, comme MongoDB en ordre croissant
+    return (0,) if value is MISSING or value is None else (1, value)
+
+
+def sort_documents(docs: list, sort: list) -> list:
+    """Tri composé [(champ, 1 | -1), ...], stable"""
+    docs = list(docs)
+    for field, direction in reversed(sort):
+        docs.sort(key=lambda d: _sort_key(get_field(d, field)), reverse=direction < 0)
+    return docs
+
+
+def project(doc: dict, projection: dict = None) -> dict:
+    """Copie du document limitée (ou privée) des champs de la projection, dans l'ordre du document"""
+    if not projection:
+        return dict(doc)
+    included = {k for k, v in projection.items() if v and k != "_id"}
+    if included:
+        keep_id = bool(projection.get("_id", 1))
+        return {k: v for k, v in doc.items() if k in included or (k == "_id" and keep_id)}
+    return {k: v for k, v in doc.items() if k not in projection}
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False) -> dict:
+    """Applique une mise à jour à opérateurs sur doc (modifié sur place et retourné)"""
+    if isinstance(update, list):
+        raise ValueError("Les pipelines de mise à jour passent par les opérations dédiées du Storage")
+    for op, fields in update.items():
+        if op == "$set":
+            doc.update(copy.deepcopy(fields))
+        elif op == "$setOnInsert":
+            if inserting:
+                doc.update(copy.deepcopy(fields))
+        elif op == "$inc":
+            for field, amount in fields.items():
+                doc[field] = doc.get(field, 0) + amount
+        elif op == "$unset":
+            for field in fields:
+                doc.pop(field, None)
+        elif op == "$bit":
+            for field, bits in fields.items():
+                value = doc.get(field, 0)
+                for kind, mask in bits.items():
+                    value = {"and": value & mask, "or": value | mask, "xor": value ^ mask}[kind]
+                doc[field] = value
+        else:
+            raise ValueError(f"Opérateur de mise à jour non supporté : {op}")
+    return doc
+
+
+def upsert_document(query: dict, update: dict) -> dict:
+    """Document créé par un upsert : égalités du filtre + mise à jour (dont $setOnInsert)"""
+    doc = {k: copy.deepcopy(v) for k, v in query.items() if not k.startswith("$") and not is_operator_dict(v)}
+    return apply_update(doc, update, inserting=True)
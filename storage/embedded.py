@@ -0,0 +1,292 @@
+import copy
+from typing import Optional
+
+from bson import ObjectId
+
+from indexes import INDEXES
+from pagination import RELEVANCE_ORDER, after_filter
+from rewards import granted_exp, purchase_filter, purchased, revoked_coins, revoked_exp
+from storage.base import PURCHASE_FIELDS, DuplicateKey, Storage
+from storage.documents import (
+    MISSING, apply_update, get_field, is_operator_dict, matches, project, sort_documents, upsert_document,
+)
+from storage.text import score, terms
+
+# --- BACKENDS EMBARQUES (MEMOIRE, SQLITE) ---
+# Toute la logique est ici, en Python, au-dessus de quelques primitives par backend
+# (lire par _id, par clé unique ou par joueur ; insérer, remplacer, supprimer).
+# Les opérations sont synchrones et ne rendent jamais la main à la boucle
+# asyncio entre la lecture et l'écriture : chacune est atomique dans le
+# processus ; _transaction() les protège en plus des autres processus (sqlite).
+# Les clés uniques et les index texte sont ceux déclarés dans indexes.py.
+
+UNIQUE_KEYS = {
+    name: tuple(model.document["key"])
+    for name, models in INDEXES.items() for model in models if model.document.get("unique")
+}
+
+# Parcours de tous les documents d'une collection (sans partition par joueur)
+ALL = object()
+
+
+def document_key(collection: str, doc: dict) -> Optional[tuple]:
+    fields = UNIQUE_KEYS.get(collection)
+    return tuple(doc.get(f) for f in fields) if fields else None
+
+
+def query_key(collection: str, query: dict) -> Optional[tuple]:
+    """Clé unique entièrement fixée par des égalités du filtre, sinon None"""
+    fields = UNIQUE_KEYS.get(collection)
+    if not fields or any(f not in query or is_operator_dict(query[f]) for f in fields):
+        return None
+    return tuple(query[f] for f in fields)
+
+
+class DocumentStorage(Storage):
+    """Storage complet au-dessus des primitives d'un backend embarqué"""
+
+    # --- PRIMITIVES (propres au backend) ---
+
+    def _transaction(self):
+        raise NotImplementedError
+
+    def _get(self, collection: str, doc_id) -> Optional[dict]:
+        raise NotImplementedError
+
+    def _get_unique(self, collection: str, key: tuple) -> Optional[dict]:
+        raise NotImplementedError
+
+    def _scan(self, collection: str, user_id=ALL) -> list:
+        raise NotImplementedError
+
+    def _scan_batches(self, collection: str, user_id=ALL, batch_size: int = 100):
+        """Même parcours que _scan, rendu par lots de batch_size documents"""
+        docs = self._scan(collection, user_id)
+        for start in range(0, len(docs), batch_size):
+            yield docs[start:start + batch_size]
+
+    def _insert(self, collection: str, doc: dict):
+        raise NotImplementedError
+
+    def _replace(self, collection: str, doc: dict):
+        raise NotImplementedError
+
+    def _remove(self, collection: str, doc: dict):
+        raise NotImplementedError
+
+    def _text_search(self, collection: str, terms: list, user_id=ALL) -> list:
+        """(document, somme des poids des termes trouvés) de chaque document qui contient au moins un terme"""
+        raise NotImplementedError
+
+    # --- SELECTION ---
+
+    def _lookup(self, collection: str, query: dict) -> Optional[list]:
+        """Candidats d'un filtre qui fixe le _id ou la clé unique ; None s'il faut parcourir la collection"""
+        doc_id = query.get("_id", MISSING)
+        if doc_id is not MISSING and not is_operator_dict(doc_id):
+            return [self._get(collection, doc_id)]
+        key = query_key(collection, query)
+        if key is not None:
+            return [self._get_unique(collection, key)]
+        return None
+
+    @staticmethod
+    def _partition(query: dict):
+        """Joueur fixé par le filtre (partition à parcourir), sinon ALL"""
+        user_id = query.get("user_id")
+        return user_id if isinstance(user_id, str) else ALL
+
+    def _select(self, collection: str, query: dict) -> list:
+        """Documents du filtre, lus par _id, par clé unique ou dans la partition du joueur"""
+        candidates = self._lookup(collection, query)
+        if candidates is None:
+            candidates = self._scan(collection, self._partition(query))
+        return [d for d in candidates if d is not None and matches(d, query)]
+
+    def _find(self, collection, query, projection=None, sort=None, limit=0, skip=0) -> list:
+        docs = self._select(collection, query or {})
+        if sort:
+            docs = sort_documents(docs, sort)
+        docs = docs[skip:]
+        if limit:
+            docs = docs[:limit]
+        return [project(d, projection) for d in docs]
+
+    def _update(self, collection, query, update, upsert=False) -> tuple:
+        """(avant, après) du premier document du filtre ; avant vaut None pour un upsert"""
+        docs = self._select(collection, query)
+        if docs:
+            before = docs[0]
+            doc = apply_update(dict(before), update)
+            if doc != before:
+                self._replace(collection, doc)
+            return before, doc
+        if not upsert:
+            return None, None
+        doc = upsert_document(query, update)
+        doc.setdefault("_id", ObjectId())
+        self._insert(collection, doc)
+        return None, doc
+
+    def _modify(self, collection, query, change) -> tuple:
+        """(avant, après) d'un document dont change(doc) calcule les nouveaux champs"""
+        with self._transaction():
+            docs = self._select(collection, query)
+            if not docs:
+                return None, None
+            before = docs[0]
+            doc = {**before, **change(before)}
+            self._replace(collection, doc)
+        return before, doc
+
+    @staticmethod
+    def _new(doc: dict) -> dict:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        return doc
+
+    # --- LECTURES ---
+
+    async def find(self, collection, query=None, projection=None, sort=None, limit=0, skip=0) -> list:
+        return self._find(collection, query, projection, sort, limit, skip)
+
+    async def iterate(self, collection, query=None, projection=None, sort=None, limit=0, batch_size=100):
+        query = query or {}
+        if sort or self._lookup(collection, query) is not None:
+            # Un tri a besoin de tous les documents ; une lecture par clé n'en rend qu'un
+            for doc in self._find(collection, query, projection, sort, limit):
+                yield doc
+            return
+        # Sans tri : parcours par lots, seul le lot courant est copié (export, flux NDJSON)
+        count = 0
+        for batch in self._scan_batches(collection, self._partition(query), batch_size):
+            for doc in batch:
+                if not matches(doc, query):
+                    continue
+                yield project(doc, projection)
+                count += 1
+                if count == limit:
+                    return
+
+    async def find_one(self, collection, query, projection=None, sort=None) -> Optional[dict]:
+        docs = self._find(collection, query, projection, sort, limit=1)
+        return docs[0] if docs else None
+
+    async def distinct(self, collection, field, query=None) -> list:
+        values = []
+        for doc in self._select(collection, query or {}):
+            value = get_field(doc, field)
+            if value is not MISSING and value not in values:
+                values.append(value)
+        return values
+
+    async def search(self, collection, text, query, projection=None, limit=0, after=None) -> list:
+        searched = terms(text)
+        if not searched:
+            return []
+        keyset = after_filter(RELEVANCE_ORDER, after) if after else None
+        user_id = query.get("user_id")
+        docs = []
+        for doc, total in self._text_search(collection, searched, user_id if isinstance(user_id, str) else ALL):
+            doc = {**doc, "score": score(total)}
+            if matches(doc, query) and (keyset is None or matches(doc, keyset)):
+                docs.append(doc)
+        docs = sort_documents(docs, RELEVANCE_ORDER)
+        if limit:
+            docs = docs[:limit]
+        return [project(d, projection) for d in docs]
+
+    # --- ECRITURES ---
+
+    async def insert_one(self, collection, doc):
+        with self._transaction():
+            self._insert(collection, self._new(doc))
+
+    async def insert_many(self, collection, docs):
+        # Comme insert_many(ordered=False) : les doublons n'empêchent pas les autres insertions
+        duplicates = []
+        with self._transaction():
+            for position, doc in enumerate(docs):
+                try:
+                    self._insert(collection, self._new(doc))
+                except DuplicateKey as exc:
+                    duplicates.append((position, exc))
+        if duplicates:
+            raise DuplicateKey(str(duplicates[0][1]), rejected=[position for position, _ in duplicates])
+
+    async def update_one(self, collection, query, update, upsert=False, projection=None, after=False) -> Optional[dict]:
+        with self._transaction():
+            before, doc = self._update(collection, query, update, upsert)
+        result = doc if after else before
+        return project(result, projection or {"_id": 1}) if result is not None else None
+
+    async def update_many(self, collection, query, update) -> int:
+        modified = 0
+        with self._transaction():
+            for before in self._select(collection, query):
+                doc = apply_update(dict(before), update)
+                if doc != before:
+                    self._replace(collection, doc)
+                    modified += 1
+        return modified
+
+    async def bulk_update(self, collection, operations, upsert=False):
+        with self._transaction():
+            for query, update in operations:
+                self._update(collection, query, update, upsert)
+
+    async def replace_many(self, collection, docs, key="id"):
+        with self._transaction():
+            for doc in docs:
+                existing = self._select(collection, {key: doc[key]})
+                if existing:
+                    self._replace(collection, {**copy.deepcopy(doc), "_id": existing[0]["_id"]})
+                else:
+                    self._insert(collection, self._new(doc))
+
+    async def delete_one(self, collection, query, projection=None) -> Optional[dict]:
+        with self._transaction():
+            docs = self._select(collection, query)[:1]
+            for doc in docs:
+                self._remove(collection, doc)
+        return project(docs[0], projection or {"_id": 1}) if docs else None
+
+    async def delete_many(self, collection, query) -> int:
+        with self._transaction():
+            docs = self._select(collection, query)
+            for doc in docs:
+                self._remove(collection, doc)
+        return len(docs)
+
+    # --- RECOMPENSES ATOMIQUES ---
+
+    async def grant_coins(self, user_id, coins) -> Optional[int]:
+        _, stats = self._modify("user_stats", {"user_id": user_id}, lambda s: {"coins": s.get("coins", 0) + coins})
+        return stats["coins"] if stats else None
+
+    async def revoke_coins(self, user_id, coins) -> Optional[int]:
+        stats, _ = self._modify("user_stats", {"user_id": user_id}, lambda s: revoked_coins(s, coins))
+        return stats["coins"] if stats else None
+
+    async def purchase(self, user_id, item) -> Optional[dict]:
+        _, stats = self._modify("user_stats", {"user_id": user_id, **purchase_filter(item["price"])}, lambda s: purchased(s, item))
+        return project(stats, PURCHASE_FIELDS) if stats else None
+
+    async def grant_exp(self, user_id, skill_id, exp) -> Optional[dict]:
+        _, skill = self._modify("skills", {"user_id": user_id, "id": skill_id}, lambda s: granted_exp(s, skill_id, exp))
+        return project(skill, {"_id": 0}) if skill else None
+
+    async def revoke_exp(self, user_id, skill_id, exp) -> Optional[dict]:
+        skill, _ = self._modify("skills", {"user_id": user_id, "id": skill_id}, lambda s: revoked_exp(s, exp))
+        return {"id": skill["id"], "exp": skill["exp"]} if skill else None
+
+    # --- AGREGATIONS ---
+
+    async def ledger_totals(self, query) -> dict:
+        coins, count, exp = 0, 0, {}
+        for entry in self._select("ledger", query):
+            coins += entry.get("coins", 0)
+            count += 1
+            for skill, delta in (entry.get("exp") or {}).items():
+                exp[skill] = exp.get(skill, 0) + delta
+        return {"coins": coins, "count": count, "exp": exp}
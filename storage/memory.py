@@ -0,0 +1,106 @@
+from contextlib import nullcontext
+
+from storage.base import DuplicateKey
+from storage.embedded import ALL, DocumentStorage, document_key
+from storage.text import TEXT_FIELDS, term_weights
+
+# --- BACKEND MEMOIRE ---
+# Tout tient dans des dictionnaires du processus : aucune persistance, un seul
+# worker. Pour le développement, les tests de charge et les instances jetables.
+
+
+class MemoryCollection:
+    def __init__(self):
+        self.docs = {}   # _id -> document, dans l'ordre d'insertion
+        self.users = {}  # user_id -> {_id -> document}
+        self.keys = {}   # clé unique -> _id
+        self.postings = {}  # user_id -> terme -> {_id -> poids} (collections avec index texte)
+
+    def index_text(self, name: str, doc: dict):
+        if name in TEXT_FIELDS:
+            user_terms = self.postings.setdefault(doc.get("user_id"), {})
+            for term, weight in term_weights(name, doc).items():
+                user_terms.setdefault(term, {})[doc["_id"]] = weight
+
+    def unindex_text(self, name: str, doc: dict):
+        if name in TEXT_FIELDS:
+            user_terms = self.postings.get(doc.get("user_id"), {})
+            for term in term_weights(name, doc):
+                user_terms.get(term, {}).pop(doc["_id"], None)
+
+
+class MemoryStorage(DocumentStorage):
+    name = "memory"
+
+    def __init__(self):
+        self.collections = {}
+
+    def _collection(self, name: str) -> MemoryCollection:
+        collection = self.collections.get(name)
+        if collection is None:
+            collection = self.collections[name] = MemoryCollection()
+        return collection
+
+    def _transaction(self):
+        # Un seul processus, opérations sans await : rien à verrouiller
+        return nullcontext()
+
+    def _get(self, collection, doc_id):
+        return self._collection(collection).docs.get(doc_id)
+
+    def _get_unique(self, collection, key):
+        c = self._collection(collection)
+        doc_id = c.keys.get(key)
+        return c.docs.get(doc_id) if doc_id is not None else None
+
+    def _scan(self, collection, user_id=ALL):
+        c = self._collection(collection)
+        docs = c.docs if user_id is ALL else c.users.get(user_id, {})
+        return list(docs.values())
+
+    def _insert(self, collection, doc):
+        c = self._collection(collection)
+        key = document_key(collection, doc)
+        if doc["_id"] in c.docs or (key is not None and key in c.keys):
+            raise DuplicateKey(f"{collection} : {key or doc['_id']}")
+        c.docs[doc["_id"]] = doc
+        c.users.setdefault(doc.get("user_id"), {})[doc["_id"]] = doc
+        if key is not None:
+            c.keys[key] = doc["_id"]
+        c.index_text(collection, doc)
+
+    def _replace(self, collection, doc):
+        c = self._collection(collection)
+        old = c.docs[doc["_id"]]
+        old_key, key = document_key(collection, old), document_key(collection, doc)
+        if key != old_key:
+            if key is not None and key in c.keys:
+                raise DuplicateKey(f"{collection} : {key}")
+            c.keys.pop(old_key, None)
+            if key is not None:
+                c.keys[key] = doc["_id"]
+        if old.get("user_id") != doc.get("user_id"):
+            c.users[old.get("user_id")].pop(doc["_id"], None)
+        c.docs[doc["_id"]] = doc
+        c.users.setdefault(doc.get("user_id"), {})[doc["_id"]] = doc
+        c.unindex_text(collection, old)
+        c.index_text(collection, doc)
+
+    def _remove(self, collection, doc):
+        c = self._collection(collection)
+        c.docs.pop(doc["_id"], None)
+        c.users.get(doc.get("user_id"), {}).pop(doc["_id"], None)
+        key = document_key(collection, doc)
+        if key is not None and c.keys.get(key) == doc["_id"]:
+            del c.keys[key]
+        c.unindex_text(collection, doc)
+
+    def _text_search(self, collection, terms, user_id=ALL):
+        c = self._collection(collection)
+        postings = c.postings.values() if user_id is ALL else [c.postings.get(user_id, {})]
+        totals = {}
+        for user_terms in postings:
+            for term in set(terms):
+                for doc_id, weight in user_terms.get(term, {}).items():
+                    totals[doc_id] = totals.get(doc_id, 0.0) + weight
+        return [(c.docs[doc_id], total) for doc_id, total in totals.items()]
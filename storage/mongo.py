@@ -0,0 +1,221 @@
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from history import encode
+from indexes import ensure_indexes, explain_queries
+from pagination import RELEVANCE_ORDER, after_filter
+from progression import grant_exp, progression_table, skill_ranks
+from rewards import (
+    grant_coins_update, grant_exp_guard, grant_exp_pipeline, purchase_filter, purchase_pipeline,
+    revoke_coins_pipeline, revoke_exp_pipeline,
+)
+from storage.base import PURCHASE_FIELDS, DuplicateKey, Storage
+from storage.text import words
+from tenancy import DEFAULT_USER_ID, migrate_to_tenancy
+
+# --- BACKEND MONGODB ---
+# Le backend de production : les filtres et mises à jour sont passés tels quels,
+# les récompenses sont des pipelines conditionnels (rewards.py).
+
+DUPLICATE_KEY = 11000
+
+
+class MongoStorage(Storage):
+    name = "mongo"
+
+    def __init__(self, url: str, db_name: str, event_listeners=()):
+        self.client = AsyncIOMotorClient(url, event_listeners=list(event_listeners))
+        self.db = self.client[db_name]
+
+    async def prepare(self):
+        # Les index (dont l'unicité de habit_history) doivent exister avant les migrations
+        await ensure_indexes(self.db)
+        migrated = await migrate_to_tenancy(self.db)
+        if migrated:
+            print(f"👥 Données existantes rattachées au joueur '{DEFAULT_USER_ID}' : {migrated}")
+        await self.migrate_legacy_history()
+
+    async def close(self):
+        self.client.close()
+
+    async def migrate_legacy_history(self):
+        """Convertit les anciens tableaux completion_history en masques de bits annuels"""
+        operations = []
+        habit_ids = []
+        projection = {"_id": 0, "id": 1, "user_id": 1, "completion_history": 1}
+        async for habit in self.db.habits.find({"completion_history": {"$exists": True}}, projection):
+            habit_ids.append(habit["id"])
+            user_id = habit.get("user_id", DEFAULT_USER_ID)
+            for year, months in encode(habit.get("completion_history") or []).items():
+                update = {"$bit": {field: {"or": mask} for field, mask in months.items()}}
+                operations.append(UpdateOne({"user_id": user_id, "habit_id": habit["id"], "year": year}, update, upsert=True))
+        if operations:
+            await self.db.habit_history.bulk_write(operations, ordered=False)
+        if habit_ids:
+            await self.db.habits.update_many({"id": {"$in": habit_ids}}, {"$unset": {"completion_history": ""}})
+            print(f"📦 Historique migré pour {len(habit_ids)} habitude(s).")
+
+    # --- LECTURES ---
+
+    def _cursor(self, collection, query, projection, sort, limit, skip=0):
+        cursor = self.db[collection].find(query or {}, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    async def find(self, collection, query=None, projection=None, sort=None, limit=0, skip=0) -> list:
+        return await self._cursor(collection, query, projection, sort, limit, skip).to_list(None)
+
+    async def iterate(self, collection, query=None, projection=None, sort=None, limit=0, batch_size=100):
+        async for doc in self._cursor(collection, query, projection, sort, limit).batch_size(batch_size):
+            yield doc
+
+    async def find_one(self, collection, query, projection=None, sort=None) -> Optional[dict]:
+        return await self.db[collection].find_one(query, projection, sort=sort)
+
+    async def distinct(self, collection, field, query=None) -> list:
+        return await self.db[collection].distinct(field, query or {})
+
+    async def search(self, collection, text, query, projection=None, limit=0, after=None) -> list:
+        search = " ".join(words(text))
+        if not search:
+            return []
+        pipeline = [
+            {"$match": {**query, "$text": {"$search": search}}},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+        ]
+        if after:
+            pipeline.append({"$match": after_filter(RELEVANCE_ORDER, after)})
+        pipeline.append({"$sort": dict(RELEVANCE_ORDER)})
+        if limit:
+            pipeline.append({"$limit": limit})
+        if projection:
+            pipeline.append({"$project": projection})
+        return await self.db[collection].aggregate(pipeline).to_list(None)
+
+    # --- ECRITURES ---
+
+    async def insert_one(self, collection, doc):
+        try:
+            # Copie : insert_one ajouterait _id au dictionnaire de l'appelant
+            await self.db[collection].insert_one(dict(doc))
+        except DuplicateKeyError as exc:
+            raise DuplicateKey(str(exc)) from exc
+
+    async def insert_many(self, collection, docs):
+        try:
+            await self.db[collection].insert_many([dict(d) for d in docs], ordered=False)
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            if errors and all(e.get("code") == DUPLICATE_KEY for e in errors):
+                raise DuplicateKey(str(exc), rejected=[e["index"] for e in errors]) from exc
+            raise
+
+    async def update_one(self, collection, query, update, upsert=False, projection=None, after=False) -> Optional[dict]:
+        try:
+            return await self.db[collection].find_one_and_update(
+                query, update, projection=projection or {"_id": 1}, upsert=upsert,
+                return_document=ReturnDocument.AFTER if after else ReturnDocument.BEFORE,
+            )
+        except DuplicateKeyError as exc:
+            raise DuplicateKey(str(exc)) from exc
+
+    async def update_many(self, collection, query, update) -> int:
+        result = await self.db[collection].update_many(query, update)
+        return result.modified_count
+
+    async def bulk_update(self, collection, operations, upsert=False):
+        if operations:
+            await self.db[collection].bulk_write([UpdateOne(q, u, upsert=upsert) for q, u in operations], ordered=False)
+
+    async def replace_many(self, collection, docs, key="id"):
+        if docs:
+            await self.db[collection].bulk_write([ReplaceOne({key: d[key]}, d, upsert=True) for d in docs])
+
+    async def delete_one(self, collection, query, projection=None) -> Optional[dict]:
+        return await self.db[collection].find_one_and_delete(query, projection=projection or {"_id": 1})
+
+    async def delete_many(self, collection, query) -> int:
+        return (await self.db[collection].delete_many(query)).deleted_count
+
+    # --- RECOMPENSES ATOMIQUES ---
+
+    async def grant_coins(self, user_id, coins) -> Optional[int]:
+        stats = await self.db.user_stats.find_one_and_update(
+            {"user_id": user_id}, grant_coins_update(coins),
+            projection={"_id": 0, "coins": 1}, return_document=ReturnDocument.AFTER
+        )
+        return stats["coins"] if stats else None
+
+    async def revoke_coins(self, user_id, coins) -> Optional[int]:
+        stats = await self.db.user_stats.find_one_and_update(
+            {"user_id": user_id}, revoke_coins_pipeline(coins), projection={"_id": 0, "coins": 1}
+        )
+        return stats["coins"] if stats else None
+
+    async def purchase(self, user_id, item) -> Optional[dict]:
+        # Débit + effet en une seule écriture, gardée par coins >= prix
+        return await self.db.user_stats.find_one_and_update(
+            {"user_id": user_id, **purchase_filter(item["price"])}, purchase_pipeline(item),
+            projection=PURCHASE_FIELDS, return_document=ReturnDocument.AFTER
+        )
+
+    async def grant_exp(self, user_id, skill_id, exp) -> Optional[dict]:
+        query = {"user_id": user_id, "id": skill_id}
+        table = progression_table()
+        skill = await self.db.skills.find_one_and_update(
+            {**query, "$expr": grant_exp_guard(exp, table)}, grant_exp_pipeline(exp, skill_ranks(skill_id), table),
+            projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+        if skill is not None:
+            return skill
+        # Montée de niveau d'une compétence hors de la table standard (données anciennes) :
+        # progression.grant_exp, écrit en compare-and-set sur l'état lu
+        while True:
+            current = await self.db.skills.find_one(query, {"_id": 0, "level": 1, "exp": 1, "max_exp": 1})
+            if current is None:
+                return None
+            progress = grant_exp(skill_id, current["level"], current["exp"], current["max_exp"], exp)
+            skill = await self.db.skills.find_one_and_update(
+                {**query, **current}, {"$set": progress._asdict()},
+                projection={"_id": 0}, return_document=ReturnDocument.AFTER
+            )
+            if skill is not None:
+                return skill
+
+    async def revoke_exp(self, user_id, skill_id, exp) -> Optional[dict]:
+        return await self.db.skills.find_one_and_update(
+            {"user_id": user_id, "id": skill_id}, revoke_exp_pipeline(exp), projection={"_id": 0, "id": 1, "exp": 1}
+        )
+
+    # --- AGREGATIONS ---
+
+    async def ledger_totals(self, query) -> dict:
+        result = await self.db.ledger.aggregate([
+            {"$match": query},
+            {"$facet": {
+                "coins": [{"$group": {"_id": None, "coins": {"$sum": "$coins"}, "count": {"$sum": 1}}}],
+                "exp": [
+                    {"$project": {"exp": {"$objectToArray": {"$ifNull": ["$exp", {}]}}}},
+                    {"$unwind": "$exp"},
+                    {"$group": {"_id": "$exp.k", "total": {"$sum": "$exp.v"}}},
+                ],
+            }},
+        ]).to_list(None)
+        totals = result[0] if result else {"coins": [], "exp": []}
+        coins = totals["coins"][0] if totals["coins"] else {"coins": 0, "count": 0}
+        return {
+            "coins": coins["coins"],
+            "count": coins["count"],
+            "exp": {e["_id"]: e["total"] for e in totals["exp"]},
+        }
+
+    async def diagnostics(self) -> Optional[list]:
+        return await explain_queries(self.db)
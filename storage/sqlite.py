@@ -0,0 +1,196 @@
+import sqlite3
+from contextlib import contextmanager
+from datetime import timezone
+
+import bson
+import orjson
+from bson.codec_options import CodecOptions
+
+from storage.base import DuplicateKey
+from storage.embedded import ALL, DocumentStorage, document_key
+from storage.text import TEXT_FIELDS, term_weights
+
+# --- BACKEND SQLITE ---
+# Un fichier local, sans service : une table de documents (BSON) avec la clé
+# unique de la collection et le joueur en colonnes indexées. Les écritures
+# passent par BEGIN IMMEDIATE, donc plusieurs workers peuvent partager le fichier.
+# L'index inversé des recherches plein texte est une table (postings) écrite dans
+# la même transaction que le document : il reste juste pour tous les workers.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    user_id TEXT,
+    unique_key TEXT,
+    body BLOB NOT NULL,
+    PRIMARY KEY (collection, doc_id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS documents_unique_key ON documents (collection, unique_key);
+CREATE INDEX IF NOT EXISTS documents_user ON documents (collection, user_id);
+CREATE TABLE IF NOT EXISTS postings (
+    collection TEXT NOT NULL,
+    user_id TEXT,
+    term TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    weight REAL NOT NULL,
+    PRIMARY KEY (collection, user_id, term, doc_id)
+);
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (collection, doc_id);
+"""
+
+CODEC_OPTIONS = CodecOptions(tz_aware=True, tzinfo=timezone.utc)
+
+
+def encode_id(doc_id) -> str:
+    return f"{type(doc_id).__name__}:{doc_id}"
+
+
+def encode_key(key) -> str:
+    return orjson.dumps(list(key), default=str).decode() if key is not None else None
+
+
+def decode(body: bytes) -> dict:
+    return bson.decode(body, codec_options=CODEC_OPTIONS)
+
+
+class SQLiteStorage(DocumentStorage):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=10.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._depth = 0
+
+    async def prepare(self):
+        # Fichiers créés avant l'index inversé : on l'alimente une fois avec les documents existants
+        for collection in TEXT_FIELDS:
+            if self.conn.execute("SELECT 1 FROM postings WHERE collection = ? LIMIT 1", (collection,)).fetchone():
+                continue
+            with self._transaction():
+                for doc in self._scan(collection):
+                    self._index_text(collection, doc)
+
+    async def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        if self._depth:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._depth = 1
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        else:
+            self.conn.execute("COMMIT")
+        finally:
+            self._depth = 0
+
+    def _one(self, sql: str, params: tuple):
+        row = self.conn.execute(sql, params).fetchone()
+        return decode(row[0]) if row else None
+
+    def _get(self, collection, doc_id):
+        return self._one("SELECT body FROM documents WHERE collection = ? AND doc_id = ?", (collection, encode_id(doc_id)))
+
+    def _get_unique(self, collection, key):
+        return self._one("SELECT body FROM documents WHERE collection = ? AND unique_key = ?", (collection, encode_key(key)))
+
+    def _scan(self, collection, user_id=ALL):
+        if user_id is ALL:
+            rows = self.conn.execute("SELECT body FROM documents WHERE collection = ? ORDER BY rowid", (collection,))
+        else:
+            rows = self.conn.execute(
+                "SELECT body FROM documents WHERE collection = ? AND user_id = ? ORDER BY rowid", (collection, user_id)
+            )
+        return [decode(body) for body, in rows]
+
+    def _scan_batches(self, collection, user_id=ALL, batch_size=100):
+        # Une requête par lot, reprise après le dernier rowid lu : pas de curseur ouvert entre deux lots
+        where, params = "collection = ?", (collection,)
+        if user_id is not ALL:
+            where, params = where + " AND user_id = ?", params + (user_id,)
+        last = 0
+        while True:
+            rows = self.conn.execute(
+                f"SELECT rowid, body FROM documents WHERE {where} AND rowid > ? ORDER BY rowid LIMIT ?",
+                (*params, last, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [decode(body) for _, body in rows]
+
+    @staticmethod
+    def _columns(collection, doc) -> tuple:
+        user_id = doc.get("user_id")
+        return (
+            user_id if isinstance(user_id, str) else None,
+            encode_key(document_key(collection, doc)),
+            bson.encode(doc),
+        )
+
+    def _index_text(self, collection, doc):
+        user_id = doc.get("user_id")
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO postings (collection, user_id, term, doc_id, weight) VALUES (?, ?, ?, ?, ?)",
+            [(collection, user_id if isinstance(user_id, str) else None, term, encode_id(doc["_id"]), weight)
+             for term, weight in term_weights(collection, doc).items()],
+        )
+
+    def _unindex_text(self, collection, doc):
+        self.conn.execute("DELETE FROM postings WHERE collection = ? AND doc_id = ?", (collection, encode_id(doc["_id"])))
+
+    def _insert(self, collection, doc):
+        try:
+            self.conn.execute(
+                "INSERT INTO documents (collection, doc_id, user_id, unique_key, body) VALUES (?, ?, ?, ?, ?)",
+                (collection, encode_id(doc["_id"]), *self._columns(collection, doc)),
+            )
+        except sqlite3.IntegrityError as exc:
+            raise DuplicateKey(f"{collection} : {exc}") from exc
+        if collection in TEXT_FIELDS:
+            self._index_text(collection, doc)
+
+    def _replace(self, collection, doc):
+        try:
+            self.conn.execute(
+                "UPDATE documents SET user_id = ?, unique_key = ?, body = ? WHERE collection = ? AND doc_id = ?",
+                (*self._columns(collection, doc), collection, encode_id(doc["_id"])),
+            )
+        except sqlite3.IntegrityError as exc:
+            raise DuplicateKey(f"{collection} : {exc}") from exc
+        if collection in TEXT_FIELDS:
+            self._unindex_text(collection, doc)
+            self._index_text(collection, doc)
+
+    def _remove(self, collection, doc):
+        self.conn.execute("DELETE FROM documents WHERE collection = ? AND doc_id = ?", (collection, encode_id(doc["_id"])))
+        if collection in TEXT_FIELDS:
+            self._unindex_text(collection, doc)
+
+    def _text_search(self, collection, terms, user_id=ALL):
+        terms = sorted(set(terms))
+        sql = (
+            "SELECT d.body, SUM(p.weight) FROM postings p"
+            " JOIN documents d ON d.collection = p.collection AND d.doc_id = p.doc_id"
+            f" WHERE p.collection = ? AND p.term IN ({', '.join('?' * len(terms))})"
+        )
+        params = [collection, *terms]
+        if user_id is not ALL:
+            sql += " AND p.user_id = ?"
+            params.append(user_id)
+        rows = self.conn.execute(sql + " GROUP BY p.doc_id", params)
+        return [(decode(body), total) for body, total in rows]
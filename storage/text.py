@@ -0,0 +1,67 @@
+import math
+import re
+import unicodedata
+
+from pymongo import TEXT
+
+from indexes import INDEXES
+
+# --- RECHERCHE PLEIN TEXTE (BACKENDS EMBARQUES) ---
+# Équivalent de l'index texte MongoDB : un index inversé (terme -> documents)
+# par joueur, tenu à jour à chaque écriture. Les termes sont les mots du texte
+# en minuscules, sans accents ni mots vides, au singulier approximatif
+# (« Séances » -> « seance »). Comme $text, une recherche de plusieurs mots
+# renvoie les documents qui en contiennent au moins un.
+
+TEXT_FIELDS = {
+    name: tuple(field for field, kind in model.document["key"].items() if kind == TEXT)
+    for name, models in INDEXES.items() for model in models if TEXT in model.document["key"].values()
+}
+
+# Décimales gardées du score : il sert de clé de curseur, il doit être stable d'une lecture à l'autre
+SCORE_DIGITS = 6
+
+STOP_WORDS = frozenset("""
+    a au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma mais me meme mes moi mon
+    ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous
+    c d j l m n s t y ete etre est sont ai as avons avez ont fait the and of to in is it
+""".split())
+
+WORD = re.compile(r"\w+")
+
+
+def words(text: str) -> list:
+    """Mots de la recherche tels que saisis (ponctuation, guillemets et « - » retirés)"""
+    return WORD.findall(text or "")
+
+
+def _term(word: str) -> str:
+    word = unicodedata.normalize("NFKD", word.lower())
+    word = "".join(c for c in word if not unicodedata.combining(c))
+    if len(word) > 3 and word[-1] in "sx":
+        word = word[:-1]
+    return word
+
+
+def terms(text: str) -> list:
+    return [t for t in (_term(w) for w in words(text)) if len(t) > 1 and t not in STOP_WORDS]
+
+
+def term_weights(collection: str, doc: dict) -> dict:
+    """{terme: poids} d'un document : fréquence du terme, atténuée par la longueur du texte"""
+    tokens = []
+    for field in TEXT_FIELDS.get(collection, ()):
+        value = doc.get(field)
+        if isinstance(value, str):
+            tokens.extend(terms(value))
+    if not tokens:
+        return {}
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    norm = math.sqrt(len(tokens))
+    return {term: count / norm for term, count in counts.items()}
+
+
+def score(total: float) -> float:
+    return round(total, SCORE_DIGITS)
@@ -0,0 +1,54 @@
+import re
+from typing import Optional
+
+from fastapi import Header, HTTPException, Query
+
+# --- JOUEURS (MULTI-UTILISATEUR) ---
+# Chaque document de jeu porte un user_id, en tête de tous les index composés :
+# les requêtes d'un joueur ne touchent que ses documents et le même préfixe
+# sert de clé de partitionnement (voir SHARD_KEYS dans indexes.py).
+# L'identité vient de l'en-tête X-User-Id ; sans en-tête, c'est le joueur par
+# défaut, qui est aussi le propriétaire des données d'avant le multi-joueur.
+
+DEFAULT_USER_ID = "default"
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.@:-]{1,64}$")
+
+# Collections dont chaque document appartient à un joueur
+USER_COLLECTIONS = (
+    "user_stats", "habits", "habit_history", "missions", "mission_quotas", "skills", "achievement_unlocks",
+    "daily_reviews", "daily_outcomes", "daily_rollups", "ledger", "ledger_snapshots",
+)
+
+
+async def current_user(x_user_id: Optional[str] = Header(None)) -> str:
+    """Dépendance FastAPI : identifiant du joueur de la requête"""
+    if x_user_id is None:
+        return DEFAULT_USER_ID
+    if not USER_ID_PATTERN.match(x_user_id):
+        raise HTTPException(status_code=400, detail="X-User-Id invalide")
+    return x_user_id
+
+
+async def stream_user(x_user_id: Optional[str] = Header(None), user_id: Optional[str] = Query(None)) -> str:
+    """Comme current_user, avec ?user_id= en repli : EventSource ne peut pas envoyer d'en-tête"""
+    return await current_user(x_user_id if x_user_id is not None else user_id)
+
+
+async def migrate_to_tenancy(db) -> dict:
+    """Rattache au joueur par défaut les documents créés avant le multi-joueur"""
+    migrated = {}
+    for name in USER_COLLECTIONS:
+        result = await db[name].update_many({"user_id": {"$exists": False}}, {"$set": {"user_id": DEFAULT_USER_ID}})
+        if result.modified_count:
+            migrated[name] = result.modified_count
+
+    # Les succès débloqués quittaient le catalogue commun : un document par (joueur, succès)
+    unlocked = await db.achievements.find({"unlocked": True}, {"_id": 0, "id": 1}).to_list(None)
+    for achievement in unlocked:
+        await db.achievement_unlocks.update_one(
+            {"user_id": DEFAULT_USER_ID, "id": achievement["id"]}, {"$setOnInsert": {"unlocked_at": None}}, upsert=True
+        )
+    if unlocked:
+        await db.achievements.update_many({}, {"$unset": {"unlocked": ""}})
+        migrated["achievement_unlocks"] = len(unlocked)
+    return migrated
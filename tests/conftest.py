@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+# Les tests tournent sur le backend mémoire : ni MongoDB ni fichier à préparer
+os.environ["STORAGE_BACKEND"] = "memory"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import open_storage  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def loop():
+    # Une seule boucle pour toute la session : le Storage de server.py est partagé entre les tests
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def run(loop):
+    return loop.run_until_complete
+
+
+@pytest.fixture
+def store():
+    return open_storage("memory")
+
+
+@pytest.fixture
+def user_id():
+    return f"test-{uuid.uuid4()}"
+
+
+@pytest.fixture
+def client(run):
+    import httpx
+
+    import server
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test")
+    yield client
+    run(client.aclose())
@@ -0,0 +1,59 @@
+import asyncio
+
+from achievements import AchievementEngine
+
+
+def test_candidates_only_reach_thresholds_of_touched_metrics():
+    engine = AchievementEngine(store=None)
+    assert engine.candidates(streak=14) == ["streak_7", "streak_14"]
+    assert engine.candidates(streak=6, coins=None) == []
+    assert engine.candidates(hp=100, perfect_days=1) == ["heal_hp", "perfect_1"]
+
+
+def test_record_unlocks_each_achievement_once(run, store):
+    published = []
+    engine = AchievementEngine(store, on_unlock=lambda user_id, ids: published.append((user_id, ids)))
+
+    async def scenario():
+        steps = [
+            await engine.record("alice", streak=7),
+            await engine.record("alice", streak=8),
+            await engine.record("alice", streak=14, coins=10),
+            await engine.record("bob", streak=7),
+        ]
+        docs = await store.find("achievement_unlocks", {"user_id": "alice"}, {"_id": 0, "id": 1, "unlocked_at": 1})
+        return steps, docs
+
+    steps, docs = run(scenario())
+    assert steps == [["streak_7"], [], ["streak_14"], ["streak_7"]]
+    assert published == [("alice", ["streak_7"]), ("alice", ["streak_14"]), ("bob", ["streak_7"])]
+    assert sorted(d["id"] for d in docs) == ["streak_14", "streak_7"]
+    assert all(d["unlocked_at"] for d in docs)
+
+
+def test_workers_share_unlocks_through_the_store(run, store):
+    workers = [AchievementEngine(store) for _ in range(3)]
+
+    async def scenario():
+        # Trois workers débloquent le même palier en même temps : un seul document par (joueur, succès)
+        await asyncio.gather(*(w.record("alice", perfect_days=1) for w in workers))
+        late = AchievementEngine(store)
+        again = await late.record("alice", perfect_days=1)
+        return again, await store.find("achievement_unlocks", {"user_id": "alice"}, {"_id": 0, "id": 1})
+
+    again, docs = run(scenario())
+    assert again == []
+    assert docs == [{"id": "perfect_1"}]
+
+
+def test_invalidate_forgets_cached_unlocks(run, store):
+    engine = AchievementEngine(store)
+
+    async def scenario():
+        await engine.record("alice", streak=7)
+        await store.delete_many("achievement_unlocks", {"user_id": "alice"})
+        cached = await engine.record("alice", streak=7)
+        engine.invalidate("alice")
+        return cached, await engine.record("alice", streak=7)
+
+    assert run(scenario()) == ([], ["streak_7"])
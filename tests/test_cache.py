@@ -0,0 +1,57 @@
+import server
+from cache import CachedResource
+
+
+def loader(calls: list):
+    async def load():
+        calls.append(1)
+        return [{"id": "potion", "price": 50 * len(calls)}]
+    return load
+
+
+def test_entry_is_loaded_once_until_the_stamp_changes(run, store):
+    calls = []
+    # ttl=0 : chaque lecture relit le tampon de version, comme un worker dont le TTL vient d'expirer
+    cached = CachedResource("shop_items", loader(calls), store, ttl=0)
+    other_worker = CachedResource("shop_items", loader([]), store, ttl=0)
+
+    async def scenario():
+        first, again = await cached.get(), await cached.get()
+        loads = len(calls)
+        await other_worker.invalidate()
+        return first, again, loads, await cached.get()
+
+    first, again, loads, after = run(scenario())
+    assert again is first and loads == 1
+    assert after.version == first.version + 1
+    assert after.etag != first.etag and after.payload == [{"id": "potion", "price": 100}]
+
+
+def test_fresh_entry_skips_the_stamp_until_ttl(run, store):
+    calls = []
+    cached = CachedResource("shop_items", loader(calls), store, ttl=60)
+
+    async def scenario():
+        first = await cached.get()
+        await store.update_one("cache_versions", {"_id": "shop_items"}, {"$inc": {"version": 1}}, upsert=True)
+        return first, await cached.get()
+
+    first, second = run(scenario())
+    assert second is first and len(calls) == 1
+
+
+def test_if_none_match_returns_304_until_invalidated(run, client):
+    response = run(client.get("/api/shop"))
+    etag = response.headers["ETag"]
+    assert response.status_code == 200 and response.headers["Cache-Control"]
+
+    for header in (etag, f'W/{etag}', f'"autre", {etag}', "*"):
+        cached = run(client.get("/api/shop", headers={"If-None-Match": header}))
+        assert cached.status_code == 304 and cached.content == b""
+        assert cached.headers["ETag"] == etag
+
+    run(server.shop_cache.invalidate())
+    stale = run(client.get("/api/shop", headers={"If-None-Match": etag}))
+    assert stale.status_code == 200
+    assert stale.headers["ETag"] != etag
+    assert stale.json() == response.json()
@@ -0,0 +1,110 @@
+import asyncio
+from datetime import date, timedelta
+
+import server
+
+
+def days_ago(days: int) -> str:
+    return (date.today() - timedelta(days=days)).isoformat()
+
+
+async def new_player(user_id: str, last_streak_update: str, **fields) -> dict:
+    stats = server.UserStats(user_id=user_id, last_streak_update=last_streak_update, **fields).model_dump()
+    await server.store.insert_one("user_stats", dict(stats))
+    return stats
+
+
+async def load_stats(user_id: str) -> dict:
+    return await server.store.find_one("user_stats", {"user_id": user_id}, {"_id": 0})
+
+
+def test_reset_settles_each_elapsed_day(run, user_id):
+    async def scenario():
+        stats = await new_player(user_id, days_ago(3), coins=100)
+        await server.process_daily_reset(stats, date.today().isoformat())
+        return await load_stats(user_id)
+
+    stats = run(scenario())
+    assert stats["last_streak_update"] == date.today().isoformat()
+    assert stats["days_settled"] == 3
+    assert stats["perfect_days"] == 3
+    assert stats["streak"] == 3
+
+
+def test_reset_keeps_coins_granted_after_the_read(run, user_id):
+    # Régression : le bilan écrasait les coins gagnés entre sa lecture et son écriture
+    async def scenario():
+        snapshot = await new_player(user_id, days_ago(1), coins=100)
+        await server.store.grant_coins(user_id, 500)
+        await server.process_daily_reset(snapshot, date.today().isoformat())
+        return await load_stats(user_id)
+
+    stats = run(scenario())
+    assert stats["coins"] == 600
+    assert stats["days_settled"] == 1
+
+
+def test_reset_replays_death_penalty_on_current_balance(run, user_id):
+    async def scenario():
+        snapshot = await new_player(user_id, days_ago(1), hp=1, coins=100)
+        await server.store.insert_one("habits", server.Habit(user_id=user_id, name="h", skill="tech", coin_reward=0, exp_reward=0).model_dump())
+        await server.store.grant_coins(user_id, 900)
+        await server.process_daily_reset(snapshot, date.today().isoformat())
+        return await load_stats(user_id)
+
+    stats = run(scenario())
+    # Mort : la pénalité s'applique aux 1000 coins réellement détenus, pas aux 100 lus
+    assert stats["deaths"] == 1
+    assert stats["coins"] == 900
+
+
+def test_concurrent_resets_settle_once(run, user_id):
+    async def scenario():
+        stats = await new_player(user_id, days_ago(2))
+        today = date.today().isoformat()
+        # Mêmes (joueur, jour) : fusionnés par le single-flight ; copies distinctes : départagés par le compare-and-set
+        await asyncio.gather(*(server.settle_daily_reset(dict(stats), today) for _ in range(5)))
+        await asyncio.gather(*(server.process_daily_reset(dict(stats), today) for _ in range(5)))
+        outcomes = await server.store.find("daily_outcomes", {"user_id": user_id})
+        return await load_stats(user_id), outcomes
+
+    stats, outcomes = run(scenario())
+    assert stats["days_settled"] == 2
+    assert len(outcomes) == 2
+
+
+def test_demo_reset_clears_daily_history(run, client, user_id):
+    headers = {"X-User-Id": user_id}
+    run(client.post("/api/init-demo-data", headers=headers))
+    run(server.store.update_one("user_stats", {"user_id": user_id}, {"$set": {"last_streak_update": days_ago(2)}}))
+    assert run(client.get("/api/stats", headers=headers)).json()["days_settled"] == 2
+
+    run(client.post("/api/init-demo-data", headers=headers))
+    history = run(client.get("/api/history/daily", headers=headers)).json()
+    rollup = run(client.get(f"/api/history/monthly/{days_ago(2)[:7]}", headers=headers))
+    assert run(client.get("/api/stats", headers=headers)).json()["days_settled"] == 0
+    assert history["days"] == []
+    assert rollup.json()["days"] == 0
+
+
+def test_replayed_day_keeps_its_first_outcome(run, user_id):
+    # last_streak_update qui recule (changement de fuseau) : le jour est rejoué sans erreur ni double comptage
+    async def scenario():
+        stats = await new_player(user_id, days_ago(2))
+        await server.process_daily_reset(stats, days_ago(1))
+        await server.store.update_one("user_stats", {"user_id": user_id}, {"$set": {"last_streak_update": days_ago(2)}})
+        await server.process_daily_reset(await load_stats(user_id), date.today().isoformat())
+        outcomes = await server.store.find("daily_outcomes", {"user_id": user_id}, {"_id": 0, "date": 1})
+        rollups = await server.store.find("daily_rollups", {"user_id": user_id}, {"_id": 0, "days": 1})
+        return await load_stats(user_id), outcomes, rollups
+
+    stats, outcomes, rollups = run(scenario())
+    assert stats["last_streak_update"] == date.today().isoformat()
+    assert sorted(o["date"] for o in outcomes) == [days_ago(2), days_ago(1)]
+    assert sum(r["days"] for r in rollups) == 2
+
+
+def test_monthly_rollup_needs_a_padded_month(run, client, user_id):
+    headers = {"X-User-Id": user_id}
+    for month, status in (("2026-01", 200), ("2026-1", 400), ("26-01", 400), ("2026-13", 400)):
+        assert run(client.get(f"/api/history/monthly/{month}", headers=headers)).status_code == status
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import date
+
+import server
+from events import Broadcaster, format_event, sse_stream
+
+
+def drain(queue: asyncio.Queue) -> list:
+    messages = []
+    while not queue.empty():
+        message = queue.get_nowait()
+        messages.append((message.event, message.data))
+    return messages
+
+
+def test_create_and_delete_routes_publish(run, client, user_id):
+    headers = {"X-User-Id": user_id}
+    habit = {"id": "h1", "name": "Lire", "skill": "tech", "coin_reward": 5, "exp_reward": 10}
+    missions = [{"id": f"m{i}", "title": "m", "date": date.today().isoformat(), "skill": "tech", "crucial": False} for i in range(2)]
+
+    async def scenario():
+        async with server.broadcaster.subscribe(user_id) as queue:
+            await client.post("/api/habits", json=habit, headers=headers)
+            await client.post("/api/missions/batch", json=missions, headers=headers)
+            # Doublon : seule la mission réellement créée est annoncée
+            await client.post("/api/missions/batch", json=[missions[0], {**missions[0], "id": "m2"}], headers=headers)
+            await client.delete("/api/missions/m0", headers=headers)
+            await client.delete("/api/habits/h1", headers=headers)
+            # Rien à supprimer : pas d'événement
+            await client.delete("/api/habits/h1", headers=headers)
+            return drain(queue)
+
+    events = run(scenario())
+    assert [(event, sorted(data)) for event, data in events] == [
+        ("habits", ["created"]), ("missions", ["created"]), ("missions", ["created"]),
+        ("missions", ["deleted"]), ("habits", ["deleted"]),
+    ]
+    assert events[0][1]["created"][0] == {**habit, "user_id": user_id, "description": "", "completed_today": False}
+    assert [[m["id"] for m in data["created"]] for _, data in events[1:3]] == [["m0", "m1"], ["m2"]]
+    assert [data["deleted"] for _, data in events[3:]] == [["m0"], ["h1"]]
+
+
+def test_events_stay_with_their_player(run, client, user_id):
+    async def scenario():
+        async with server.broadcaster.subscribe(f"{user_id}-other") as queue:
+            await client.post("/api/habits", json={"name": "Lire", "skill": "tech", "coin_reward": 5, "exp_reward": 10},
+                              headers={"X-User-Id": user_id})
+            return drain(queue)
+
+    assert run(scenario()) == []
+
+
+def test_stream_sends_snapshot_then_events(run):
+    broadcaster = Broadcaster()
+
+    async def snapshot():
+        return {"coins": 0}
+
+    async def disconnected():
+        return False
+
+    async def scenario():
+        stream = sse_stream(broadcaster, "alice", snapshot, disconnected, heartbeat=0.01)
+        first = await stream.__anext__()
+        broadcaster.publish("alice", "habits", {"deleted": ["h1"]})
+        second = await stream.__anext__()
+        await stream.aclose()
+        return first, second, broadcaster.subscribers("alice")
+
+    first, second, subscribers = run(scenario())
+    assert first == format_event("stats", {"coins": 0})
+    assert second == b'event: habits\ndata: {"deleted":["h1"]}\n\n'
+    assert subscribers == 0
@@ -0,0 +1,27 @@
+from datetime import date
+
+import pytest
+
+from history import MAX_RANGE_DAYS, decode, encode, parse_range
+
+
+def test_encode_decode_round_trip():
+    days = ["2025-12-31", "2026-01-01", "2026-01-31", "2026-02-14"]
+    docs = encode(days)
+    decoded = [day for year, months in docs.items() for day in decode({"year": year, **months}, date(2025, 1, 1), date(2026, 12, 31))]
+    assert sorted(decoded) == days
+
+
+def test_range_is_capped():
+    start, end = parse_range("2021-01-01", "2025-12-31")
+    assert (end - start).days < MAX_RANGE_DAYS
+    for start, end in (("0001-01-01", "9999-12-31"), ("2026-02-01", "2026-01-01"), ("2026-1-1", None)):
+        with pytest.raises(ValueError):
+            parse_range(start, end)
+
+
+@pytest.mark.parametrize("path", ["/api/habits/history", "/api/analytics/habits", "/api/history/daily"])
+def test_history_routes_reject_huge_ranges(run, client, user_id, path):
+    params = {"start": "0001-01-01", "end": "9999-12-31"}
+    response = run(client.get(path, params=params, headers={"X-User-Id": user_id}))
+    assert response.status_code == 400
@@ -0,0 +1,61 @@
+import pytest
+
+import server
+from ledger import Ledger, LedgerConflict, LedgerMismatch
+
+
+def test_claim_replays_the_same_operation(run, store):
+    ledger = Ledger(store)
+
+    async def scenario():
+        assert await ledger.claim("alice", "k1", "purchase", "POST /api/shop/purchase?item_id=potion") is None
+        with pytest.raises(LedgerConflict):
+            await ledger.claim("alice", "k1", "purchase", "POST /api/shop/purchase?item_id=potion")
+        await ledger.record("alice", "purchase", -150, response={"ok": True}, key="k1", claimed=True)
+        existing = await ledger.claim("alice", "k1", "purchase", "POST /api/shop/purchase?item_id=potion")
+        # Même clé, autre joueur : clés indépendantes
+        other = await ledger.claim("bob", "k1", "purchase", "POST /api/shop/purchase?item_id=potion")
+        return existing, other, await ledger.balances("alice")
+
+    existing, other, balances = run(scenario())
+    assert existing["response"] == {"ok": True}
+    assert other is None
+    assert balances["coins"] == -150
+
+
+def test_claim_rejects_another_operation(run, store):
+    ledger = Ledger(store)
+
+    async def scenario():
+        await ledger.claim("alice", "k1", "purchase", "POST /api/shop/purchase?item_id=potion")
+        await ledger.record("alice", "purchase", -150, response={"ok": True}, key="k1", claimed=True)
+        for kind, request in (("mission", "PATCH /api/missions/m1?completed=true"),
+                              ("purchase", "POST /api/shop/purchase?item_id=shield")):
+            with pytest.raises(LedgerMismatch):
+                await ledger.claim("alice", "k1", kind, request)
+
+    run(scenario())
+
+
+def test_idempotency_key_over_the_api(run, client, user_id):
+    headers = {"X-User-Id": user_id}
+    run(client.post("/api/init-demo-data", headers=headers))
+    run(server.store.update_one("user_stats", {"user_id": user_id}, {"$set": {"coins": 1000}}))
+    keyed = {**headers, "Idempotency-Key": "achat-1"}
+
+    first = run(client.post("/api/shop/purchase", params={"item_id": "bakery"}, headers=keyed))
+    again = run(client.post("/api/shop/purchase", params={"item_id": "bakery"}, headers=keyed))
+    other_item = run(client.post("/api/shop/purchase", params={"item_id": "drink"}, headers=keyed))
+    other_route = run(client.post("/api/skills/exp", json={"grants": {"tech": 10}}, headers=keyed))
+    stats = run(client.get("/api/stats", headers=headers)).json()
+
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json()
+    assert other_item.status_code == other_route.status_code == 422
+    assert stats["coins"] == 850
+
+
+def test_compaction_is_not_exposed_to_players(run, client, user_id):
+    # Compaction de tous les joueurs : tâche de fond ou `cli.py compact-ledger`, jamais une route publique
+    response = run(client.post("/api/ledger/compact", headers={"X-User-Id": user_id}))
+    assert response.status_code in (404, 405)
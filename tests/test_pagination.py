@@ -0,0 +1,59 @@
+import json
+from datetime import date
+
+import pytest
+
+import server
+from pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+def walk(run, client, path, user_id, limit):
+    """Toutes les pages d'une liste, en suivant X-Next-Cursor"""
+    pages, params = [], {"limit": limit}
+    while True:
+        response = run(client.get(path, params=params, headers={"X-User-Id": user_id}))
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+        params = {"limit": limit, "after": cursor}
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(["2026-01-01", 3])) == ["2026-01-01", 3]
+    with pytest.raises(ValueError):
+        decode_cursor("pas-un-curseur")
+
+
+def test_missions_pages_cover_the_list_once(run, client, user_id):
+    today = date.today().isoformat()
+    missions = [{"title": f"m{i}", "date": today, "skill": "tech", "crucial": False} for i in range(5)]
+    created = run(client.post("/api/missions/batch", json=missions, headers={"X-User-Id": user_id})).json()
+
+    pages = walk(run, client, "/api/missions", user_id, limit=2)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [m["id"] for page in pages for m in page] == [m["id"] for m in created]
+    # Les curseurs sont filtrés par joueur : un autre joueur ne voit rien
+    assert walk(run, client, "/api/missions", f"{user_id}-other", limit=2) == [[]]
+
+
+def test_invalid_cursor_is_rejected(run, client, user_id):
+    response = run(client.get("/api/missions", params={"after": "pas-un-curseur"}, headers={"X-User-Id": user_id}))
+    assert response.status_code == 400
+
+
+def test_achievement_pages_carry_player_unlocks(run, client, user_id):
+    headers = {"X-User-Id": user_id}
+    run(client.post("/api/init-demo-data", headers=headers))
+    run(server.store.insert_one("achievement_unlocks", {"user_id": user_id, "id": "streak_7"}))
+
+    full = run(client.get("/api/achievements", headers=headers)).json()
+    pages = walk(run, client, "/api/achievements", user_id, limit=5)
+    assert [a for page in pages for a in page] == full
+    assert [a["id"] for a in full if a["unlocked"]] == ["streak_7"]
+
+    lines = run(client.get("/api/achievements", params={"format": "ndjson"}, headers=headers)).text.splitlines()
+    assert [json.loads(line) for line in lines] == full
+    other = walk(run, client, "/api/achievements", f"{user_id}-other", limit=5)
+    assert not any(a["unlocked"] for page in other for a in page)
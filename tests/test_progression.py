@@ -0,0 +1,43 @@
+from progression import grant_exp, progression_table, recompute_skills
+
+
+def skill(user_id: str, skill_id: str, level: int, exp: int, max_exp: int) -> dict:
+    return {"user_id": user_id, "id": skill_id, "level": level, "exp": exp, "max_exp": max_exp, "rank": "?"}
+
+
+def test_grant_exp_crosses_many_levels_without_cap():
+    table = progression_table()
+    progress = grant_exp("tech", 1, 0, 100, table.thresholds[80] + 7)
+    assert (progress.level, progress.exp, progress.max_exp) == (81, 7, table.max_exps[80])
+
+
+def test_recompute_skills_covers_all_players(run, store):
+    run(store.insert_many("skills", [
+        skill("alice", "tech", 1, 350, 100),
+        skill("bob", "sport", 1, 250, 100),
+        skill("bob", "music", 2, 10, 150),
+    ]))
+    operations = run(recompute_skills(store, batch_size=2))
+    skills = {(s["user_id"], s["id"]): s for s in run(store.find("skills", {}, {"_id": 0}))}
+
+    assert len(operations) == 3
+    assert (skills["alice", "tech"]["level"], skills["alice", "tech"]["exp"]) == (3, 100)
+    assert (skills["bob", "sport"]["level"], skills["bob", "sport"]["exp"]) == (3, 0)
+    # Déjà normalisée : seul le titre est réécrit
+    assert (skills["bob", "music"]["level"], skills["bob", "music"]["rank"]) == (2, "Auditeur")
+
+
+def test_recompute_skills_for_one_player(run, store):
+    run(store.insert_many("skills", [skill("alice", "tech", 1, 350, 100), skill("bob", "tech", 1, 350, 100)]))
+    run(recompute_skills(store, {"user_id": "alice"}))
+    assert run(store.find_one("skills", {"user_id": "bob"}, {"_id": 0}))["level"] == 1
+
+
+def test_storage_grant_exp_matches_progression(run, store):
+    table = progression_table()
+    cases = [(1, 0, 100, 50), (1, 90, 100, 10), (3, 5, 225, table.thresholds[90]), (4, 10, 77, 5000)]
+    for i, (level, exp, max_exp, amount) in enumerate(cases):
+        run(store.insert_one("skills", skill("alice", f"tech{i}", level, exp, max_exp)))
+        granted = run(store.grant_exp("alice", f"tech{i}", amount))
+        expected = grant_exp(f"tech{i}", level, exp, max_exp, amount)
+        assert (granted["level"], granted["exp"], granted["max_exp"], granted["rank"]) == tuple(expected)
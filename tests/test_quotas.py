@@ -0,0 +1,104 @@
+import asyncio
+from datetime import date
+
+import server
+from quotas import QUOTAS, backfill_quotas, release, reserve, reserve_many
+from rules import MAX_CRUCIAL_MISSIONS, MAX_NORMAL_MISSIONS
+
+DAY = "2026-03-01"
+
+
+async def counter(store, user_id: str = "alice", day: str = DAY) -> dict:
+    return await store.find_one(QUOTAS, {"user_id": user_id, "date": day}, {"_id": 0, "crucial": 1, "normal": 1})
+
+
+def test_parallel_reservations_stop_at_the_quota(run, store):
+    async def scenario():
+        results = await asyncio.gather(*(reserve(store, "alice", DAY, True) for _ in range(10)))
+        return results, await counter(store)
+
+    results, places = run(scenario())
+    assert results.count(True) == MAX_CRUCIAL_MISSIONS
+    assert places == {"crucial": MAX_CRUCIAL_MISSIONS, "normal": 0}
+
+
+def test_release_frees_a_place_without_going_negative(run, store):
+    async def scenario():
+        for _ in range(MAX_NORMAL_MISSIONS):
+            assert await reserve(store, "alice", DAY, False)
+        assert not await reserve(store, "alice", DAY, False)
+        await release(store, "alice", DAY, False)
+        assert await reserve(store, "alice", DAY, False)
+        await release(store, "alice", DAY, True)
+        return await counter(store)
+
+    assert run(scenario()) == {"crucial": 0, "normal": MAX_NORMAL_MISSIONS}
+
+
+def test_batch_reservation_is_all_or_nothing(run, store):
+    async def scenario():
+        exceeded = await reserve_many(store, "alice", {(DAY, False): 2, ("2026-03-02", True): MAX_CRUCIAL_MISSIONS + 1})
+        return exceeded, await counter(store), await reserve_many(store, "alice", {(DAY, False): 2, (DAY, True): 1})
+
+    exceeded, places, accepted = run(scenario())
+    assert exceeded is True
+    assert places == {"crucial": 0, "normal": 0}
+    assert accepted is None
+
+
+def test_rebuild_counts_existing_missions(run, store):
+    async def scenario():
+        await store.insert_many("missions", [
+            {"user_id": "alice", "id": f"m{i}", "date": DAY, "crucial": i < 2} for i in range(5)
+        ] + [{"user_id": "bob", "id": "m0", "date": DAY, "crucial": True}])
+        written = await backfill_quotas(store)
+        # Déjà des compteurs : le backfill ne repasse pas
+        again = await backfill_quotas(store)
+        return written, again, await counter(store), await counter(store, "bob")
+
+    written, again, alice, bob = run(scenario())
+    assert (written, again) == (2, 0)
+    assert alice == {"crucial": 2, "normal": 3}
+    assert bob == {"crucial": 1, "normal": 0}
+
+
+def test_mission_routes_keep_counters_in_step(run, client, user_id):
+    headers = {"X-User-Id": user_id}
+    today = date.today().isoformat()
+
+    def create(crucial: bool):
+        mission = {"title": "m", "date": today, "skill": "tech", "crucial": crucial}
+        return client.post("/api/missions", json=mission, headers=headers)
+
+    async def scenario():
+        responses = await asyncio.gather(*(create(True) for _ in range(MAX_CRUCIAL_MISSIONS + 3)))
+        created = [r.json() for r in responses if r.status_code == 200]
+        await client.delete(f"/api/missions/{created[0]['id']}", headers=headers)
+        retry = await create(True)
+        return responses, retry, await counter(server.store, user_id, today)
+
+    responses, retry, places = run(scenario())
+    assert sorted(r.status_code for r in responses) == [200] * MAX_CRUCIAL_MISSIONS + [400] * 3
+    assert retry.status_code == 200
+    assert places["crucial"] == MAX_CRUCIAL_MISSIONS
+
+
+def test_duplicate_in_batch_only_releases_its_own_place(run, client, user_id):
+    headers = {"X-User-Id": user_id}
+    today = date.today().isoformat()
+
+    def mission(mission_id: str, crucial: bool) -> dict:
+        return {"id": mission_id, "title": "m", "date": today, "skill": "tech", "crucial": crucial}
+
+    async def scenario():
+        first = await client.post("/api/missions", json=mission("dup", False), headers=headers)
+        batch = await client.post("/api/missions/batch", json=[mission("dup", True), mission("new1", False)], headers=headers)
+        stored = await server.store.find("missions", {"user_id": user_id}, {"_id": 0, "id": 1})
+        return first, batch, sorted(m["id"] for m in stored), await counter(server.store, user_id, today)
+
+    first, batch, stored, places = run(scenario())
+    assert first.status_code == 200
+    assert batch.status_code == 409
+    assert "dup" in batch.json()["detail"]
+    assert stored == ["dup", "new1"]
+    assert places == {"crucial": 0, "normal": 2}
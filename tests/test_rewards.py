@@ -0,0 +1,70 @@
+import asyncio
+from datetime import date
+
+import server
+from rules import mission_reward
+
+
+async def balances(user_id: str) -> tuple:
+    stats, skill = await asyncio.gather(
+        server.store.find_one("user_stats", {"user_id": user_id}, {"_id": 0, "coins": 1}),
+        server.store.find_one("skills", {"user_id": user_id, "id": "tech"}, {"_id": 0, "exp": 1, "level": 1}),
+    )
+    return stats["coins"], skill
+
+
+def test_mission_reward_is_granted_once(run, client, user_id):
+    headers = {"X-User-Id": user_id}
+    mission = {"id": "m1", "title": "m", "date": date.today().isoformat(), "skill": "tech", "crucial": True}
+    coins, _ = mission_reward(True)
+
+    async def scenario():
+        await client.get("/api/stats", headers=headers)
+        before = await balances(user_id)
+        await client.post("/api/missions", json=mission, headers=headers)
+        # Requêtes concurrentes : seule celle qui bascule réellement la mission paie
+        await asyncio.gather(*(client.patch("/api/missions/m1", params={"completed": True}, headers=headers) for _ in range(5)))
+        granted = await balances(user_id)
+        await asyncio.gather(*(client.patch("/api/missions/m1", params={"completed": False}, headers=headers) for _ in range(5)))
+        return before, granted, await balances(user_id)
+
+    before, granted, revoked = run(scenario())
+    assert granted[0] == before[0] + coins
+    assert granted[1] != before[1]
+    assert revoked == before
+
+
+def test_batch_completion_pays_changed_missions_only(run, client, user_id):
+    headers = {"X-User-Id": user_id}
+    today = date.today().isoformat()
+    missions = [{"id": f"m{i}", "title": "m", "date": today, "skill": "tech", "crucial": False} for i in range(3)]
+    coins, _ = mission_reward(False)
+
+    async def scenario():
+        await client.get("/api/stats", headers=headers)
+        before = (await balances(user_id))[0]
+        await client.post("/api/missions/batch", json=missions, headers=headers)
+        await client.patch("/api/missions/m0", params={"completed": True}, headers=headers)
+        response = await client.post("/api/missions/complete", json={"ids": ["m0", "m1", "m2"], "completed": True}, headers=headers)
+        return before, response.json(), (await balances(user_id))[0]
+
+    before, response, after = run(scenario())
+    assert response["updated"] == 2
+    assert after == before + 3 * coins
+
+
+def test_purchase_never_overdraws(run, client, user_id):
+    headers = {"X-User-Id": user_id}
+
+    async def scenario():
+        await client.post("/api/init-demo-data", headers=headers)
+        item = (await client.get("/api/shop")).json()[0]
+        await server.store.update_one("user_stats", {"user_id": user_id}, {"$set": {"coins": item["price"]}})
+        responses = await asyncio.gather(*(
+            client.post("/api/shop/purchase", params={"item_id": item["id"]}, headers=headers) for _ in range(4)
+        ))
+        return sorted(r.status_code for r in responses), (await balances(user_id))[0]
+
+    statuses, coins = run(scenario())
+    assert statuses == [200, 400, 400, 400]
+    assert coins == 0
@@ -0,0 +1,18 @@
+from datetime import date
+
+import pytest
+
+HABIT = {"id": "h1", "name": "Lire", "skill": "tech", "coin_reward": 5, "exp_reward": 10}
+MISSION = {"id": "m1", "title": "m", "date": date.today().isoformat(), "skill": "tech", "crucial": False}
+REVIEW = {"id": "r1", "date": "2026-03-01", "notes": "ok"}
+
+
+@pytest.mark.parametrize("path, body", [("/api/habits", HABIT), ("/api/missions", MISSION), ("/api/reviews", REVIEW)])
+def test_reused_id_is_a_conflict(run, client, user_id, path, body):
+    headers = {"X-User-Id": user_id}
+    assert run(client.post(path, json=body, headers=headers)).status_code == 200
+    again = run(client.post(path, json=body, headers=headers))
+    assert again.status_code == 409
+    assert body["id"] in again.json()["detail"]
+    # Les identifiants sont propres à chaque joueur
+    assert run(client.post(path, json=body, headers={"X-User-Id": f"{user_id}-other"})).status_code == 200
@@ -0,0 +1,86 @@
+import pytest
+
+from pagination import NEXT_CURSOR_HEADER
+from storage import open_storage
+from storage.text import terms
+
+NOTES = [
+    ("2026-03-01", "Séance de sport, puis sport encore"),
+    ("2026-03-02", "Lecture le matin, sport le soir et méditation"),
+    ("2026-03-03", "Journée calme"),
+    ("2026-03-04", "Sport"),
+    ("2026-03-05", "Méditation et lecture, un peu de sport avant le dîner avec des amis"),
+    ("2026-03-06", "Les séances de sport se suivent"),
+]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, run, tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "rpg.sqlite3"))
+    store = open_storage(request.param)
+    yield store
+    run(store.close())
+
+
+def search(run, client, user_id, **params):
+    """Toutes les pages d'une recherche, en suivant X-Next-Cursor"""
+    pages = []
+    while True:
+        response = run(client.get("/api/reviews/search", params=params, headers={"X-User-Id": user_id}))
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+        params = {**params, "after": cursor}
+
+
+def test_terms_are_normalized():
+    assert terms("Les Séances de SPORT !") == ["seance", "sport"]
+    assert terms("de la et") == []
+
+
+def test_inverted_index_follows_writes(run, backend):
+    async def ids(text, user_id="alice"):
+        return sorted(d["id"] for d in await backend.search("daily_reviews", text, {"user_id": user_id}, {"_id": 0, "id": 1}))
+
+    async def scenario():
+        await backend.insert_many("daily_reviews", [
+            {"user_id": "alice", "id": "r1", "date": "2026-03-01", "notes": "Séance de sport"},
+            {"user_id": "alice", "id": "r2", "date": "2026-03-02", "notes": "Lecture"},
+            {"user_id": "bob", "id": "r1", "date": "2026-03-01", "notes": "Sport"},
+        ])
+        found = [await ids("séances"), await ids("sport lecture"), await ids("sport", "bob")]
+        await backend.update_one("daily_reviews", {"user_id": "alice", "id": "r1"}, {"$set": {"notes": "Repos"}})
+        await backend.delete_one("daily_reviews", {"user_id": "alice", "id": "r2"})
+        return found + [await ids("sport"), await ids("lecture"), await ids("repos")]
+
+    assert run(scenario()) == [["r1"], ["r1", "r2"], ["r1"], [], [], ["r1"]]
+
+
+def test_results_are_ranked_and_paged_without_gaps(run, client, user_id):
+    for day, notes in NOTES:
+        assert run(client.post("/api/reviews", json={"date": day, "notes": notes}, headers={"X-User-Id": user_id})).status_code == 200
+
+    full = search(run, client, user_id, q="sport")[0]
+    assert len(full) == 5
+    scores = [r["score"] for r in full]
+    assert scores == sorted(scores, reverse=True) and scores[0] > scores[-1]
+    # Fréquence du terme atténuée par la longueur : une note courte ou qui répète le mot passe devant
+    assert [r["date"] for r in full] == ["2026-03-04", "2026-03-01", "2026-03-06", "2026-03-02", "2026-03-05"]
+
+    pages = search(run, client, user_id, q="sport", limit=2)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [r["id"] for page in pages for r in page] == [r["id"] for r in full]
+
+
+def test_search_honours_date_filters(run, client, user_id):
+    for day, notes in NOTES:
+        run(client.post("/api/reviews", json={"date": day, "notes": notes}, headers={"X-User-Id": user_id}))
+
+    pages = search(run, client, user_id, q="sport méditation", start="2026-03-02", end="2026-03-04", limit=1)
+    assert sorted(r["date"] for page in pages for r in page) == ["2026-03-02", "2026-03-04"]
+    assert search(run, client, f"{user_id}-other", q="sport") == [[]]
+    response = run(client.get("/api/reviews/search", params={"q": "sport", "start": "2026-03-05", "end": "2026-03-01"},
+                              headers={"X-User-Id": user_id}))
+    assert response.status_code == 400
@@ -0,0 +1,20 @@
+import numpy as np
+
+from simulation import Profile, simulate, sweep
+
+
+def test_habits_alone_pay_nothing_by_default():
+    result = simulate(players=200, days=30, profile=Profile(crucial_missions=0, normal_missions=0), seed=1)
+    assert not result.coins.any()
+
+
+def test_sweep_variants_share_one_pass():
+    table = sweep({"habit_coins": [0, 10]}, players=200, days=30, seed=1)
+    assert list(table["habit_coins"]) == [0, 10]
+    assert np.all(table["coins_p50"].diff().dropna() > 0)
+
+
+def test_potions_do_not_unlock_the_heal_achievement():
+    # Le serveur ne débloque heal_hp que sur PATCH /stats : une potion achetée ne compte pas
+    result = simulate(players=200, days=60, profile=Profile(potion_below=99), seed=1)
+    assert (result.unlock_days["heal_hp"] < 0).all()
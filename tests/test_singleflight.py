@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run(run):
+    flight, calls = SingleFlight(), []
+
+    async def settle(day):
+        calls.append(day)
+        await asyncio.sleep(0.01)
+        return f"réglé {day}"
+
+    async def scenario():
+        same = await asyncio.gather(*(flight.do(("alice", "d1"), settle, "d1") for _ in range(5)))
+        other = await flight.do(("alice", "d2"), settle, "d2")
+        # La clé est libérée une fois le calcul fini : un appel ultérieur recalcule
+        later = await flight.do(("alice", "d1"), settle, "d1")
+        return same, other, later
+
+    same, other, later = run(scenario())
+    assert same == ["réglé d1"] * 5
+    assert (other, later) == ("réglé d2", "réglé d1")
+    assert calls == ["d1", "d2", "d1"]
+
+
+def test_errors_reach_every_waiter(run):
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("bilan impossible")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    errors = run(scenario())
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    with pytest.raises(RuntimeError):
+        run(flight.do("k", fail))
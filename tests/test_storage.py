@@ -0,0 +1,33 @@
+import pytest
+
+from storage import open_storage
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, run, tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "rpg.sqlite3"))
+    store = open_storage(request.param)
+    yield store
+    run(store.close())
+
+
+async def collect(documents) -> list:
+    return [doc async for doc in documents]
+
+
+def test_iterate_streams_in_batches(run, backend):
+    run(backend.insert_many("habits", [
+        {"user_id": "alice" if i % 2 else "bob", "id": f"h{i}", "name": f"h{i}", "rank": i} for i in range(25)
+    ]))
+    docs = run(collect(backend.iterate("habits", {}, {"_id": 0, "id": 1}, batch_size=4)))
+    assert [d["id"] for d in docs] == [f"h{i}" for i in range(25)]
+
+    alice = run(collect(backend.iterate("habits", {"user_id": "alice", "rank": {"$gte": 10}}, {"_id": 0, "id": 1}, batch_size=3)))
+    assert [d["id"] for d in alice] == [f"h{i}" for i in range(11, 25, 2)]
+    assert len(run(collect(backend.iterate("habits", {}, batch_size=4, limit=6)))) == 6
+
+
+def test_iterate_sorted(run, backend):
+    run(backend.insert_many("habits", [{"user_id": "alice", "id": f"h{i}", "rank": i % 3} for i in range(7)]))
+    docs = run(collect(backend.iterate("habits", {}, {"_id": 0, "rank": 1}, sort=[("rank", -1)], batch_size=2)))
+    assert [d["rank"] for d in docs] == [2, 2, 1, 1, 0, 0, 0]
@@ -0,0 +1,44 @@
+import pytest
+
+from ledger import Ledger
+from storage import open_storage
+from transfer import FORMATS, READERS, data_path, export_collection, export_data, import_data
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_round_trip_keeps_ledger_and_daily_history(run, store, tmp_path, fmt):
+    async def scenario():
+        await store.insert_one("user_stats", {"user_id": "alice", "id": "s", "coins": 120})
+        await store.insert_many("daily_outcomes", [{"user_id": "alice", "date": "2026-01-01", "perfect": True}])
+        await store.insert_many("daily_rollups", [{"user_id": "alice", "month": "2026-01", "days": 1, "perfect_days": 1}])
+        ledger = Ledger(store)
+        await ledger.snapshot("alice", 100, {})
+        await ledger.record("alice", "mission", 20, key="k1", response={"ok": True})
+        await export_data(store, tmp_path, fmt=fmt, batch_size=2)
+
+        target = open_storage("memory")
+        await import_data(target, tmp_path, fmt=fmt, batch_size=2)
+        copy = Ledger(target)
+        return (
+            await ledger.balances("alice"), await copy.balances("alice"),
+            await copy.claim("alice", "k1", "mission"),
+            await target.find("daily_rollups", {"user_id": "alice"}, {"_id": 0}),
+            await target.find("daily_outcomes", {"user_id": "alice"}, {"_id": 0}),
+        )
+
+    source, imported, replayed, rollups, outcomes = run(scenario())
+    assert imported == source
+    assert imported["coins"] == 120
+    # Les clés d'idempotence suivent le journal : la requête déjà appliquée n'est pas rejouée
+    assert replayed["response"] == {"ok": True}
+    assert rollups == [{"user_id": "alice", "month": "2026-01", "days": 1, "perfect_days": 1}]
+    assert len(outcomes) == 1
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_readers_yield_batches(run, store, tmp_path, fmt):
+    run(store.insert_many("habits", [{"user_id": "alice", "id": f"h{i}", "name": f"h{i}"} for i in range(7)]))
+    run(export_collection(store, "habits", tmp_path, fmt=fmt, batch_size=7))
+    batches = list(READERS[fmt](data_path(tmp_path, "habits", fmt), 3))
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [doc["id"] for batch in batches for doc in batch] == [f"h{i}" for i in range(7)]
@@ -0,0 +1,209 @@
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+import orjson
+from bson import json_util
+
+from quotas import QUOTAS, rebuild_quotas
+from storage import DuplicateKey
+from tenancy import USER_COLLECTIONS
+
+# --- EXPORT / IMPORT DES DONNEES DE JEU ---
+# Sauvegarde, restauration et passage d'un environnement à l'autre, quel que soit
+# le backend. Un fichier par collection dans un répertoire : NDJSON en JSON étendu
+# (ObjectId et dates conservés) ou Parquet (colonnes typées). L'export parcourt le
+# Storage par lots, l'import écrit par insert_many de `batch_size` documents :
+# la mémoire reste bornée par la taille d'un lot, pas par celle de la collection.
+# Les _id sont gardés : réimporter le même fichier ne crée pas de doublons.
+
+# Données des joueurs et catalogues. L'historique des habitudes (habit_history)
+# et les succès débloqués (achievement_unlocks) vivent hors de habits et de
+# achievements. Le journal des coins (ledger, ledger_snapshots) et celui des
+# bilans (daily_outcomes, daily_rollups) suivent user_stats : sans eux,
+# /ledger/balances et /history ne correspondraient plus aux soldes importés.
+# Les compteurs de quotas sont recalculés à l'import des missions.
+EXPORT_COLLECTIONS = (
+    "user_stats", "habits", "habit_history", "missions", "skills", "achievement_unlocks",
+    "daily_reviews", "daily_outcomes", "daily_rollups", "ledger", "ledger_snapshots",
+    "shop_items", "achievements",
+)
+FORMATS = ("ndjson", "parquet")
+BATCH_SIZE = 1000
+
+# Types écrits tels quels dans une colonne Parquet ; les autres (sous-documents,
+# listes, ObjectId) et les colonnes aux types mélangés passent en JSON étendu
+PARQUET_SCALARS = (str, int, float, bool, datetime)
+JSON_COLUMNS = b"json_columns"
+
+
+def scope(collection: str, user_id: str = None) -> dict:
+    """Filtre de l'export / de l'import : un seul joueur pour ses collections, tout le catalogue sinon"""
+    return {"user_id": user_id} if user_id and collection in USER_COLLECTIONS else {}
+
+
+def data_path(directory: Path, collection: str, fmt: str) -> Path:
+    return Path(directory) / f"{collection}.{fmt}"
+
+
+# --- NDJSON ---
+
+def ndjson_line(doc: dict) -> bytes:
+    return orjson.dumps(doc, default=json_util.default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE)
+
+
+class NDJSONWriter:
+    def __init__(self, path: Path):
+        self.file = open(path, "wb")
+
+    def write(self, docs: list):
+        self.file.writelines(ndjson_line(doc) for doc in docs)
+
+    def close(self):
+        self.file.close()
+
+
+def read_ndjson(path: Path, batch_size: int):
+    """Documents du fichier, par lots d'au plus `batch_size` lignes"""
+    with open(path, "rb") as file:
+        while lines := list(islice(file, batch_size)):
+            docs = [json_util.loads(line) for line in lines if line.strip()]
+            if docs:
+                yield docs
+
+
+# --- PARQUET ---
+# Un répertoire <collection>.parquet de fichiers part-NNNNN.parquet (lisible tel
+# quel par pandas.read_parquet) : les lots sont ajoutés au fichier courant tant que
+# leur schéma est le même, un nouveau fichier est ouvert quand il change (champ
+# apparu en cours de collection...).
+
+def parquet_table(docs: list):
+    import pyarrow as pa
+
+    columns = {}
+    for doc in docs:
+        for name in doc:
+            columns.setdefault(name, None)
+    encoded = []
+    for name in columns:
+        values = [doc.get(name) for doc in docs]
+        types = {type(v) for v in values if v is not None}
+        if len(types) > 1 or any(not issubclass(t, PARQUET_SCALARS) for t in types):
+            values = [json_util.dumps(v) if v is not None else None for v in values]
+            encoded.append(name)
+        columns[name] = values
+    table = pa.Table.from_pydict(columns)
+    return table.replace_schema_metadata({JSON_COLUMNS: orjson.dumps(encoded)})
+
+
+class ParquetWriter:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        for part in self.path.glob("part-*.parquet"):
+            part.unlink()
+        self.parts = 0
+        self.writer = None
+
+    def write(self, docs: list):
+        import pyarrow.parquet as pq
+
+        table = parquet_table(docs)
+        if self.writer is None or not table.schema.equals(self.writer.schema, check_metadata=True):
+            self.close()
+            self.writer = pq.ParquetWriter(self.path / f"part-{self.parts:05d}.parquet", table.schema)
+            self.parts += 1
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def read_parquet(path: Path, batch_size: int):
+    """Documents des fichiers Parquet, par lots d'au plus `batch_size` lignes ; les valeurs nulles redeviennent des champs absents"""
+    import pyarrow.parquet as pq
+
+    for part in sorted(Path(path).glob("part-*.parquet")):
+        file = pq.ParquetFile(part)
+        encoded = set(orjson.loads((file.schema_arrow.metadata or {}).get(JSON_COLUMNS, b"[]")))
+        for batch in file.iter_batches(batch_size=batch_size):
+            yield [{k: json_util.loads(v) if k in encoded else v for k, v in row.items() if v is not None} for row in batch.to_pylist()]
+
+
+WRITERS = {"ndjson": NDJSONWriter, "parquet": ParquetWriter}
+READERS = {"ndjson": read_ndjson, "parquet": read_parquet}
+
+
+# --- EXPORT ---
+
+async def export_collection(store, collection: str, directory: Path, fmt: str = "ndjson", user_id: str = None,
+                            batch_size: int = BATCH_SIZE) -> int:
+    writer = WRITERS[fmt](data_path(directory, collection, fmt))
+    count = 0
+    batch = []
+    try:
+        async for doc in store.iterate(collection, scope(collection, user_id), batch_size=batch_size):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                writer.write(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write(batch)
+            count += len(batch)
+    finally:
+        writer.close()
+    return count
+
+
+async def export_data(store, directory: Path, collections=EXPORT_COLLECTIONS, fmt: str = "ndjson", user_id: str = None,
+                      batch_size: int = BATCH_SIZE) -> dict:
+    """Exporte chaque collection dans directory ; {collection: documents écrits}"""
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    return {
+        name: await export_collection(store, name, directory, fmt, user_id, batch_size)
+        for name in collections
+    }
+
+
+# --- IMPORT ---
+
+async def import_collection(store, collection: str, directory: Path, fmt: str = "ndjson", user_id: str = None,
+                            batch_size: int = BATCH_SIZE, replace: bool = False) -> dict:
+    """Insère les documents du fichier par lots ; les documents déjà présents (même _id ou même clé unique) sont ignorés"""
+    path = data_path(directory, collection, fmt)
+    if not path.exists():
+        return {"documents": 0, "duplicates": False, "missing": True}
+    query = scope(collection, user_id)
+    if replace:
+        await store.delete_many(collection, query)
+    count, duplicates = 0, False
+    # Les lecteurs rendent déjà des lots de `batch_size` documents : un insert_many par lot
+    for batch in READERS[fmt](path, batch_size):
+        if query:
+            batch = [doc for doc in batch if doc.get("user_id") == user_id]
+        if not batch:
+            continue
+        count += len(batch)
+        try:
+            await store.insert_many(collection, batch)
+        except DuplicateKey:
+            duplicates = True
+
+    if collection == "missions":
+        if replace:
+            await store.delete_many(QUOTAS, query)
+        await rebuild_quotas(store, query)
+    return {"documents": count, "duplicates": duplicates}
+
+
+async def import_data(store, directory: Path, collections=EXPORT_COLLECTIONS, fmt: str = "ndjson", user_id: str = None,
+                      batch_size: int = BATCH_SIZE, replace: bool = False) -> dict:
+    """Importe les fichiers de directory ; replace vide d'abord la collection (ou les documents du joueur)"""
+    return {
+        name: await import_collection(store, name, directory, fmt, user_id, batch_size, replace)
+        for name in collections
+    }